@@ -0,0 +1,446 @@
+# benchmarks/bench.py
+"""
+Benchmarks for the RAG and conversation-state hot paths.
+
+    python benchmarks/bench.py run [--sizes 1000,10000,100000] [--output results.json]
+    python benchmarks/bench.py compare old.json new.json [--threshold 0.10]
+
+Everything runs offline and deterministically: embeddings come from a stub model
+and corpora / histories are synthetic. Each scenario runs in its own subprocess
+so peak RSS is measured per scenario.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+import numpy as np
+
+N_TOPICS = 1000
+VOCAB = [f"w{i}" for i in range(5000)]
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+class StubEmbedder:
+    """
+    Stands in for SentenceTransformer: a text starting with "topic<k>" embeds close to
+    topic k's fixed random direction, other texts to a direction picked by their hash.
+    Costs a fraction of a real model, so timings show the index and storage code.
+    """
+
+    def __init__(self, dim: int = 384, seed: int = 0):
+        self.dim = dim
+        rng = np.random.default_rng(seed)
+        self.topics = rng.standard_normal((N_TOPICS, dim)).astype("float32")
+
+    def _topic(self, text: str) -> int:
+        head = text[:16].split(" ", 1)[0]
+        if head.startswith("topic") and head[5:].isdigit():
+            return int(head[5:]) % N_TOPICS
+        return zlib.crc32(text.encode("utf-8")) % N_TOPICS
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False):
+        topics = np.fromiter((self._topic(t) for t in texts), dtype=np.int64, count=len(texts))
+        seed = zlib.crc32((texts[0] if texts else "").encode("utf-8")) + len(texts)
+        noise = np.random.default_rng(seed).standard_normal((len(texts), self.dim), dtype="float32")
+        return self.topics[topics] + 0.5 * noise
+
+
+def synthetic_documents(n_docs: int, words_per_doc: int, seed: int = 1):
+    """(text, url) pairs of `words_per_doc` words, each tagged with a topic."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(VOCAB)
+    for i in range(n_docs):
+        words = " ".join(vocab[rng.integers(0, len(vocab), words_per_doc)])
+        yield f"topic{i % N_TOPICS} {words}", f"https://example.invalid/doc/{i}"
+
+
+def synthetic_state(n_conversations: int, messages_per_conversation: int, message_chars: int) -> dict:
+    """A state file (JSON backend format) with the given history."""
+    body = ("kubectl logs deploy/api | grep -i error " * (message_chars // 40 + 1))[:message_chars]
+    conversations = {}
+    ts = 1_700_000_000.0
+    for c in range(n_conversations):
+        conv_id = f"conv_{c:05d}"
+        messages = []
+        for m in range(messages_per_conversation):
+            ts += 1
+            msg = {"role": "user" if m % 2 == 0 else "assistant", "content": body, "ts": ts}
+            if m % 2:
+                msg["response_id"] = f"resp_{c}_{m}"
+            messages.append(msg)
+        conversations[conv_id] = {
+            "id": conv_id,
+            "title": f"incident {c}",
+            "created": ts,
+            "messages": messages,
+            "last_response_id": messages[-1].get("response_id") if messages else None,
+        }
+    return {"conversations": conversations, "current_conversation": "conv_00000"}
+
+
+# -----------------------------
+# Measurement helpers
+# -----------------------------
+def percentiles(samples_s: list) -> dict:
+    ms = sorted(s * 1000 for s in samples_s)
+    return {
+        "p50_ms": round(statistics.median(ms), 4),
+        "p99_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.99))], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def bench_rag(workdir: str, chunks: int, dim: int, backend: str, queries: int, words_per_chunk: int = 120,
+              compression: str = "none") -> dict:
+    from aiops.rag import WebRAG
+
+    rag = WebRAG()
+    rag.index_path = os.path.join(workdir, "rag_index")
+    rag.rag_cfg["index_backend"] = backend
+    rag.rag_cfg["compression"] = compression
+    rag.rag_cfg["embedding_cache_path"] = os.path.join(workdir, "embedding_cache.db")
+    rag._model = StubEmbedder(dim)
+    metrics = {}
+
+    # chunk_text on one long page
+    page = " ".join(VOCAB[i % len(VOCAB)] for i in range(100_000))
+    elapsed, _ = timed(rag.chunk_text, page)
+    metrics["chunk_text_words_per_s"] = round(100_000 / elapsed)
+
+    # Bulk ingest: documents short enough to be one chunk each
+    batch = 10_000
+    ingest_s = 0.0
+    for start in range(0, chunks, batch):
+        docs = list(synthetic_documents(min(batch, chunks - start), words_per_chunk, seed=start + 1))
+        # Distinct URLs per batch so content hashes never collide across batches
+        docs = [(text, f"{url}?b={start}") for text, url in docs]
+        elapsed, _ = timed(rag.add_documents, docs, persist=False)
+        ingest_s += elapsed
+    metrics["ingest_chunks_per_s"] = round(chunks / ingest_s)
+    metrics["indexed_chunks"] = rag.index.ntotal
+
+    elapsed, _ = timed(rag.flush)
+    metrics["save_s"] = round(elapsed, 4)
+    # vector_bytes is what a loaded index keeps in memory; index_bytes is everything on disk
+    metrics["vector_bytes"] = os.path.getsize(rag.index_path + ".faiss")
+    metrics["index_bytes"] = metrics["vector_bytes"] + sum(os.path.getsize(path) for path in rag.store.files())
+
+    # Cold load in a fresh instance
+    reloaded = WebRAG()
+    reloaded.index_path = rag.index_path
+    reloaded.rag_cfg["index_backend"] = backend
+    reloaded.rag_cfg["compression"] = compression
+    reloaded.rag_cfg["embedding_cache_path"] = rag.rag_cfg["embedding_cache_path"]
+    reloaded._model = rag._model
+    elapsed, _ = timed(reloaded.warm_up)
+    metrics["load_s"] = round(elapsed, 4)
+
+    # Query latency (embedding included, as WebRAG.query does it)
+    rng = np.random.default_rng(42)
+    texts = [f"topic{int(rng.integers(0, N_TOPICS))} {VOCAB[q % len(VOCAB)]}" for q in range(queries)]
+    samples, hits = [], 0
+    for text in texts:
+        elapsed, results = timed(reloaded.query, text, top_k=8, min_similarity=0.3)
+        samples.append(elapsed)
+        hits += bool(results)
+    metrics["query"] = percentiles(samples)
+    metrics["query_hit_rate"] = round(hits / queries, 3)
+    # The same questions again: embeddings come from the cache
+    samples = [timed(reloaded.query, text, top_k=8, min_similarity=0.3)[0] for text in texts]
+    metrics["query_repeat"] = percentiles(samples)
+    # Dense + BM25 retrieval as augment_with_rag does it (embeddings cached by now)
+    samples, hits = [], 0
+    for text in texts:
+        elapsed, results = timed(reloaded.hybrid_query, text, top_k=8, min_similarity=0.3)
+        samples.append(elapsed)
+        hits += bool(results)
+    metrics["hybrid_query"] = percentiles(samples)
+    metrics["hybrid_query_hit_rate"] = round(hits / queries, 3)
+
+    # Incremental add of one document into the live index (no save)
+    samples = []
+    for i, (text, url) in enumerate(synthetic_documents(50, words_per_chunk, seed=999_999)):
+        elapsed, _ = timed(reloaded.add_document, text, f"{url}?single={i}", persist=False)
+        samples.append(elapsed)
+    metrics["add_document"] = percentiles(samples)
+    # Deleting single documents (an hnsw index is rebuilt each time, so only a few)
+    urls = [f"{url}?single={i}" for i, (_, url) in enumerate(synthetic_documents(10, words_per_chunk, seed=999_999))]
+    metrics["delete_document"] = percentiles([timed(reloaded.delete_document, url, persist=False)[0] for url in urls])
+
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def bench_state(workdir: str, backend: str, messages: int, conversations: int, message_chars: int, appends: int) -> dict:
+    from aiops.state_manager import open_state_manager
+
+    path = os.path.join(workdir, "state.json")
+    with open(path, "w") as f:
+        json.dump(synthetic_state(conversations, messages // conversations, message_chars), f)
+    metrics = {"state_file_bytes": os.path.getsize(path)}
+
+    # Open = load (json/journal) or one-time import (sqlite); then a second, warm open for sqlite
+    elapsed, state = timed(open_state_manager, path, {"state_backend": backend, "state_compact_every": 10_000})
+    metrics["open_s"] = round(elapsed, 4)
+    if backend == "sqlite":
+        elapsed, state = timed(open_state_manager, path, {"state_backend": backend})
+        metrics["reopen_s"] = round(elapsed, 4)
+
+    conv_id = state.get_current_conversation()
+    body = "x" * message_chars
+    samples = [timed(state.add_message, conv_id, "user", body)[0] for _ in range(appends)]
+    metrics["add_message"] = percentiles(samples)
+
+    if backend == "json":
+        metrics["save"] = percentiles([timed(state._save)[0] for _ in range(min(appends, 20))])
+
+    metrics["list_conversations"] = percentiles([timed(state.list_conversations)[0] for _ in range(50)])
+    metrics["get_history"] = percentiles([timed(state.get_history, conv_id, 10)[0] for _ in range(50)])
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+SCENARIOS = {"rag": bench_rag, "state": bench_state}
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _run_scenario(name: str, params: dict) -> dict:
+    """Run one scenario in a fresh interpreter and return its metrics."""
+    proc = subprocess.run(
+        [sys.executable, __file__, "_scenario", name, json.dumps(params)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _meta(args) -> dict:
+    import faiss
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=SRC
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", ""),
+        "args": vars(args),
+    }
+
+
+def run(args):
+    from rich.console import Console
+    console = Console()
+
+    plan = []
+    for size in args.sizes:
+        for backend in args.index_backends:
+            for compression in args.compressions:
+                params = {"chunks": size, "dim": args.dim, "backend": backend, "queries": args.queries}
+                if compression != "none":
+                    # Only named when set, so results stay comparable with runs from before the option
+                    params["compression"] = compression
+                plan.append(("rag", params))
+    for backend in args.state_backends:
+        for messages in args.history_sizes:
+            plan.append(("state", {
+                "backend": backend,
+                "messages": messages,
+                "conversations": args.conversations,
+                "message_chars": args.message_chars,
+                "appends": args.appends,
+            }))
+
+    results = []
+    for name, params in plan:
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        with console.status(f"{name}: {label}"):
+            metrics = _run_scenario(name, params)
+        if "error" in metrics:
+            console.print(f"❌ {name} {label}: {metrics['error']}", style="red")
+        else:
+            console.print(f"✅ {name} {label}", style="green")
+        results.append({"scenario": name, "params": params, "metrics": metrics})
+
+    report = {"meta": _meta(args), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(console, report)
+    console.print(f"📄 Results written to {args.output}", style="green")
+
+
+def print_report(console, report: dict):
+    """One table per scenario: a row per metric, a column per parameter set."""
+    from rich.table import Table
+    for name in dict.fromkeys(r["scenario"] for r in report["results"]):
+        rows = [r for r in report["results"] if r["scenario"] == name]
+        # Label columns by the parameters that actually vary
+        varying = [k for k in rows[0]["params"] if len({json.dumps(r["params"][k]) for r in rows}) > 1]
+        table = Table(title=name, show_header=True, header_style="bold magenta")
+        table.add_column("metric", style="cyan")
+        for r in rows:
+            table.add_column("\n".join(f"{k}={r['params'][k]}" for k in varying) or name, justify="right")
+        flats = [_flatten(r["metrics"]) for r in rows]
+        for key in dict.fromkeys(k for flat in flats for k in flat):
+            table.add_row(key, *(str(flat.get(key, "")) for flat in flats))
+        console.print(table)
+
+
+# -----------------------------
+# Compare
+# -----------------------------
+def _flatten(metrics: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def _higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s") or metric.endswith("hit_rate")
+
+
+def _informational(metric: str) -> bool:
+    return metric in ("indexed_chunks", "state_file_bytes")
+
+
+def compare(args) -> int:
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+    key = lambda r: (r["scenario"], json.dumps(r["params"], sort_keys=True))
+    old_results = {key(r): r for r in old["results"]}
+
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("scenario")
+    table.add_column("params", overflow="fold")
+    for col in ("metric", "baseline", "candidate", "change"):
+        table.add_column(col, justify="left" if col == "metric" else "right", no_wrap=True)
+
+    regressions = 0
+    for r in new["results"]:
+        base = old_results.get(key(r))
+        if base is None or "error" in r["metrics"] or "error" in base["metrics"]:
+            continue
+        before, after = _flatten(base["metrics"]), _flatten(r["metrics"])
+        params = ",".join(f"{k}={v}" for k, v in r["params"].items())
+        for metric, value in after.items():
+            prev = before.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(prev, (int, float)) or not prev:
+                continue
+            change = (value - prev) / prev
+            worse = -change if _higher_is_better(metric) else change
+            style = ""
+            if not _informational(metric) and worse > args.threshold:
+                style, regressions = "red", regressions + 1
+            elif not _informational(metric) and worse < -args.threshold:
+                style = "green"
+            elif not args.all:
+                continue
+            table.add_row(r["scenario"], params, metric, str(prev), str(value), f"{change:+.1%}", style=style)
+
+    console.print(table)
+    if regressions:
+        console.print(f"⚠️ {regressions} metric(s) regressed by more than {args.threshold:.0%}.", style="red")
+        return 1
+    console.print(f"✅ No regressions beyond {args.threshold:.0%}.", style="green")
+    return 0
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the RAG and state hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmarks and write JSON results")
+    run_parser.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000],
+                            help="RAG corpus sizes in chunks (e.g. 1000,10000,100000,1000000)")
+    run_parser.add_argument("--index-backends", type=lambda v: v.split(","), default=["flat"],
+                            help="Comma-separated rag.index_backend values")
+    run_parser.add_argument("--compressions", type=lambda v: v.split(","), default=["none"],
+                            help="Comma-separated rag.compression values")
+    run_parser.add_argument("--dim", type=int, default=384, help="Embedding dimension of the stub model")
+    run_parser.add_argument("--queries", type=int, default=200, help="Queries per RAG scenario")
+    run_parser.add_argument("--state-backends", type=lambda v: v.split(","), default=["json", "journal", "sqlite"])
+    run_parser.add_argument("--history-sizes", type=_int_list, default=[1000, 10000],
+                            help="Total messages in the synthetic state")
+    run_parser.add_argument("--conversations", type=int, default=10)
+    run_parser.add_argument("--message-chars", type=int, default=400)
+    run_parser.add_argument("--appends", type=int, default=100, help="add_message calls timed per scenario")
+    run_parser.add_argument("--output", default="bench-results.json")
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Relative change counted as a regression (default 0.10)")
+    compare_parser.add_argument("--all", action="store_true", help="Also list metrics within the threshold")
+
+    scenario_parser = sub.add_parser("_scenario")  # internal: one scenario in this process
+    scenario_parser.add_argument("name", choices=SCENARIOS)
+    scenario_parser.add_argument("params")
+
+    args = parser.parse_args(argv)
+    if args.command == "_scenario":
+        with tempfile.TemporaryDirectory(prefix="aiops-bench-") as workdir:
+            print(json.dumps(SCENARIOS[args.name](workdir, **json.loads(args.params))))
+        return 0
+    if args.command == "compare":
+        return compare(args)
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
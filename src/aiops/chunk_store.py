@@ -0,0 +1,556 @@
+# src/aiops/chunk_store.py
+
+import json
+import mmap
+import os
+import threading
+from collections import defaultdict
+import numpy as np
+
+# One fixed-size record per chunk, sorted by chunk id: where its text sits in the blob and which URL it came from
+RECORD = np.dtype([("id", "<i8"), ("offset", "<u8"), ("length", "<u4"), ("url", "<u4")])
+# Records of the first, position-addressed format, where the chunk id was the row number
+LEGACY_RECORD = np.dtype([("offset", "<u8"), ("length", "<u4"), ("url", "<u4")])
+# A document as kept in memory, and (after its URL) as logged in <prefix>.docs
+DOC_FIELDS = ("hash", "ns", "added", "expires", "first", "end")
+
+
+def _read_json_lines(path: str) -> list:
+    """Parse a JSON-lines file, dropping (and truncating away) a torn last line."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    # Lines are only ever appended whole, so anything after the last newline is a torn write
+    valid_bytes = data.rfind(b"\n") + 1
+    if valid_bytes < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    if not valid_bytes:
+        return []
+    # One json.loads call for the whole file is far faster than one per line
+    return json.loads(b"[" + data[:valid_bytes - 1].replace(b"\n", b",") + b"]")
+
+
+def _write_durably(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: str):
+    # Makes created, renamed and removed directory entries durable
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ChunkStore:
+    """
+    Append-only on-disk store of chunk texts, source URLs and (optionally)
+    exact vectors, addressed by chunk id.
+
+    Files, next to the FAISS index (`<prefix>` is WebRAG.index_path):
+      <prefix>.chunks.rec   one RECORD per chunk (id, offset, length, url id), sorted by id
+      <prefix>.chunks.bin   UTF-8 texts, back to back
+      <prefix>.chunks.vec   float32 vectors, one row per record (only with `dim`)
+      <prefix>.chunks.next  next chunk id to hand out (written by compact(), see below)
+      <prefix>.urls         interned URLs, one JSON string per line (line number = url id)
+      <prefix>.docs         document log, one JSON list per line:
+                            [url, hash, ns, added, expires, first, end] when a document is
+                            indexed as chunks first..end-1, [url, null, expires] when its
+                            expiry is renewed, [url] when it is deleted
+
+    Texts and vectors are read through mmap only when asked for, so memory does
+    not grow with the corpus; URLs and documents are small and kept in memory.
+    Deleting chunks never renumbers the others: compact() drops the rows of
+    deleted chunks and every other chunk keeps its id. Ids are never handed out
+    twice: new ids continue after the highest one ever stored, also once its
+    row was dropped by compact() (which records it in .chunks.next) or on open.
+    """
+
+    def __init__(self, prefix: str, next_id: int = None, dim: int = 0, live_ids=None):
+        """
+        Open (or create) the store. `next_id` limits it to chunks with smaller
+        ids, e.g. those of the index saved with it: records appended after that
+        (by a run that crashed before saving its index) are dropped. `live_ids`,
+        the ids in that index, decides which logged documents are really indexed.
+        """
+        self.prefix = prefix
+        self.rec_path = prefix + ".chunks.rec"
+        self.blob_path = prefix + ".chunks.bin"
+        self.vec_path = prefix + ".chunks.vec"
+        self.urls_path = prefix + ".urls"
+        self.docs_path = prefix + ".docs"
+        self.compact_marker = prefix + ".chunks.compacted"
+        self.next_id_path = prefix + ".chunks.next"
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._records = None  # mmap views, (re)created on read after writes
+        self._blob = None
+        self._vectors = None
+        self._ns_cache = {}
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        self._recover_compaction()
+        self._migrate_legacy()
+        self._open_files()
+
+        self.urls = _read_json_lines(self.urls_path)
+        self._url_ids = {url: i for i, url in enumerate(self.urls)}
+        self._rows = os.path.getsize(self.rec_path) // RECORD.itemsize
+        self._next_id = self._read_next_id()
+        if self._rows:
+            self._map()
+            # Ids of records dropped below (or by an earlier compaction) stay used up
+            self._next_id = max(self._next_id, int(self._records["id"][self._rows - 1]) + 1)
+            if next_id is not None:
+                self._rows = int(np.searchsorted(self._records["id"], next_id))
+            # Records whose URL line was lost (not yet durable at a crash) end the readable store
+            lost = np.nonzero(self._records["url"][:self._rows] >= len(self.urls))[0]
+            if len(lost):
+                self._rows = int(lost[0])
+            self._unmap()
+        self._blob_end = self._end_of_blob()
+        self._missing_rows = (0, 0)  # rows whose vector was padded in as NaN on open
+        if dim:
+            self._pad_vectors()
+        elif os.path.exists(self.vec_path):
+            # Kept vectors would fall out of step with the records while not maintained
+            os.remove(self.vec_path)
+
+        self.docs = self._replay_docs(live_ids)
+        # (content hash, namespace) -> url, to skip texts already indexed under another URL
+        self._contents = {(doc["hash"], doc["ns"]): url for url, doc in self.docs.items()}
+
+    def _open_files(self):
+        for path in (self.rec_path, self.blob_path) + ((self.vec_path,) if self.dim else ()):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        self._rec_file = open(self.rec_path, "r+b")
+        self._blob_file = open(self.blob_path, "r+b")
+        self._vec_file = open(self.vec_path, "r+b") if self.dim else None
+        self._urls_file = open(self.urls_path, "a")
+        self._docs_file = open(self.docs_path, "a")
+
+    def __len__(self):
+        """Number of chunk rows held, deleted ones included until compact()."""
+        return self._rows
+
+    @property
+    def next_id(self) -> int:
+        """Id the next appended chunk gets: above every id this store ever held."""
+        return self._next_id
+
+    def _read_next_id(self) -> int:
+        try:
+            with open(self.next_id_path) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def doc_hashes(self) -> dict:
+        """url -> content hash of the text indexed for it"""
+        return {url: doc["hash"] for url, doc in self.docs.items()}
+
+    def _end_of_blob(self) -> int:
+        if not self._rows:
+            return 0
+        self._map()
+        last = self._records[self._rows - 1]
+        return int(last["offset"]) + int(last["length"])
+
+    def _pad_vectors(self):
+        # Rows without a stored vector (written before vectors were kept) read as NaN
+        have = os.path.getsize(self.vec_path) // (self.dim * 4)
+        if have < self._rows:
+            self._missing_rows = (have, self._rows)
+            self._vec_file.seek(have * self.dim * 4)
+            self._vec_file.write(np.full((self._rows - have, self.dim), np.nan, dtype="float32").tobytes())
+            self._vec_file.flush()
+
+    # -----------------------------
+    # Recovery / migration
+    # -----------------------------
+    def _recover_compaction(self):
+        """
+        compact() writes all `.new` files durably, then the commit marker, then
+        renames them into place and removes the marker. With the marker the
+        remaining renames are finished; without it the old files are intact
+        and any `.new` files (possibly half-written) are dropped.
+        """
+        paths = (self.rec_path, self.blob_path, self.vec_path, self.docs_path)
+        pending = [p for p in paths if os.path.exists(p + ".new")]
+        committed = os.path.exists(self.compact_marker)
+        for path in pending:
+            if committed:
+                os.replace(path + ".new", path)
+            else:
+                os.remove(path + ".new")
+        if committed:
+            _fsync_dir(self.compact_marker)
+            os.remove(self.compact_marker)
+
+    def _migrate_legacy(self):
+        """Convert a position-addressed store (and its `.vectors` file) to id-addressed records."""
+        legacy_idx = self.prefix + ".chunks.idx"
+        legacy_vectors = self.prefix + ".vectors"
+        if not os.path.exists(legacy_idx) or os.path.exists(self.rec_path):
+            return
+        old = np.fromfile(legacy_idx, dtype=LEGACY_RECORD)
+        records = np.zeros(len(old), dtype=RECORD)
+        records["id"] = np.arange(len(old))
+        for field in ("offset", "length", "url"):
+            records[field] = old[field]
+        if self.dim and os.path.exists(legacy_vectors):
+            # Row i held the vector of chunk i, exactly as .chunks.vec does for these records
+            os.replace(legacy_vectors, self.vec_path)
+        _write_durably(self.rec_path + ".tmp", records.tobytes())
+        os.replace(self.rec_path + ".tmp", self.rec_path)
+        os.remove(legacy_idx)
+        if os.path.exists(legacy_vectors):
+            os.remove(legacy_vectors)
+
+    def _replay_docs(self, live_ids) -> dict:
+        """
+        Rebuild url -> document from the log. A document record counts only if
+        some of its chunks are live: records whose chunks never reached a saved
+        index (a crash, or an upsert that was not saved) are skipped, and the
+        latest live record wins.
+        """
+        entries = _read_json_lines(self.docs_path)
+        if not entries:
+            return {}
+        newest = self._newest_live_id_per_url(live_ids).tolist()
+        url_ids = self._url_ids
+        docs = {}
+        for entry in entries:
+            url = entry[0]
+            if len(entry) == 1:
+                # Deleted. With live ids this is implied (no live chunks), and a delete
+                # logged before its index was saved must not hide chunks still indexed
+                if live_ids is None:
+                    docs.pop(url, None)
+            elif entry[1] is None:
+                if url in docs:
+                    docs[url]["expires"] = entry[2]
+            else:
+                if len(entry) == 3:
+                    # First format: [url, hash, chunk count after it]
+                    entry = [url, entry[1], "default", None, None, 0, entry[2]]
+                url_id = url_ids.get(url)
+                if url_id is not None and entry[5] <= newest[url_id] < entry[6]:
+                    # Spelled out rather than zip(DOC_FIELDS, ...): this runs once per document on load
+                    docs[url] = {"hash": entry[1], "ns": entry[2], "added": entry[3], "expires": entry[4],
+                                 "first": entry[5], "end": entry[6]}
+        return docs
+
+    def _newest_live_id_per_url(self, live_ids) -> np.ndarray:
+        newest = np.full(len(self.urls), -1, dtype="int64")
+        if not self._rows:
+            return newest
+        self._map()
+        records = self._records[:self._rows]
+        if live_ids is not None:
+            records = records[np.isin(records["id"], live_ids)]
+        np.maximum.at(newest, records["url"].astype("int64"), records["id"])
+        return newest
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def _map(self):
+        if self._records is not None:
+            return
+        self._blob = b""
+        if os.path.getsize(self.blob_path):
+            self._blob = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._records = np.zeros(0, dtype=RECORD)
+        if self._rows:
+            rec = mmap.mmap(self._rec_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._records = np.frombuffer(rec, dtype=RECORD, count=self._rows)
+        if self.dim and self._rows and os.path.getsize(self.vec_path) >= self._rows * self.dim * 4:
+            self._vectors = np.memmap(self.vec_path, dtype="float32", mode="r", shape=(self._rows, self.dim))
+
+    def _unmap(self):
+        # numpy views keep the mmap alive; dropping them lets it be garbage-collected
+        self._records = None
+        self._blob = None
+        self._vectors = None
+
+    def _rows_of(self, ids) -> tuple:
+        """(row numbers, found mask) for chunk ids."""
+        self._map()
+        ids = np.asarray(ids, dtype="int64")
+        chunk_ids = self._records["id"][:self._rows]
+        rows = np.searchsorted(chunk_ids, ids)
+        found = rows < self._rows
+        found[found] = chunk_ids[rows[found]] == ids[found]
+        return rows, found
+
+    def get_many(self, ids) -> list:
+        """(text, url) of each chunk id, None where the store does not hold it."""
+        with self._lock:
+            rows, found = self._rows_of(ids)
+            out = [None] * len(rows)
+            for i in np.nonzero(found)[0].tolist():
+                offset, length, url_id = self._records[["offset", "length", "url"]][rows[i]].tolist()
+                out[i] = self._blob[offset:offset + length].decode("utf-8"), self.urls[url_id]
+            return out
+
+    def get(self, chunk_id: int):
+        """(text, url) of a chunk, or None if the store does not hold it."""
+        return self.get_many([chunk_id])[0]
+
+    def url(self, chunk_id: int):
+        item = self.get(chunk_id)
+        return item[1] if item else None
+
+    def vectors(self, ids) -> np.ndarray:
+        """Exact vectors of chunk ids as a float32 array; NaN rows where none is stored."""
+        with self._lock:
+            rows, found = self._rows_of(ids)
+            out = np.full((len(rows), self.dim), np.nan, dtype="float32")
+            if self._vectors is not None and found.any():
+                # Sorted row numbers read the memmap front to back
+                order = np.argsort(rows[found])
+                out[np.nonzero(found)[0][order]] = self._vectors[rows[found][order]]
+            return out
+
+    def set_vectors(self, ids, vectors):
+        """Store exact vectors for chunks already held (e.g. to backfill NaN rows)."""
+        with self._lock:
+            rows, found = self._rows_of(ids)
+            for row, vector in zip(rows[found], np.asarray(vectors, dtype="float32")[found]):
+                self._vec_file.seek(int(row) * self.dim * 4)
+                self._vec_file.write(vector.tobytes())
+            self._vec_file.flush()
+            self._unmap()
+            self._missing_rows = (0, 0)
+
+    def missing_ids(self) -> np.ndarray:
+        """Ids of the chunks whose vector was not stored yet when the store was opened."""
+        with self._lock:
+            self._map()
+            start, end = self._missing_rows
+            return np.array(self._records["id"][start:end], dtype="int64")
+
+    def ids_for_urls(self, urls) -> np.ndarray:
+        """Chunk ids held for any of `urls`."""
+        url_ids = [self._url_ids[u] for u in urls if u in self._url_ids]
+        if not url_ids or not self._rows:
+            return np.zeros(0, dtype="int64")
+        with self._lock:
+            self._map()
+            records = self._records[:self._rows]
+            return np.array(records["id"][np.isin(records["url"], url_ids)], dtype="int64")
+
+    def namespace_ids(self, namespaces) -> np.ndarray:
+        """Chunk ids of the documents in any of `namespaces` (cached until the store changes)."""
+        key = tuple(sorted(namespaces))
+        with self._lock:
+            if key not in self._ns_cache:
+                urls = [url for url, doc in self.docs.items() if doc["ns"] in key]
+                self._ns_cache[key] = self.ids_for_urls(urls)
+            return self._ns_cache[key]
+
+    def namespaces(self) -> dict:
+        """namespace -> number of documents"""
+        counts = defaultdict(int)
+        for doc in self.docs.values():
+            counts[doc["ns"]] += 1
+        return dict(counts)
+
+    def content_url(self, content_hash: str, namespace: str):
+        """URL of the document with this content in `namespace`, if any."""
+        return self._contents.get((content_hash, namespace))
+
+    def _drop_content(self, url: str):
+        doc = self.docs.get(url)
+        if doc is not None:
+            key = (doc["hash"], doc["ns"])
+            if self._contents.get(key) == url:
+                del self._contents[key]
+
+    def expired(self, now: float) -> list:
+        return [url for url, doc in self.docs.items() if doc["expires"] and doc["expires"] <= now]
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def _url_id(self, url: str, new_urls: list) -> int:
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            url_id = len(self.urls)
+            self.urls.append(url)
+            self._url_ids[url] = url_id
+            new_urls.append(url)
+        return url_id
+
+    def append(self, texts: list, urls: list, docs: dict = None, vectors=None) -> np.ndarray:
+        """
+        Append chunks under new ids (returned), with the documents they came
+        from (url -> {"hash", "ns", "added", "expires"}) and their exact vectors.
+        """
+        with self._lock:
+            first = self.next_id
+            ids = np.arange(first, first + len(texts), dtype="int64")
+            new_urls = []
+            records = np.zeros(len(texts), dtype=RECORD)
+            blobs = []
+            offset = self._blob_end
+            positions = defaultdict(list)
+            for i, (text, url) in enumerate(zip(texts, urls)):
+                data = text.encode("utf-8")
+                records[i] = (ids[i], offset, len(data), self._url_id(url, new_urls))
+                blobs.append(data)
+                positions[url].append(i)
+                offset += len(data)
+
+            # Texts, vectors and URLs first, records last: a record never points at data that isn't there
+            self._blob_file.seek(self._blob_end)
+            self._blob_file.write(b"".join(blobs))
+            self._blob_file.truncate()
+            self._blob_file.flush()
+            if self._vec_file is not None:
+                if vectors is None:
+                    vectors = np.full((len(texts), self.dim), np.nan, dtype="float32")
+                self._vec_file.seek(self._rows * self.dim * 4)
+                self._vec_file.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+                self._vec_file.truncate()
+                self._vec_file.flush()
+            if new_urls:
+                self._urls_file.writelines(json.dumps(url) + "\n" for url in new_urls)
+                self._urls_file.flush()
+            if docs:
+                added = {}
+                for url, doc in docs.items():
+                    rows = positions.get(url)
+                    span = (int(ids[rows[0]]), int(ids[rows[-1]]) + 1) if rows else (first, first)
+                    added[url] = {"ns": "default", "added": None, "expires": None, **doc,
+                                  "first": span[0], "end": span[1]}
+                self._docs_file.writelines(self._doc_line(url, doc) for url, doc in added.items())
+                self._docs_file.flush()
+                for url, doc in added.items():
+                    self._drop_content(url)
+                    self.docs[url] = doc
+                    self._contents[(doc["hash"], doc["ns"])] = url
+            self._rec_file.seek(self._rows * RECORD.itemsize)
+            self._rec_file.write(records.tobytes())
+            self._rec_file.truncate()
+            self._rec_file.flush()
+
+            self._unmap()
+            self._rows += len(texts)
+            self._next_id = first + len(texts)
+            self._blob_end = offset
+            self._ns_cache.clear()
+            return ids
+
+    @staticmethod
+    def _doc_line(url: str, doc: dict) -> str:
+        return json.dumps([url] + [doc[field] for field in DOC_FIELDS]) + "\n"
+
+    def touch(self, url: str, expires):
+        """Renew a document's expiry."""
+        with self._lock:
+            if url in self.docs:
+                self.docs[url]["expires"] = expires
+                self._docs_file.write(json.dumps([url, None, expires]) + "\n")
+                self._docs_file.flush()
+
+    def forget(self, urls):
+        """Log documents as deleted; their rows stay until compact()."""
+        with self._lock:
+            urls = [url for url in urls if url in self.docs]
+            if not urls:
+                return
+            self._docs_file.writelines(json.dumps([url]) + "\n" for url in urls)
+            self._docs_file.flush()
+            for url in urls:
+                self._drop_content(url)
+                del self.docs[url]
+            self._ns_cache.clear()
+
+    def flush(self):
+        """Make appended chunks, URLs and document entries durable."""
+        for f in (self._blob_file, self._vec_file, self._urls_file, self._docs_file, self._rec_file):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self, live_ids):
+        """
+        Rewrite the store keeping only the chunks in `live_ids`, under the same
+        ids, and the current documents. New files are written next to the old ones
+        and renamed into place; an interrupted compaction is finished or undone on open.
+        """
+        with self._lock:
+            self._map()
+            # The highest ids may be dropped below: keep them used up
+            _write_durably(self.next_id_path + ".tmp", str(self._next_id).encode())
+            os.replace(self.next_id_path + ".tmp", self.next_id_path)
+            keep = np.nonzero(np.isin(self._records["id"][:self._rows], live_ids))[0]
+            records = np.array(self._records[keep])
+            offset = 0
+            with open(self.blob_path + ".new", "wb") as f:
+                for i, row in enumerate(keep):
+                    start, length = int(self._records[row]["offset"]), int(self._records[row]["length"])
+                    f.write(self._blob[start:start + length])
+                    records[i]["offset"] = offset
+                    offset += length
+                f.flush()
+                os.fsync(f.fileno())
+            if self._vec_file is not None:
+                with open(self.vec_path + ".new", "wb") as f:
+                    if self._vectors is not None:
+                        for start in range(0, len(keep), 65536):
+                            f.write(np.ascontiguousarray(self._vectors[keep[start:start + 65536]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            docs = "".join(self._doc_line(url, doc) for url, doc in self.docs.items())
+            _write_durably(self.docs_path + ".new", docs.encode())
+            _write_durably(self.rec_path + ".new", records.tobytes())
+            # Every new file is complete: from here on, open() finishes the compaction
+            _fsync_dir(self.compact_marker)
+            _write_durably(self.compact_marker, b"")
+            _fsync_dir(self.compact_marker)
+
+            self.close()
+            for path in (self.rec_path, self.blob_path, self.vec_path, self.docs_path):
+                if os.path.exists(path + ".new"):
+                    os.replace(path + ".new", path)
+            _fsync_dir(self.compact_marker)
+            os.remove(self.compact_marker)
+            self._open_files()
+            self._rows = len(records)
+            self._blob_end = offset
+            self._missing_rows = (0, 0)
+            if self.dim:
+                self._pad_vectors()
+            self._ns_cache.clear()
+
+    def close(self):
+        self._unmap()
+        for f in (self._rec_file, self._blob_file, self._vec_file, self._urls_file, self._docs_file):
+            if f is not None:
+                f.close()
+
+    def files(self) -> list:
+        paths = (self.rec_path, self.blob_path, self.vec_path, self.next_id_path, self.urls_path, self.docs_path)
+        return [p for p in paths if os.path.exists(p)]
+
+    @classmethod
+    def exists(cls, prefix: str) -> bool:
+        return os.path.exists(prefix + ".chunks.rec") or os.path.exists(prefix + ".chunks.idx")
+
+    @classmethod
+    def from_lists(cls, prefix: str, chunks: list, urls: list, doc_hashes: dict) -> "ChunkStore":
+        """Create a store from in-memory lists (used to migrate the old pickle format)."""
+        store = cls(prefix, next_id=0)
+        store.append(chunks, urls, {url: {"hash": h, "ns": "default"} for url, h in doc_hashes.items()})
+        store.flush()
+        return store
@@ -1,13 +1,44 @@
 # src/aiops/cli.py
 
+import argparse
 import os
-from .llm.openai_client import OpenAIClient
-from .state_manager import StateManager
-from .orchestrator import Orchestrator
-from .config import Config
+from .startup_profile import StartupProfiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="aiops", description="Prompt-driven AI Ops agent")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report startup stage and import times, then exit",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Serve many sessions over a local HTTP API")
+    serve_parser.add_argument("--host", help="Interface to bind (default: server.host)")
+    serve_parser.add_argument("--port", type=int, help="Port to listen on (default: server.port)")
+    report_parser = subparsers.add_parser(
+        "rag-report", help="Compare memory and recall of RAG index compressions on the current index"
+    )
+    report_parser.add_argument(
+        "--compressions", default="none,fp16,sq8,pq", help="Comma-separated rag.compression values to compare"
+    )
+    report_parser.add_argument("--sample", type=int, default=50000, help="Vectors sampled from the index")
+    report_parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    report_parser.add_argument("-k", type=int, default=10, help="Recall is measured at k")
+    args = parser.parse_args(argv)
+    profiler = StartupProfiler(enabled=args.profile_startup)
+
+    # Components are imported here rather than at module level so --profile-startup can time them
+    with profiler.stage("config"):
+        from .config import Config
+        cfg = Config().load_config()
+
+    if args.command == "rag-report":
+        # Offline: needs the saved index only, not the LLM
+        from .index_report import run
+        run(cfg.get("rag", {}), args.compressions.split(","), sample=args.sample, queries=args.queries, k=args.k)
+        return
 
-def main():
-    cfg = Config().load_config()
     # Load config (minimal example)
     api_key = os.environ.get(cfg.get("llm", {}).get("api_key_env")) or os.environ.get(
         "OPENAI_API_KEY"
@@ -20,9 +51,37 @@ def main():
     state_file = cfg.get("execution", {}).get("state_file", ".aiops_state.json")
 
     # Init components
-    client = OpenAIClient(api_key=api_key, model=model)
-    state = StateManager(work_dir + state_file)
-    orchestrator = Orchestrator(client, state)
+    with profiler.stage("llm client"):
+        from .llm.openai_client import OpenAIClient
+        from .llm.retry import RetryPolicy
+        client = OpenAIClient(
+            api_key=api_key,
+            model=model,
+            base_url=cfg.get("llm", {}).get("base_url"),
+            retry=RetryPolicy.from_config(cfg.get("llm", {})),
+        )
+
+    if args.command == "serve":
+        # Sessions open their own state; one process shares the model, index and client
+        from .server import serve
+        serve(client, cfg, host=args.host, port=args.port)
+        return
+
+    with profiler.stage("state"):
+        from .state_manager import open_state_manager
+        state = open_state_manager(work_dir + state_file, cfg.get("execution", {}))
+    with profiler.stage("orchestrator"):
+        from .orchestrator import Orchestrator
+        # Background warm-up would race the deferred timings below
+        orchestrator = Orchestrator(client, state, warm_start=not args.profile_startup)
+
+    if args.profile_startup:
+        profiler.time_deferred_imports()
+        if cfg.get("rag", {}).get("allow_rag", True):
+            with profiler.stage("deferred: RAG warm-up"):
+                orchestrator.rag.warm_up()
+        profiler.report()
+        return
 
     # Start main loop
     orchestrator.start()
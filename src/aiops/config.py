@@ -1,16 +1,15 @@
 # src/aiops/config.py
 
+import copy
 import tomli
 from pathlib import Path
 from dotenv import load_dotenv
-import os
 from rich.console import Console
 
 ENV_PATH = Path(__file__).parent.parent / ".env"
+# The API key is checked by the commands that call the LLM (see cli.main), so that
+# offline ones such as `aiops rag-report` run without it
 load_dotenv(dotenv_path=ENV_PATH)
-# Make sure API key is in environment
-if "OPENAI_API_KEY" not in os.environ:
-    raise RuntimeError("OPENAI_API_KEY not found in .env")
 
 DEFAULT_CONFIG = {
     "llm": {
@@ -22,6 +21,13 @@ DEFAULT_CONFIG = {
         "persistent_memory": True
     },
     "rag": {},
+    "router": {},
+    "pipeline": {},
+    "mcp": {},
+    "server": {
+        "host": "127.0.0.1",
+        "port": 8765
+    },
     "execution": {
         "working_dir": "./.aiops_workspace",
         "auto_run_if_confident": False
@@ -39,16 +45,18 @@ class Config:
             with open(cfg_file, "rb") as f:
                 try:
                     cfg = tomli.load(f)
-                    merged = DEFAULT_CONFIG.copy()
+                    # Deep copy: nested sections are updated in place below, and config is
+                    # loaded from several threads (e.g. WebRAG created during a turn)
+                    merged = copy.deepcopy(DEFAULT_CONFIG)
                     # Deep merge of nested dicts
                     for k, v in cfg.items():
                         if isinstance(v, dict):
-                            merged[k].update(v)
+                            merged.setdefault(k, {}).update(v)
                         else:
                             merged[k] = v
                     return merged
                 except Exception as e:
                     console.print(f"⚠️  Failed to parse {config_path}: {e}", style="red")
-                    return DEFAULT_CONFIG
+                    return copy.deepcopy(DEFAULT_CONFIG)
         else:
-            return DEFAULT_CONFIG
+            return copy.deepcopy(DEFAULT_CONFIG)
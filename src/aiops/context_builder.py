@@ -0,0 +1,127 @@
+# src/aiops/context_builder.py
+
+import re
+import threading
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when it is installed (exact for OpenAI models),
+    otherwise estimates ~4 characters per token. The encoding is loaded on the
+    first count, not at startup: resolving it may download its BPE file.
+    """
+
+    _UNLOADED = object()
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        self.model = model
+        self._loaded = self._UNLOADED
+        self._lock = threading.Lock()
+
+    @property
+    def _encoding(self):
+        if self._loaded is self._UNLOADED:
+            with self._lock:
+                if self._loaded is self._UNLOADED:
+                    self._loaded = self._load_encoding(self.model)
+        return self._loaded
+
+    @staticmethod
+    def _load_encoding(model: str):
+        try:
+            import tiktoken
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # Not installed, or its BPE file can't be downloaded (offline hosts)
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` to at most `max_tokens` (including the trailing ellipsis), on a word boundary."""
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max(0, max_tokens - 1)  # room for " …"
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            text = self._encoding.decode(tokens[:keep])
+        else:
+            text = text[:keep * 4 - 2]
+        return text.rsplit(" ", 1)[0] + " …"
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into the prompt under a token budget.
+
+    Chunks are taken best score first. A chunk that mostly repeats text already
+    selected (overlapping windows of one page, mirrored pages) is skipped. The
+    budget is `context_budget`, further limited so that system prompts, the
+    user input and the context together stay within `max_prompt_tokens`.
+    """
+
+    def __init__(
+            self,
+            counter: TokenCounter,
+            context_budget: int = 1500,
+            max_prompt_tokens: int = 8000,
+            duplicate_overlap: float = 0.6,
+            min_chunk_tokens: int = 64,
+    ):
+        self.counter = counter
+        self.context_budget = context_budget
+        self.max_prompt_tokens = max_prompt_tokens
+        self.duplicate_overlap = duplicate_overlap
+        self.min_chunk_tokens = min_chunk_tokens
+
+    @staticmethod
+    def _shingles(text: str, size: int = 5) -> set:
+        words = _WORD_RE.findall(text.lower())
+        if len(words) <= size:
+            return {tuple(words)}
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def select(self, retrieved: list[dict], budget: int) -> list[dict]:
+        """Return the chunks to include, each with its (possibly truncated) `text`."""
+        selected, seen, used = [], [], 0
+        for item in sorted(retrieved, key=lambda r: r.get("score", 0.0), reverse=True):
+            shingles = self._shingles(item["text"])
+            if any(len(shingles & prev) / len(shingles) >= self.duplicate_overlap for prev in seen):
+                continue
+
+            remaining = budget - used
+            tokens = self.counter.count(item["text"])
+            if tokens > remaining:
+                if remaining < self.min_chunk_tokens:
+                    break
+                item = dict(item, text=self.counter.truncate(item["text"], remaining))
+                tokens = self.counter.count(item["text"])
+
+            selected.append(item)
+            seen.append(shingles)
+            used += tokens
+        return selected
+
+    def build(self, user_input: str, retrieved: list[dict], system_prompts: list[str] = None) -> tuple[str, list[dict]]:
+        """
+        Return (prompt, used_chunks): the user input followed by as much retrieved
+        context as fits, and the chunks that went into it.
+        """
+        fixed = self.counter.count(user_input) + sum(self.counter.count(p) for p in system_prompts or [])
+        budget = min(self.context_budget, self.max_prompt_tokens - fixed)
+        used = self.select(retrieved, budget) if retrieved and budget > 0 else []
+        if not used:
+            return user_input, []
+
+        context = "\n".join(f"- {item['text']} (Source: {item['url']})" for item in used)
+        return f"{user_input}\n\nRelevant context:\n{context}", used
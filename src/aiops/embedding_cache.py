@@ -0,0 +1,166 @@
+# src/aiops/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    vector    BLOB NOT NULL,
+    used_at   REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_used ON embeddings(used_at);
+"""
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model name, SHA-256 of the text).
+
+    A bounded in-memory LRU sits in front of a SQLite store shared by every
+    process on the host. Once the stored vectors exceed `max_bytes`, the least
+    recently used ones are evicted. Vectors come back exactly as the model
+    produced them, so cached and fresh embeddings are interchangeable.
+    """
+
+    def __init__(
+            self,
+            path: str = "./.aiops_workspace/embedding_cache.db",
+            memory_items: int = 4096,
+            max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # (model, text hash) -> vector
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._stored_bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @classmethod
+    def from_config(cls, rag_cfg: dict):
+        return cls(
+            rag_cfg.get("embedding_cache_path", "./.aiops_workspace/embedding_cache.db"),
+            memory_items=rag_cfg.get("embedding_cache_memory_items", 4096),
+            max_bytes=int(rag_cfg.get("embedding_cache_max_mb", 256) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def _hash(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    # -----------------------------
+    # Lookup / store
+    # -----------------------------
+    def _remember(self, key: tuple, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Cached vectors for `texts`, None where there is none."""
+        keys = [(model, self._hash(t)) for t in texts]
+        found = [None] * len(keys)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                else:
+                    missing.setdefault(key[1], []).append(i)
+            if not missing:
+                return found
+
+            hashes = list(missing)
+            rows = []
+            for start in range(0, len(hashes), 500):  # stay under SQLite's bound-parameter limit
+                batch = hashes[start:start + 500]
+                rows += self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN "
+                    f"({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+            now = time.time()
+            for text_hash, blob in rows:
+                vector = np.frombuffer(blob, dtype="float32")
+                self._remember((model, text_hash), vector)
+                for i in missing[text_hash]:
+                    found[i] = vector
+            if rows:
+                self._db.executemany(
+                    "UPDATE embeddings SET used_at = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash, _ in rows],
+                )
+                self._db.commit()
+        return found
+
+    def put_many(self, model: str, texts: list, vectors):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.array(vector, dtype="float32")
+                key = (model, self._hash(text))
+                self._remember(key, vector)
+                rows.append((model, key[1], vector.tobytes(), now))
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, used_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+            if rows:
+                self._stored_bytes += (self._db.total_changes - before) * len(rows[0][2])
+            if self._stored_bytes > self.max_bytes:
+                self._evict()
+
+    def embed(self, model: str, texts: list, encode) -> np.ndarray:
+        """
+        Embeddings for `texts`, calling `encode(texts)` only for the distinct
+        texts not in the cache. Returns a float32 array, one row per text.
+        """
+        texts = list(texts)
+        vectors = self.get_many(model, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            encoded = dict(zip(missing, np.asarray(encode(missing), dtype="float32")))
+            self.put_many(model, missing, list(encoded.values()))
+            vectors = [encoded[t] if v is None else v for t, v in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(vectors)
+
+    # -----------------------------
+    # Eviction
+    # -----------------------------
+    def _evict(self):
+        # Other processes write too: recount, then drop least recently used rows down to 90%
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        target = int(self.max_bytes * 0.9)
+        if total > target and count:
+            drop = -(-(total - target) * count // total)  # ceil, assuming vectors of similar size
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY used_at LIMIT ?)",
+                (drop,),
+            )
+            self._db.commit()
+            total = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        self._stored_bytes = total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
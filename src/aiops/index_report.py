@@ -0,0 +1,148 @@
+# src/aiops/index_report.py
+
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from .chunk_store import ChunkStore
+from .vector_index import COMPRESSIONS, VectorIndex, normalize, read_index, reconstruct_ids, stored_ids
+
+
+def sample_vectors(index_path: str, sample: int, seed: int = 0) -> np.ndarray:
+    """
+    Up to `sample` vectors of the saved RAG index, exact ones from the chunk
+    store when it keeps them, otherwise as stored in the index.
+    """
+    index = read_index(index_path + ".faiss")
+    stored = stored_ids(index)
+    ids = stored
+    if sample < len(stored):
+        ids = np.sort(np.random.default_rng(seed).choice(stored, sample, replace=False))
+    vectors = np.full((len(ids), index.d), np.nan, dtype="float32")
+    if len(ids) and os.path.exists(index_path + ".chunks.vec"):
+        store = ChunkStore(index_path, next_id=int(stored.max()) + 1, dim=index.d, live_ids=stored)
+        vectors = store.vectors(ids)
+        store.close()
+    missing = np.isnan(vectors).any(axis=1)
+    if missing.any():
+        if isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)):
+            vectors[missing] = reconstruct_ids(index, ids[missing])
+        else:
+            vectors[missing] = index.reconstruct_batch(ids[missing])
+    return vectors
+
+
+def _recall(found, truth) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def compression_report(vectors, rag_cfg: dict, compressions=COMPRESSIONS, queries: int = 200, k: int = 10,
+                       seed: int = 0) -> list:
+    """
+    Build one index per compression over `vectors` (with the configured
+    backend) and measure its size, search time and recall@k against exact
+    search, without and with re-ranking. Held-out vectors are the queries.
+    """
+    vectors = normalize(vectors)
+    dim = vectors.shape[1]
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    queries = max(1, min(queries, len(vectors) // 10))
+    query_vectors, base = vectors[order[:queries]], vectors[order[queries:]]
+
+    truth_index = faiss.IndexFlatIP(dim)
+    truth_index.add(base)
+    _, truth = truth_index.search(query_vectors, k)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression in compressions:
+            # Train right away instead of staging on a flat index
+            cfg = {**rag_cfg, "compression": compression, "train_threshold": 1, "rerank": True}
+            # Exact vectors are kept the way WebRAG keeps them: in a chunk store, under the vector ids
+            store, ids = None, None
+            if VectorIndex.wants_exact(cfg):
+                store = ChunkStore(os.path.join(tmp, compression), next_id=0, dim=dim)
+                ids = store.append([""] * len(base), ["sample"] * len(base), vectors=base)
+            try:
+                index = VectorIndex.from_config(dim, cfg, exact=store)
+            except ValueError as e:
+                if store is not None:
+                    store.close()
+                rows.append({"compression": compression, "error": str(e)})
+                continue
+            start = time.perf_counter()
+            index.add(base, ids)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, found = index.index.search(query_vectors, k)
+            row = {
+                "compression": compression,
+                "layout": "/".join(index.layout),
+                "bytes": len(faiss.serialize_index(index.index)),
+                "build_s": build_s,
+                "search_ms": (time.perf_counter() - start) * 1000 / queries,
+                "recall": _recall(found, truth),
+            }
+            if index.exact is not None:
+                start = time.perf_counter()
+                _, found = index.search(query_vectors, k)
+                row["rerank_search_ms"] = (time.perf_counter() - start) * 1000 / queries
+                row["rerank_recall"] = _recall(found, truth)
+            index.close()
+            if store is not None:
+                store.close()
+            rows.append(row)
+    return rows
+
+
+def print_report(rows: list, vectors: int, k: int, console: Console = None):
+    console = console or Console()
+    baseline = next((r["bytes"] for r in rows if r.get("compression") == "none" and "bytes" in r), None)
+    table = Table(
+        title=f"RAG index compression ({vectors} vectors, recall@{k} vs exact search)",
+        show_header=True,
+        header_style="bold magenta",
+    )
+    for name in ("Compression", "Layout", "Index MB", "Saved", f"Recall@{k}", "Search (ms)",
+                 "Re-ranked recall", "Re-ranked (ms)"):
+        table.add_column(name, justify="left" if name in ("Compression", "Layout") else "right")
+    for r in rows:
+        if "error" in r:
+            table.add_row(r["compression"], f"[red]{r['error']}[/red]", *[""] * 6)
+            continue
+        saved = f"{1 - r['bytes'] / baseline:.0%}" if baseline else "-"
+        table.add_row(
+            r["compression"],
+            r["layout"],
+            f"{r['bytes'] / 1024 / 1024:.1f}",
+            saved,
+            f"{r['recall']:.3f}",
+            f"{r['search_ms']:.2f}",
+            f"{r['rerank_recall']:.3f}" if "rerank_recall" in r else "-",
+            f"{r['rerank_search_ms']:.2f}" if "rerank_search_ms" in r else "-",
+        )
+    console.print(table)
+    console.print("Re-ranking reads the exact vectors from disk (<index>.chunks.vec); they are not held in memory.")
+
+
+def run(rag_cfg: dict, compressions=COMPRESSIONS, sample: int = 50000, queries: int = 200, k: int = 10):
+    """Report memory and recall of each compression on a sample of the saved RAG index."""
+    console = Console()
+    index_path = rag_cfg.get("index_path", "rag_index")
+    if not os.path.exists(index_path + ".faiss"):
+        console.print(f"⚠️ No RAG index at {index_path}.faiss yet.", style="yellow")
+        return []
+    vectors = sample_vectors(index_path, sample)
+    if len(vectors) < 20:
+        console.print(f"⚠️ The RAG index holds only {len(vectors)} vectors; add documents first.", style="yellow")
+        return []
+    console.print(f"📏 Building {len(compressions)} indexes over {len(vectors)} vectors...")
+    rows = compression_report(vectors, rag_cfg, compressions, queries=queries, k=k)
+    print_report(rows, len(vectors), k, console)
+    return rows
@@ -0,0 +1,96 @@
+# src/aiops/journal_state.py
+
+import json
+import os
+from .state_manager import StateManager
+
+
+class JournalStateManager(StateManager):
+    """
+    StateManager backed by a snapshot plus an append-only journal.
+
+    Each operation is appended as one JSON line to `<storage_path>.journal`, so
+    a turn costs O(message) instead of rewriting the whole history. Loading
+    reads the snapshot (same format as the JSON backend) and replays the journal
+    on top of it. Every `compact_every` records the state is written to a new
+    snapshot (temp file + fsync + rename) and the journal is truncated.
+    """
+
+    def __init__(
+            self,
+            storage_path: str = "./.aiops_workspace/.aiops_state.json",
+            compact_every: int = 500,
+            fsync: bool = True,
+    ):
+        self.journal_path = storage_path + ".journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._seq = 0  # sequence number of the last applied operation
+        self._pending = 0  # journal records since the last snapshot
+        self._journal = None
+        super().__init__(storage_path)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        super()._load()
+        self.state.setdefault("conversations", {})
+        self.state.setdefault("current_conversation", None)
+        # Records up to journal_seq are already part of the snapshot; a crash between
+        # writing the snapshot and truncating the journal must not replay them twice
+        self._seq = self.state.pop("journal_seq", 0)
+
+        if os.path.exists(self.journal_path):
+            valid_bytes = 0
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: keep everything before it
+                        break
+                    valid_bytes += len(line)
+                    if record["seq"] > self._seq:
+                        self._apply(record["op"], record["fields"])
+                        self._seq = record["seq"]
+                        self._pending += 1
+            if valid_bytes < os.path.getsize(self.journal_path):
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+        self._journal = open(self.journal_path, "ab")
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def _persist(self, op: str, fields: dict):
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "op": op, "fields": fields}, separators=(",", ":"))
+        self._journal.write(line.encode("utf-8") + b"\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def _save(self):
+        self.state["journal_seq"] = self._seq
+        try:
+            super()._save()
+        finally:
+            self.state.pop("journal_seq", None)
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and start an empty journal."""
+        self._save()
+        self._journal.truncate(0)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending = 0
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,184 @@
+# src/aiops/lexical_index.py
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+import numpy as np
+
+# CLI flags (--dry-run, -n), then words with inner punctuation kept whole
+# (kube-system, nginx.conf, ERR_CONNECTION_REFUSED, 10.0.0.1:8080, /var/log/syslog)
+TOKEN = re.compile(r"(?<![\w-])--?[A-Za-z][\w-]*|\w(?:[\w.:/@=+#-]*\w)?")
+PARTS = re.compile(r"[.:/@=+#_-]+")
+CAMEL = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its my no not of on or "
+    "so that the their then there these this to was what when where which who why will with you your".split()
+)
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    terms,
+    ns UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 0 tokenchars '-_.:/@=+#'"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5vocab(chunks, row);
+"""
+
+
+def tokenize(text: str) -> list:
+    """
+    Lower-cased search terms of `text`. Identifiers stay whole so that an exact
+    error code, pod name or flag matches as one rare term; compound ones also
+    yield their parts (kube-system → kube-system, kube, system;
+    CrashLoopBackOff → crashloopbackoff, crash, loop, back, off).
+    """
+    terms = []
+    for word in text.split():
+        terms.extend(_word_terms(word))
+    return terms
+
+
+@lru_cache(maxsize=65536)
+def _word_terms(word: str) -> tuple:
+    # Cached per whitespace-separated word: text repeats the same words a lot
+    terms = []
+    for token in TOKEN.findall(word):
+        lowered = token.lower()
+        if lowered not in STOPWORDS and (len(lowered) > 1 or lowered.isdigit()):
+            terms.append(lowered)
+        if token.isalnum():
+            # Only camelCase words have parts
+            if token[1:] == lowered[1:] or token.isupper():
+                continue
+            parts = CAMEL.findall(token)
+        else:
+            parts = PARTS.split(token.lstrip("-"))
+        terms.extend(p.lower() for p in parts if len(p) > 1 and p.lower() not in STOPWORDS)
+    return tuple(terms)
+
+
+class LexicalIndex:
+    """
+    BM25 keyword index over RAG chunks, kept next to the FAISS index under the
+    same chunk ids (SQLite FTS5 inverted index, fed with tokenize() terms).
+
+    Dense embeddings miss exact identifiers (error codes, pod names, CLI flags);
+    this finds them. Writes commit right away; rows for chunks that never
+    reached a saved FAISS index are filtered at search time and cleaned up by
+    sync() on the next load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._count = None  # indexed chunks, cached until the next write
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def add(self, ids, texts, namespaces):
+        """Index `texts` under chunk `ids`; `namespaces` is one name per text."""
+        rows = [(int(i), " ".join(tokenize(text)), ns) for i, text, ns in zip(ids, texts, namespaces)]
+        with self._lock:
+            # REPLACE: a backfill by sync() may race another process indexing the same chunk
+            self._db.executemany("INSERT OR REPLACE INTO chunks (rowid, terms, ns) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            self._count = None
+
+    def remove(self, ids):
+        rows = [(int(i),) for i in ids]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE rowid = ?", rows)
+            self._db.commit()
+            self._count = None
+
+    def sync(self, live_ids, next_id: int, store):
+        """
+        Match the chunks of a freshly loaded FAISS index: drop rows of chunks it
+        does not hold, and index the ones missing (from before the lexical index
+        existed, or deleted without the delete reaching the saved index).
+        Rows at or past `next_id` may be another process' unsaved chunks and stay.
+        Returns the number of chunks indexed.
+        """
+        with self._lock:
+            indexed = np.array([r[0] for r in self._db.execute("SELECT rowid FROM chunks")], dtype="int64")
+        live_ids = np.asarray(live_ids, dtype="int64")
+        stale = indexed[(indexed < next_id) & ~np.isin(indexed, live_ids)]
+        self.remove(stale)
+        missing = live_ids[~np.isin(live_ids, indexed)]
+        for start in range(0, len(missing), 5000):
+            batch = missing[start:start + 5000]
+            items = store.get_many(batch)
+            found = [(i, item) for i, item in zip(batch.tolist(), items) if item is not None]
+            self.add(
+                [i for i, _ in found],
+                [text for _, (text, _) in found],
+                [store.docs.get(url, {}).get("ns", "default") for _, (_, url) in found],
+            )
+        return len(missing)
+
+    def optimize(self):
+        """Merge the FTS segments into one (after many writes)."""
+        with self._lock:
+            self._db.execute("INSERT INTO chunks (chunks) VALUES ('optimize')")
+            self._db.commit()
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def __len__(self):
+        with self._lock:
+            if self._count is None:
+                self._count = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return self._count
+
+    def search(self, terms: list, k: int, namespaces=None) -> list:
+        """Best `k` (chunk id, BM25 score) for query `terms`, higher scores first."""
+        terms = list(dict.fromkeys(terms))
+        if not terms or k <= 0:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        sql = "SELECT rowid, -bm25(chunks) FROM chunks WHERE chunks MATCH ?"
+        params = [match]
+        if namespaces:
+            sql += f" AND ns IN ({','.join('?' * len(namespaces))})"
+            params += list(namespaces)
+        sql += " ORDER BY bm25(chunks) LIMIT ?"
+        with self._lock:
+            return self._db.execute(sql, params + [k]).fetchall()
+
+    def idf(self, terms: list) -> dict:
+        """term -> BM25 inverse document frequency (terms in no chunk get the highest)."""
+        terms = list(dict.fromkeys(terms))
+        n = len(self)
+        if not terms:
+            return {}
+        with self._lock:
+            counts = dict(self._db.execute(
+                f"SELECT term, doc FROM chunk_terms WHERE term IN ({','.join('?' * len(terms))})", terms
+            ).fetchall())
+        return {t: math.log(1 + (n - counts.get(t, 0) + 0.5) / (counts.get(t, 0) + 0.5)) for t in terms}
+
+    @staticmethod
+    def coverage(idf: dict, text: str) -> float:
+        """Share of the query's IDF weight found in `text`: 1.0 when it holds every query term."""
+        total = sum(idf.values())
+        if not total:
+            return 0.0
+        found = set(tokenize(text))
+        return sum(w for term, w in idf.items() if term in found) / total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,181 @@
+# src/aiops/llm/async_openai_client.py
+
+import asyncio
+from typing import Optional
+from rich.console import Console
+from .openai_client import build_response_params, StreamedResponse
+from .retry import RetryPolicy
+
+
+class AsyncOpenAIClient:
+    """
+    asyncio counterpart of OpenAIClient.
+
+    All requests share one pooled httpx.AsyncClient (pass `http_client` to share it
+    between clients too), at most `max_concurrency` requests are in flight at once,
+    and retryable failures (429, 5xx, timeouts) are retried by `retry`, honouring
+    Retry-After. `base_url` points the client at another Responses endpoint, e.g. a
+    local mock server.
+    """
+
+    def __init__(
+            self,
+            api_key: str,
+            model: str = "gpt-4o-mini",
+            base_url: Optional[str] = None,
+            retry: Optional[RetryPolicy] = None,
+            max_concurrency: int = 8,
+            max_connections: int = 20,
+            timeout: float = 60.0,
+            http_client=None,
+    ):
+        import httpx
+        import openai
+
+        self.model = model
+        self.retry = retry or RetryPolicy()
+        self.console = Console()
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, http_client=self.http_client
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_config(cls, llm_cfg: dict, api_key: str, http_client=None):
+        return cls(
+            api_key=api_key,
+            model=llm_cfg.get("model", "gpt-4o-mini"),
+            base_url=llm_cfg.get("base_url"),
+            retry=RetryPolicy.from_config(llm_cfg),
+            max_concurrency=llm_cfg.get("max_concurrency", 8),
+            http_client=http_client,
+        )
+
+    async def _call(self, fn, *args, **kwargs):
+        async with self._semaphore:
+            return await self.retry.acall(fn, *args, **kwargs)
+
+    async def aclose(self):
+        if self._owns_http_client:
+            await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # -----------------------------
+    # Conversation Management
+    # -----------------------------
+    async def create_conversation(self) -> str:
+        """Create a new conversation on OpenAI and return its ID."""
+        conv = await self._call(self.client.conversations.create)
+        return conv.id
+
+    async def delete_conversation(self, conv_id: str):
+        """Delete a conversation by ID."""
+        try:
+            await self._call(self.client.conversations.delete, conv_id)
+            return True
+        except Exception as e:
+            self.console.print(f"⚠️ Failed to delete OpenAI conversation {conv_id}: {e}", style="red")
+            return False
+
+    async def send_message(
+            self,
+            conversation_id: str,
+            user_input: str,
+            system_prompts: Optional[list[str]] = None,
+            previous_response_id: Optional[str] = None,
+    ):
+        """
+        Send a message into a conversation and return (response_text, response_id).
+        """
+        params = build_response_params(self.model, conversation_id, user_input, system_prompts, previous_response_id)
+        resp = await self._call(self.client.responses.create, **params)
+
+        try:
+            text = resp.output[0].content[0].text
+        except Exception:
+            text = "(no response)"
+
+        return text, resp.id
+
+    def stream_message(
+            self,
+            conversation_id: str,
+            user_input: str,
+            system_prompts: Optional[list[str]] = None,
+            previous_response_id: Optional[str] = None,
+    ) -> "AsyncStreamedResponse":
+        """
+        Like send_message, but streams the answer.
+        `async for` over the result for text deltas; `text` and `response_id` are set
+        once the stream has been consumed. The stream holds a concurrency slot until then.
+        """
+        params = build_response_params(self.model, conversation_id, user_input, system_prompts, previous_response_id)
+
+        async def events():
+            async with self._semaphore:
+                # Only opening the stream is retried; a stream that fails midway is not replayed
+                stream = await self.retry.acall(self.client.responses.create, stream=True, **params)
+                async for event in stream:
+                    yield event
+
+        return AsyncStreamedResponse(events())
+
+    async def complete(self, prompt: str, instructions: Optional[str] = None) -> str:
+        """
+        Stateless one-off request (not part of any conversation), e.g. for summaries.
+        Returns the answer text.
+        """
+        params = {"model": self.model, "input": [{"role": "user", "content": prompt}]}
+        if instructions:
+            params["instructions"] = instructions
+        resp = await self._call(self.client.responses.create, **params)
+
+        try:
+            return resp.output[0].content[0].text
+        except Exception:
+            return ""
+
+    # -----------------------------
+    # Router (stateless skill selection)
+    # -----------------------------
+    async def ask_router(self, router_prompt: str) -> str:
+        """
+        Ask a lightweight stateless question for skill routing.
+        Returns plain text, expected to be JSON array.
+        """
+        resp = await self._call(
+            self.client.responses.create,
+            model=self.model,
+            input=[{"role": "user", "content": router_prompt}],
+        )
+
+        try:
+            return resp.output[0].content[0].text.strip("`\njson")
+        except Exception:
+            return "[]"
+
+
+class AsyncStreamedResponse(StreamedResponse):
+    """Text deltas from a streamed Responses API call, consumed with `async for`."""
+
+    def __iter__(self):
+        raise TypeError("AsyncStreamedResponse must be consumed with 'async for'.")
+
+    async def __aiter__(self):
+        parts = []
+        async for event in self._events:
+            delta = self._handle(event)
+            if delta:
+                parts.append(delta)
+                yield delta
+        self.text = "".join(parts) or "(no response)"
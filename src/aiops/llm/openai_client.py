@@ -1,28 +1,82 @@
 # src/aiops/llm/openai_client.py
 
 from typing import Optional
-import openai
 from rich.console import Console
+from .retry import RetryPolicy
+
+
+def build_response_params(
+        model: str,
+        conversation_id: Optional[str],
+        user_input: str,
+        system_prompts: Optional[list[str]],
+        previous_response_id: Optional[str],
+) -> dict:
+    """Build the responses.create() arguments shared by the sync and async clients."""
+    input_content = []
+
+    # Add system prompts (skills)
+    if system_prompts:
+        for sp in system_prompts:
+            input_content.append({"role": "system", "content": sp})
+
+    # Add user input
+    input_content.append({"role": "user", "content": user_input})
+
+    # Build request params
+    params = {
+        "model": model,
+        "input": input_content,
+    }
+    if conversation_id and previous_response_id:
+        # Ensure we don't send both at once (mutually exclusive)
+        raise ValueError(
+            "You must provide either a conversation_id or a previous_response_id, not both."
+        )
+    if conversation_id:
+        params["conversation"] = conversation_id
+    elif previous_response_id:
+        params["previous_response_id"] = previous_response_id
+    # Neither: a standalone response that starts a new chain (used to re-seed a broken one)
+    return params
 
 
 class OpenAIClient:
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(
+            self,
+            api_key: str,
+            model: str = "gpt-4o-mini",
+            base_url: Optional[str] = None,
+            retry: Optional[RetryPolicy] = None,
+    ):
+        self.api_key = api_key
         self.model = model
+        self.base_url = base_url
+        self.retry = retry or RetryPolicy()
         self.console = Console()
+        self._client = None
+
+    @property
+    def client(self):
+        # openai (and httpx/pydantic beneath it) is only imported for the first API call
+        if self._client is None:
+            import openai
+            # Retries are handled by self.retry so Retry-After and jitter apply uniformly
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
 
     # -----------------------------
     # Conversation Management
     # -----------------------------
     def create_conversation(self) -> str:
         """Create a new conversation on OpenAI and return its ID."""
-        conv = self.client.conversations.create()
+        conv = self.retry.call(self.client.conversations.create)
         return conv.id
 
     def delete_conversation(self, conv_id: str):
         """Delete a conversation by ID."""
         try:
-            self.client.conversations.delete(conv_id)
+            self.retry.call(self.client.conversations.delete, conv_id)
             return True
         except Exception as e:
             self.console.print(f"⚠️ Failed to delete OpenAI conversation {conv_id}: {e}", style="red")
@@ -39,33 +93,10 @@ class OpenAIClient:
         """
         Send a message into a conversation and return (response_text, response_id).
         """
-        input_content = []
-
-        # Add system prompts (skills)
-        if system_prompts:
-            for sp in system_prompts:
-                input_content.append({"role": "system", "content": sp})
-
-        # Add user input
-        input_content.append({"role": "user", "content": user_input})
-
-        # Build request params
-        params = {
-            "model": self.model,
-            "input": input_content,
-        }
-        if conversation_id and not previous_response_id:
-            params["conversation"] = conversation_id
-        elif previous_response_id and not conversation_id:
-            params["previous_response_id"] = previous_response_id
-        else:
-            # Ensure we don't send both at once (mutually exclusive)
-            raise ValueError(
-                "You must provide either a conversation_id or a previous_response_id, not both."
-            )
+        params = build_response_params(self.model, conversation_id, user_input, system_prompts, previous_response_id)
 
         # Call API
-        resp = self.client.responses.create(**params)
+        resp = self.retry.call(self.client.responses.create, **params)
 
         # Extract assistant response
         try:
@@ -75,6 +106,37 @@ class OpenAIClient:
 
         return text, resp.id
 
+    def stream_message(
+            self,
+            conversation_id: str,
+            user_input: str,
+            system_prompts: Optional[list[str]] = None,
+            previous_response_id: Optional[str] = None,
+    ) -> "StreamedResponse":
+        """
+        Like send_message, but streams the answer.
+        Iterate the returned StreamedResponse for text deltas; its `text` and
+        `response_id` are set once the stream has been consumed.
+        """
+        params = build_response_params(self.model, conversation_id, user_input, system_prompts, previous_response_id)
+        # Only opening the stream is retried; a stream that fails midway is not replayed
+        return StreamedResponse(self.retry.call(self.client.responses.create, stream=True, **params))
+
+    def complete(self, prompt: str, instructions: Optional[str] = None) -> str:
+        """
+        Stateless one-off request (not part of any conversation), e.g. for summaries.
+        Returns the answer text.
+        """
+        params = {"model": self.model, "input": [{"role": "user", "content": prompt}]}
+        if instructions:
+            params["instructions"] = instructions
+        resp = self.retry.call(self.client.responses.create, **params)
+
+        try:
+            return resp.output[0].content[0].text
+        except Exception:
+            return ""
+
     # -----------------------------
     # Router (stateless skill selection)
     # -----------------------------
@@ -83,7 +145,8 @@ class OpenAIClient:
         Ask a lightweight stateless question for skill routing.
         Returns plain text, expected to be JSON array.
         """
-        resp = self.client.responses.create(
+        resp = self.retry.call(
+            self.client.responses.create,
             model=self.model,
             input=[{"role": "user", "content": router_prompt}],
         )
@@ -93,3 +156,32 @@ class OpenAIClient:
             return resp.output[0].content[0].text.strip("`\njson")
         except Exception:
             return "[]"
+
+
+class StreamedResponse:
+    """Text deltas from a streamed Responses API call."""
+
+    def __init__(self, events):
+        self._events = events
+        self.text = ""
+        self.response_id = None
+
+    def _handle(self, event):
+        """Record ids from lifecycle events; return the text delta, if any."""
+        event_type = getattr(event, "type", "")
+        if event_type in ("response.created", "response.completed"):
+            self.response_id = event.response.id
+        elif event_type == "response.output_text.delta":
+            return event.delta
+        elif event_type in ("response.failed", "error"):
+            raise RuntimeError(f"Streaming response failed: {event}")
+        return None
+
+    def __iter__(self):
+        parts = []
+        for event in self._events:
+            delta = self._handle(event)
+            if delta:
+                parts.append(delta)
+                yield delta
+        self.text = "".join(parts) or "(no response)"
@@ -0,0 +1,85 @@
+# src/aiops/llm/retry.py
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff for OpenAI calls.
+
+    Rate limits (429), timeouts, connection errors and 5xx responses are retried up
+    to `max_retries` times. A Retry-After / retry-after-ms header from the server is
+    honoured; otherwise the delay is drawn uniformly from [0, base_delay * 2**attempt]
+    ("full jitter"), capped at `max_delay`.
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, llm_cfg: dict):
+        return cls(
+            max_retries=llm_cfg.get("max_retries", 5),
+            base_delay=llm_cfg.get("retry_base_delay", 0.5),
+            max_delay=llm_cfg.get("retry_max_delay", 30.0),
+        )
+
+    @staticmethod
+    def is_retryable(exc: Exception) -> bool:
+        import openai
+        if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+        return False
+
+    @staticmethod
+    def retry_after(exc: Exception):
+        """Seconds the server asked us to wait, or None."""
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            value = headers.get("retry-after")
+            if not value:
+                return None
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self, attempt: int, exc: Exception) -> float:
+        server_delay = self.retry_after(exc)
+        if server_delay is not None:
+            return min(server_delay, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        """Call `fn`, retrying retryable errors."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                time.sleep(self.delay(attempt, e))
+
+    async def acall(self, fn, *args, **kwargs):
+        """Await `fn(*args, **kwargs)`, retrying retryable errors."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                await asyncio.sleep(self.delay(attempt, e))
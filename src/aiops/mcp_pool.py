@@ -0,0 +1,319 @@
+# src/aiops/mcp_pool.py
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from rich.console import Console
+
+DEFAULT_SERVER_SCRIPT = Path(__file__).parent.parent / "mcp" / "mcp_server.py"
+
+# [mcp] keys passed to the bundled server as MCP_BASH_* environment variables
+_BASH_LIMIT_KEYS = {
+    "bash_timeout": "MCP_BASH_TIMEOUT",
+    "bash_max_output_bytes": "MCP_BASH_MAX_OUTPUT_BYTES",
+    "bash_cpu_seconds": "MCP_BASH_CPU_SECONDS",
+    "bash_memory_mb": "MCP_BASH_MEMORY_MB",
+    "bash_cgroup": "MCP_BASH_CGROUP",
+    "bash_cpu_quota": "MCP_BASH_CPU_QUOTA",
+    "bash_fanout_concurrency": "MCP_BASH_FANOUT_CONCURRENCY",
+    "bash_fanout_max_output_bytes": "MCP_BASH_FANOUT_MAX_OUTPUT_BYTES",
+}
+
+
+class _PooledServer:
+    """One MCP server process and the client session connected to it."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.client = None
+        self.last_used = 0.0
+        self.restarts = 0
+
+
+class MCPServerPool:
+    """
+    A fixed set of long-lived MCP server processes shared by all callers.
+
+    Starting `python mcp_server.py` and doing the MCP handshake costs far more
+    than a small tool call, so the processes are started once and reused. Each
+    call borrows an idle server from a queue; at most `size` calls run at once
+    and the rest wait their turn.
+
+    Servers idle for longer than `health_interval` are probed before they are
+    handed out (and periodically in the background); one that doesn't answer, or
+    that drops its connection during a call, is restarted. A call that was cut
+    off by a crash is not retried, since the tool may already have had effects.
+
+    The pool runs on its own event loop thread, so it can be used from any
+    asyncio loop (`await pool.call_tool(...)`) or plain thread (`call_tool_sync`).
+    """
+
+    def __init__(
+            self,
+            script_path=DEFAULT_SERVER_SCRIPT,
+            size: int = 2,
+            python_cmd: str = sys.executable,
+            env: Optional[dict] = None,
+            health_interval: float = 30.0,
+            probe_timeout: float = 5.0,
+            call_timeout: Optional[float] = None,
+    ):
+        self.script_path = Path(script_path)
+        self.size = size
+        self.python_cmd = python_cmd
+        self.env = env
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self.call_timeout = call_timeout
+        self.console = Console()
+
+        self._servers = [_PooledServer(i) for i in range(size)]
+        self._idle = None  # asyncio.Queue, created on the pool loop
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._started = None  # concurrent Future, resolved once all servers are up
+        self._health_task = None
+
+    @classmethod
+    def from_config(cls, mcp_cfg: dict):
+        # Scripts see the same environment as this process (venv, proxies, credentials...), minus anything listed
+        excluded = set(mcp_cfg.get("env_exclude", []))
+        env = {k: v for k, v in os.environ.items() if k not in excluded}
+        env.update({var: str(mcp_cfg[key]) for key, var in _BASH_LIMIT_KEYS.items() if key in mcp_cfg})
+        return cls(
+            script_path=mcp_cfg.get("server_script") or DEFAULT_SERVER_SCRIPT,
+            size=mcp_cfg.get("pool_size", 2),
+            python_cmd=mcp_cfg.get("python_cmd") or sys.executable,
+            env=env,
+            health_interval=mcp_cfg.get("health_interval", 30.0),
+            call_timeout=mcp_cfg.get("call_timeout"),
+        )
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    async def call_tool(self, name: str, arguments: dict = None, timeout: float = None, progress_handler=None):
+        """Call a tool on a pooled server and return its result data."""
+        future = self._submit(self._call(name, arguments, timeout, progress_handler))
+        return await asyncio.wrap_future(future)
+
+    def call_tool_sync(self, name: str, arguments: dict = None, timeout: float = None, progress_handler=None):
+        """Blocking call_tool, for callers that are not running an event loop."""
+        return self._submit(self._call(name, arguments, timeout, progress_handler)).result()
+
+    async def run_script(self, script: str, timeout: float = None, on_output=None) -> dict:
+        """
+        Run a bash script through the server's run_bash tool.
+        `on_output(text)` receives the script's output while it runs.
+        """
+        return await self.call_tool(**_run_bash_call(script, timeout, on_output))
+
+    def run_script_sync(self, script: str, timeout: float = None, on_output=None) -> dict:
+        return self.call_tool_sync(**_run_bash_call(script, timeout, on_output))
+
+    async def run_fanout(
+            self, script: str, targets: list, max_concurrency: int = None, timeout: float = None, on_result=None
+    ) -> dict:
+        """
+        Run a script template across `targets` with the server's run_bash_fanout tool.
+        `on_result(summary)` receives {"target", "exit_code", "timed_out", "duration"}
+        as each target finishes.
+        """
+        return await self.call_tool(**_fanout_call(script, targets, max_concurrency, timeout, on_result))
+
+    def run_fanout_sync(
+            self, script: str, targets: list, max_concurrency: int = None, timeout: float = None, on_result=None
+    ) -> dict:
+        return self.call_tool_sync(**_fanout_call(script, targets, max_concurrency, timeout, on_result))
+
+    def close(self):
+        """Stop all server processes and the pool's loop thread."""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = self._thread = self._started = None
+
+    # -----------------------------
+    # Pool loop
+    # -----------------------------
+    def _submit(self, coro):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+                self._thread.start()
+                self._started = asyncio.run_coroutine_threadsafe(self._start(), self._loop)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        results = await asyncio.gather(*(self._connect(s) for s in self._servers), return_exceptions=True)
+        for server, result in zip(self._servers, results):
+            if isinstance(result, Exception):
+                # Left in the pool; it is reconnected when next handed out
+                self.console.print(f"⚠️ MCP server {server.index} failed to start: {result}", style="yellow")
+            self._idle.put_nowait(server)
+        self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def _shutdown(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for server in self._servers:
+            await self._disconnect(server)
+
+    async def _connect(self, server: _PooledServer):
+        from fastmcp import Client
+        from fastmcp.client.transports import PythonStdioTransport
+
+        transport = PythonStdioTransport(
+            self.script_path, python_cmd=self.python_cmd, env=self.env, keep_alive=False
+        )
+        client = Client(transport)
+        await client.__aenter__()
+        server.client = client
+        server.last_used = time.monotonic()
+
+    async def _disconnect(self, server: _PooledServer):
+        client, server.client = server.client, None
+        if client is not None:
+            try:
+                await client.close()
+            except Exception:
+                pass  # already dead
+
+    async def _restart(self, server: _PooledServer):
+        server.restarts += 1
+        self.console.print(f"🔄 Restarting MCP server {server.index} (restart #{server.restarts})", style="yellow")
+        await self._disconnect(server)
+        await self._connect(server)
+
+    async def _healthy(self, server: _PooledServer) -> bool:
+        if server.client is None or not server.client.is_connected():
+            return False
+        try:
+            # A tools listing rather than ping: every server answers it, and it exercises a real request
+            await asyncio.wait_for(server.client.list_tools(), self.probe_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _checked(self, server: _PooledServer):
+        """Make sure `server` is usable, restarting it if it stopped answering."""
+        stale = time.monotonic() - server.last_used > self.health_interval
+        if server.client is None or (stale and not await self._healthy(server)):
+            await self._restart(server)
+            return
+        server.last_used = time.monotonic()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # Check only idle servers; busy ones are checked when a call fails
+            for _ in range(self._idle.qsize()):
+                server = self._idle.get_nowait()
+                try:
+                    await self._checked(server)
+                except Exception as e:
+                    self.console.print(f"⚠️ MCP server {server.index} is down: {e}", style="yellow")
+                finally:
+                    self._idle.put_nowait(server)
+
+    async def _call(self, name, arguments, timeout, progress_handler):
+        from fastmcp.exceptions import ToolError
+
+        await asyncio.wrap_future(self._started)
+        server = await self._idle.get()
+        try:
+            await self._checked(server)
+            result = await server.client.call_tool(
+                name,
+                arguments or {},
+                timeout=timeout or self.call_timeout,
+                progress_handler=progress_handler,
+            )
+            server.last_used = time.monotonic()
+            return _result_data(result)
+        except ToolError:
+            server.last_used = time.monotonic()
+            raise
+        except Exception:
+            if not await self._healthy(server):
+                try:
+                    await self._restart(server)
+                except Exception as e:
+                    self.console.print(f"⚠️ MCP server {server.index} failed to restart: {e}", style="yellow")
+            raise
+        finally:
+            self._idle.put_nowait(server)
+
+
+def _run_bash_call(script: str, timeout: float, on_output) -> dict:
+    """call_tool arguments for run_bash, with output chunks (sent as progress messages) passed to `on_output`."""
+    arguments = {"script": script, "stream": on_output is not None}
+    if timeout:
+        arguments["timeout"] = timeout
+    async def forward(progress, total, message):
+        if message:
+            on_output(message)
+
+    progress_handler = forward if on_output is not None else None
+    # The script's own timeout applies; the call itself gets a little longer to report it
+    return {
+        "name": "run_bash",
+        "arguments": arguments,
+        "timeout": timeout + 10 if timeout else None,
+        "progress_handler": progress_handler,
+    }
+
+
+def _fanout_call(script: str, targets: list, max_concurrency: int, timeout: float, on_result) -> dict:
+    """call_tool arguments for run_bash_fanout, with per-target summaries (JSON progress messages) passed to `on_result`."""
+    arguments = {"script": script, "targets": list(targets)}
+    if max_concurrency:
+        arguments["max_concurrency"] = max_concurrency
+    if timeout:
+        arguments["timeout"] = timeout
+    async def forward(progress, total, message):
+        if message:
+            on_result(json.loads(message))
+
+    progress_handler = forward if on_result is not None else None
+    return {"name": "run_bash_fanout", "arguments": arguments, "progress_handler": progress_handler}
+
+
+def _result_data(result):
+    """The tool's return value: structured data if the server sent it, else the text content."""
+    if getattr(result, "data", None) is not None:
+        return result.data
+    if getattr(result, "structured_content", None):
+        return result.structured_content
+    texts = [block.text for block in getattr(result, "content", []) if hasattr(block, "text")]
+    return "\n".join(texts)
+
+
+# -----------------------------
+# Shared pool
+# -----------------------------
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_pool(mcp_cfg: dict = None) -> MCPServerPool:
+    """The process-wide pool, created from `mcp_cfg` (or the [mcp] config section) on first use."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            if mcp_cfg is None:
+                from .config import Config
+                mcp_cfg = Config().load_config().get("mcp", {})
+            _shared_pool = MCPServerPool.from_config(mcp_cfg)
+        return _shared_pool
@@ -1,27 +1,108 @@
 # src/aiops/orchestrator.py
 
 import sys
-from pyexpat.errors import messages
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
+from rich.live import Live
+from rich.text import Text
 from .skills_loader import load_skills
 from .skills_router import SkillRouter
 import readline
-from .rag import WebRAG
 from .config import Config
+from .turn_pipeline import TurnPipeline, TurnCancelled
+from .context_builder import ContextBuilder, TokenCounter
+from .summarizer import ConversationSummarizer, seeded_input
 
 
 class Orchestrator:
-    def __init__(self, client, state_manager):
-        self.rag = WebRAG()
+    def __init__(
+            self,
+            client,
+            state_manager,
+            warm_start: bool = True,
+            console: Console = None,
+            shared: "Orchestrator" = None,
+            pipeline_workers: int = None,
+    ):
+        """
+        `shared` is another Orchestrator whose skills, router, RAG index, turn pipeline
+        and context builder are reused, so many sessions (see aiops.server) can run on
+        one warm set of components with their own StateManager. `pipeline_workers`
+        overrides pipeline.max_workers.
+        """
         self.cfg = Config().load_config()
         self.client = client
         self.state_manager = state_manager
+        self.console = console or Console()
+        self._rag = None
+        self._rag_lock = threading.Lock()
+
+        # One background thread for summaries, shared by all sessions of a server
+        self.summary_executor = shared.summary_executor if shared is not None else ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="summarize"
+        )
+        session_cfg = self.cfg.get("session", {})
+        self.summarizer = None
+        if session_cfg.get("summarize", True) and state_manager is not None:
+            self.summarizer = ConversationSummarizer.from_config(
+                client, state_manager, session_cfg, executor=self.summary_executor
+            )
+
+        if shared is not None:
+            self.skills = shared.skills
+            self.router = shared.router
+            self.pipeline = shared.pipeline
+            self.context_builder = shared.context_builder
+            self._rag = shared.rag
+            return
+
         self.skills = load_skills()
-        self.router = SkillRouter(client, self.skills)
-        self.console = Console()
+        router_cfg = self.cfg.get("router", {})
+        # Reuse the RAG embedding model; it is only loaded if local routing needs it, and
+        # never when RAG is disabled unless router.embeddings turns it on explicitly
+        use_embeddings = router_cfg.get("embeddings", self.cfg.get("rag", {}).get("allow_rag", True))
+        self.router = SkillRouter(
+            client,
+            self.skills,
+            cache_size=router_cfg.get("cache_size", 256),
+            near_duplicate_threshold=router_cfg.get("near_duplicate_threshold", 0.85),
+            mode=router_cfg.get("mode", "llm"),
+            embed_fn=(lambda texts: self.rag.embed(texts)) if use_embeddings else None,
+            min_confidence=router_cfg.get("min_confidence", 0.45),
+            max_skills=router_cfg.get("max_skills", 2),
+        )
+        pipeline_cfg = self.cfg.get("pipeline", {})
+        self.pipeline = TurnPipeline(
+            max_workers=pipeline_workers or pipeline_cfg.get("max_workers", 4),
+            timeouts={
+                "routing": pipeline_cfg.get("routing_timeout", 10),
+                "conversation": pipeline_cfg.get("conversation_timeout", 15),
+                "rag": pipeline_cfg.get("rag_timeout", 20),
+            },
+        )
+        self.context_builder = ContextBuilder(
+            TokenCounter(self.cfg.get("llm", {}).get("model", "gpt-4o-mini")),
+            context_budget=self.cfg.get("rag", {}).get("context_token_budget", 1500),
+            max_prompt_tokens=self.cfg.get("llm", {}).get("max_prompt_tokens", 8000),
+        )
+        # Load the embedding model and index off the main thread so the prompt shows immediately
+        rag_cfg = self.cfg.get("rag", {})
+        if warm_start and rag_cfg.get("allow_rag", True) and rag_cfg.get("warm_start", True):
+            self.rag.warm_up_in_background()
+
+    @property
+    def rag(self):
+        """The WebRAG instance, created on first use (it imports nothing heavy until queried)."""
+        if self._rag is None:
+            with self._rag_lock:
+                if self._rag is None:
+                    from .rag import WebRAG
+                    self._rag = WebRAG()
+        return self._rag
 
     def start(self):
         """Start the interactive CLI loop."""
@@ -73,8 +154,14 @@ class Orchestrator:
                 self.history()
                 continue
 
-            # Otherwise, treat it as a user query
-            self.handle_user_input(user_input)
+            # Otherwise, treat it as a user query; Ctrl-C cancels the turn, not the session
+            try:
+                self.handle_user_input(user_input)
+            except (TurnCancelled, KeyboardInterrupt):
+                self.console.print("\n⏹️  Turn cancelled.", style="yellow")
+            except Exception as e:
+                # A failed turn (no conversation, API error, stage timeout) must not end the session
+                self.console.print(f"❌ Turn failed: {e}", style="red")
 
     def print_help(self):
         table = Table(show_header=True, header_style="bold magenta")
@@ -138,9 +225,12 @@ class Orchestrator:
             else:
                 created_s = str(created)[:19] if created else ""
 
-            # Number of messages
-            messages = meta.get("messages") or []
-            msg_count = len(messages) if isinstance(messages, (list, tuple)) else 0
+            # Number of messages (metadata-only backends report a count instead of the list)
+            if "message_count" in meta:
+                msg_count = meta["message_count"]
+            else:
+                messages = meta.get("messages") or []
+                msg_count = len(messages) if isinstance(messages, (list, tuple)) else 0
 
             # Last response id
             last_resp = meta.get("last_response_id") or ""
@@ -185,6 +275,9 @@ class Orchestrator:
             table.add_column("Role", style="cyan", width=12)
             table.add_column("Content", style="white")
 
+            summary = self.state_manager.get_summary(conv_id)
+            if summary:
+                table.add_row("summary", summary, style="dim")
             for msg in messages:
                 table.add_row(msg["role"], msg["content"])
 
@@ -209,99 +302,190 @@ class Orchestrator:
         title = conversations.get(conv_id, {}).get("title", "Untitled")
         self.console.print(f"🟢 Active conversation: {conv_id} - {title}", style="green")
 
-    def augment_with_rag(self, user_prompt: str) -> str:
-        similarity_threshold = self.cfg.get("rag", {}).get("similarity_threshold", 0.6)
-        retrieved = self.rag.query(user_prompt, top_k=3, min_similarity=similarity_threshold)
+    def augment_with_rag(self, user_prompt: str, cancel=None) -> list[dict]:
+        """Return retrieved chunks for the prompt, searching the web if the local index has nothing relevant."""
+        rag_cfg = self.cfg.get("rag", {})
+        similarity_threshold = rag_cfg.get("similarity_threshold", 0.6)
+        top_k = rag_cfg.get("top_k", 8)
+        namespaces = rag_cfg.get("query_namespaces") or None
+        retrieved = self.rag.hybrid_query(
+            user_prompt, top_k=top_k, min_similarity=similarity_threshold, namespace=namespaces
+        )
 
-        if not retrieved:
+        if not retrieved and not (cancel and cancel.is_set()):
             # If nothing found, do web search and re-query
-            self.rag.web_search_and_store(user_prompt)
-            retrieved = self.rag.query(user_prompt, top_k=3)
+            self.rag.web_search_and_store(user_prompt, cancel=cancel)
+            retrieved = self.rag.hybrid_query(
+                user_prompt, top_k=top_k, min_similarity=similarity_threshold, namespace=namespaces
+            )
 
-        if not retrieved:
-            # fallback → still wrap in dict format
-            retrieved = [{"text": user_prompt, "url": "local"}]
+        return retrieved
 
-        context = "\n".join([f"- {item['text']} (Source: {item['url']})" for item in retrieved])
-        self.console.print(f"🔍 Retrieved {len(context)} relevant documents via RAG.", style="green")
+    def ensure_conversation(self):
+        """Return (conv_id, last_response_id) for the active conversation, creating one if needed."""
+        conv_id = self.state_manager.get_current_conversation()
+        if not conv_id:
+            conv_id = self.client.create_conversation()
+            self.state_manager.add_conversation(conv_id, title="Untitled")
+            self.state_manager.set_current_conversation(conv_id)
 
-        return f"""User request:
-    {user_prompt}
-    
-    Relevant context:
-    {context}
-    """
+        # Get last response_id if conversation already has messages
+        conv_meta = self.state_manager.list_conversations().get(conv_id, {})
+        return conv_id, conv_meta.get("last_response_id")
 
     def handle_user_input(self, user_input: str):
-        """Route the user input to skills, send to OpenAI, and handle response."""
+        """Route the user input to skills, send to OpenAI, and print the response."""
+        if not self.cfg.get("llm", {}).get("stream", False):
+            response, _ = self.run_turn(user_input)
+            self.console.print(f"\n🤖 {response}\n", style="bold white")
+            return
+
+        # Live re-renders the Text as deltas are appended, so the answer appears token by token.
+        # It starts on the first delta so status lines printed during the turn come out first.
+        text = Text("🤖 ", style="bold white")
+        live = None
+
+        def on_delta(delta: str):
+            nonlocal live
+            if live is None:
+                self.console.print()
+                live = Live(text, console=self.console, refresh_per_second=15, vertical_overflow="visible")
+                live.start()
+            text.append(delta)
+
+        try:
+            self.run_turn(user_input, on_delta=on_delta)
+        finally:
+            if live is not None:
+                live.stop()
+                self.console.print()
+
+    def run_turn(self, user_input: str, on_delta=None, cancel: threading.Event = None):
+        """
+        Run one turn without printing the answer: route, retrieve, send and save.
+        If `on_delta` is given the answer is streamed and each text delta is passed
+        to it as it arrives. Returns (response_text, response_id).
+        `cancel` stops the RAG stage's web search; the turn sets it itself when
+        that stage times out.
+        """
 
-        # 1. Route to skills using AI
-        chosen_skills = self.router.select_skills(user_input)
+        # 1. Skill routing, conversation setup and RAG retrieval don't depend on each other → run them concurrently
+        cancel = cancel or threading.Event()
+        stages = {
+            "routing": lambda: self.router.select_skills(user_input),
+            "conversation": self.ensure_conversation,
+        }
+        if self.cfg.get("rag", {}).get("allow_rag", True):
+            stages["rag"] = lambda: self.augment_with_rag(user_input, cancel=cancel)
+        results, errors = self.pipeline.run(stages, cancel)
+        if isinstance(errors.get("rag"), TimeoutError):
+            # The stage keeps running after its deadline: stop its web search so it frees its worker
+            cancel.set()
+
+        # 2. A conversation is required; without one the turn can't be sent
+        if "conversation" in errors:
+            raise errors["conversation"]
+        conv_id, prev_resp_id = results["conversation"]
+
+        # 3. Collect system prompts of the chosen skills
+        if "routing" in errors:
+            self.console.print(f"⚠️ Skill routing failed: {errors['routing']}", style="yellow")
+        chosen_skills = results.get("routing")
         if not chosen_skills:
             self.console.print("⚠️ No matching skills found. Proceeding with just user input.", style="yellow")
             system_prompts = None
         else:
-            # 2. Collect system prompts
             system_prompts = [self.skills[name]["system_prompt"] for name in chosen_skills]
 
-        # 3. Ensure a conversation exists
-        conv_id = self.state_manager.get_current_conversation()
-        if not conv_id:
-            conv_id = self.client.create_conversation()
-            self.state_manager.add_conversation(conv_id, title="Untitled")
-            self.state_manager.set_current_conversation(conv_id)
-
-        # 4. Get last response_id if conversation already has messages
-        conv_meta = self.state_manager.list_conversations().get(conv_id, {})
-        prev_resp_id = conv_meta.get("last_response_id")
-
-        # 5. If RAG is enabled, perform web search and add context
-        if self.cfg.get("rag", {}).get("allow_rag", True):
-            retrieved = self.augment_with_rag(user_input)
-            if retrieved:
-                # context = "\n".join([f"- {item['text']} (Source: {item['url']})" for item in retrieved])
-                user_input = f"{user_input}\n\nRelevant information:\n{retrieved}"
-                self.console.print(f"🔍 Retrieved {len(retrieved)} relevant documents via RAG.", style="green")
+        # 4. Pack the best RAG chunks into the prompt within the token budget
+        prompt = user_input
+        if "rag" in stages:
+            if "rag" in errors:
+                self.console.print(f"⚠️ RAG retrieval skipped: {errors['rag']}", style="yellow")
+            prompt, used = self.context_builder.build(user_input, results.get("rag") or [], system_prompts)
+            if used:
+                self.console.print(f"🔍 Retrieved {len(used)} relevant documents via RAG.", style="green")
             else:
                 self.console.print("🔍 No relevant documents found via RAG.", style="yellow")
 
-        # 6. Send message to OpenAI
-        response, resp_id = self.client.send_message(
-            conversation_id=conv_id if not prev_resp_id else None,
-            previous_response_id=prev_resp_id if prev_resp_id else None,
-            user_input=user_input,
-            system_prompts=system_prompts,
-        )
-
-        # 6. Save both user and assistant messages locally
+        # 5. Send message to OpenAI (streamed if the caller wants deltas)
+        try:
+            response, resp_id = self.send(
+                conversation_id=conv_id if not prev_resp_id else None,
+                previous_response_id=prev_resp_id if prev_resp_id else None,
+                user_input=prompt,
+                system_prompts=system_prompts,
+                on_delta=on_delta,
+            )
+        except Exception as e:
+            if not (prev_resp_id and _is_broken_chain(e)):
+                raise
+            # The stored response chain expired or was deleted: start a new one from the summary.
+            # Sent with neither id; the new response id is saved below and the next turn chains from it
+            self.console.print("🔗 Previous response is gone; re-seeding from the conversation summary.", style="yellow")
+            recent = self.state_manager.get_history(conv_id, limit=self.cfg.get("session", {}).get("reseed_messages", 6))
+            response, resp_id = self.send(
+                conversation_id=None,
+                previous_response_id=None,
+                user_input=seeded_input(self.state_manager.get_summary(conv_id), recent, prompt),
+                system_prompts=system_prompts,
+                on_delta=on_delta,
+            )
+
+        # 6. Save both user and assistant messages locally (raw input only; the context is not history)
         self.state_manager.update_conversation(
             conv_id, resp_id, user_input, response
         )
 
-        # 7. Show response
-        self.console.print(f"\n🤖 {response}\n", style="bold white")
-
+        # 7. Fold old turns into the summary in the background once the conversation is long
+        if self.summarizer:
+            self.summarizer.maybe_summarize(conv_id)
+        return response, resp_id
+
+    def send(self, conversation_id, previous_response_id, user_input, system_prompts, on_delta=None):
+        """Send a turn to the model, streaming it into `on_delta` if given. Returns (response_text, response_id)."""
+        if on_delta is None:
+            return self.client.send_message(
+                conversation_id=conversation_id,
+                previous_response_id=previous_response_id,
+                user_input=user_input,
+                system_prompts=system_prompts,
+            )
+
+        stream = self.client.stream_message(
+            conversation_id=conversation_id,
+            previous_response_id=previous_response_id,
+            user_input=user_input,
+            system_prompts=system_prompts,
+        )
+        for delta in stream:
+            on_delta(delta)
+        return stream.text, stream.response_id
+
+    async def run_script_via_mcp(self, script: str, timeout: float = None):
+        """Run a bash script on the shared pool of long-lived MCP servers, printing its output as it arrives."""
+        from .mcp_pool import get_pool
+        return await get_pool(self.cfg.get("mcp", {})).run_script(
+            script,
+            timeout=timeout,
+            on_output=lambda text: self.console.print(text, end="", markup=False, highlight=False),
+        )
 
+    async def run_fanout_via_mcp(self, script: str, targets: list, timeout: float = None):
+        """Run a script template across many targets on the MCP pool, printing each target as it finishes."""
+        from .mcp_pool import get_pool
 
-    async def connect_to_mcp(self):
-        # Spawn the server
-        server = subprocess.Popen(
-            ["python", "mcp_server.py"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        def on_result(r):
+            ok = r["exit_code"] == 0
+            status = "timed out" if r["timed_out"] else f"exit {r['exit_code']}"
+            self.console.print(f"{'✅' if ok else '❌'} {r['target']}: {status} ({r['duration']}s)", style="green" if ok else "red")
 
-        client = StdioClient(stdin=server.stdin, stdout=server.stdout)
+        return await get_pool(self.cfg.get("mcp", {})).run_fanout(script, targets, timeout=timeout, on_result=on_result)
 
-        await client.start()
-        return client, server
 
-    async def run_script_via_mcp(self, script: str):
-        client, server = await self.connect_to_mcp()
-        try:
-            result = await client.call_tool("run_bash", {"script": script})
-            return result
-        finally:
-            server.kill()
+def _is_broken_chain(exc: Exception) -> bool:
+    """Whether the API rejected a request because its previous_response_id no longer exists."""
+    import openai
+    if not isinstance(exc, (openai.BadRequestError, openai.NotFoundError)):
+        return False
+    return getattr(exc, "param", None) == "previous_response_id" or "previous response" in str(exc).lower()
@@ -0,0 +1,196 @@
+# src/aiops/page_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+class PageCache:
+    """
+    On-disk HTTP response cache for fetched pages.
+
+    Entries are keyed by normalized URL and point at content-addressed bodies
+    (blobs/<sha256>), so identical pages served from different URLs are stored once.
+    Entries younger than `ttl` are served without touching the network; older ones
+    keep their ETag / Last-Modified validators for a conditional request.
+    Entries unused for `max_idle` seconds are dropped, and the least recently used
+    ones are evicted once bodies exceed `max_bytes`. Access times are tracked in
+    memory and written back at most every `touch_interval` seconds per entry, so
+    cache hits don't rewrite metadata files.
+    """
+
+    def __init__(
+            self,
+            cache_dir: str,
+            ttl: float = 3600,
+            max_idle: float = 7 * 24 * 3600,
+            max_bytes: int = 200 * 1024 * 1024,
+            touch_interval: float = 3600,
+    ):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.ttl = ttl
+        self.max_idle = max_idle
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> meta dict
+        self._accessed_on_disk = {}  # key -> accessed_at last written to its meta file
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._load()
+
+    # -----------------------------
+    # Keys
+    # -----------------------------
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """Lower-case scheme/host, drop default ports and fragments, sort query parameters."""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+            host = f"{host}:{parts.port}"
+        path = parts.path or "/"
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((scheme, host, path, query, ""))
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(self.normalize_url(url).encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, fname), "r") as f:
+                    meta = json.load(f)
+                self._accessed_on_disk[fname[:-5]] = meta["accessed_at"]
+                self._entries[fname[:-5]] = meta
+            except Exception:
+                # Corrupt entry: forget it, the page will simply be fetched again
+                os.remove(os.path.join(self.cache_dir, fname))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _write_meta(self, key: str, meta: dict):
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+        self._accessed_on_disk[key] = meta["accessed_at"]
+
+    # -----------------------------
+    # Lookup / store
+    # -----------------------------
+    def lookup(self, url: str):
+        """
+        Return the cached entry for `url` as a dict with `body`, `etag`, `last_modified`
+        and `fresh` (True when still within the TTL), or None on a miss.
+        """
+        key = self._key(url)
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is None:
+                return None
+            try:
+                with open(self._blob_path(meta["content_hash"]), "r", encoding="utf-8") as f:
+                    body = f.read()
+            except FileNotFoundError:
+                self._drop(key)
+                return None
+            meta["accessed_at"] = time.time()
+            if meta["accessed_at"] - self._accessed_on_disk.get(key, 0) >= self.touch_interval:
+                self._write_meta(key, meta)
+        return {
+            "body": body,
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+            "fresh": time.time() - meta["fetched_at"] < self.ttl,
+        }
+
+    def revalidated(self, url: str):
+        """Mark a cached entry as fresh again after a 304 Not Modified."""
+        key = self._key(url)
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is not None:
+                meta["fetched_at"] = time.time()
+                self._write_meta(key, meta)
+
+    def store(self, url: str, body: str, etag: str = None, last_modified: str = None):
+        data = body.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        key = self._key(url)
+        now = time.time()
+        with self._lock:
+            if not os.path.exists(self._blob_path(content_hash)):
+                self._write_atomic(self._blob_path(content_hash), data)
+            old = self._entries.get(key)
+            meta = {
+                "url": self.normalize_url(url),
+                "content_hash": content_hash,
+                "size": len(data),
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": now,
+                "accessed_at": now,
+            }
+            self._entries[key] = meta
+            self._write_meta(key, meta)
+            if old and old["content_hash"] != content_hash:
+                self._remove_blob_if_unused(old["content_hash"])
+            self._evict()
+
+    # -----------------------------
+    # Eviction
+    # -----------------------------
+    def _remove_blob_if_unused(self, content_hash: str) -> int:
+        """Delete a body no entry points at any more; return the bytes freed."""
+        if any(m["content_hash"] == content_hash for m in self._entries.values()):
+            return 0
+        path = self._blob_path(content_hash)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _drop(self, key: str) -> int:
+        meta = self._entries.pop(key, None)
+        self._accessed_on_disk.pop(key, None)
+        try:
+            os.remove(self._meta_path(key))
+        except FileNotFoundError:
+            pass
+        return self._remove_blob_if_unused(meta["content_hash"]) if meta else 0
+
+    def _total_bytes(self) -> int:
+        # Bodies are shared between URLs with identical content, so count each blob once
+        return sum({m["content_hash"]: m["size"] for m in self._entries.values()}.values())
+
+    def _evict(self):
+        now = time.time()
+        for key, meta in list(self._entries.items()):
+            if now - meta["accessed_at"] > self.max_idle:
+                self._drop(key)
+
+        total = self._total_bytes()
+        for key, _ in sorted(self._entries.items(), key=lambda kv: kv[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._drop(key)
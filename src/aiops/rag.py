@@ -1,40 +1,221 @@
-from sentence_transformers import SentenceTransformer
-from duckduckgo_search import DDGS
-import requests
-from bs4 import BeautifulSoup
-import faiss
+import hashlib
 import os
 import pickle
+import threading
+import time
+from rich.console import Console
 from .config import Config
+from .chunk_store import ChunkStore
+
+# sentence_transformers (torch), faiss, requests and bs4 are imported on first use
+# so that constructing WebRAG costs nothing until RAG is actually needed.
 
 
 class WebRAG:
     def __init__(self):
         self.cfg = Config().load_config()
         self.index_path = self.cfg.get("rag", {}).get("index_path", "rag_index")
-        self.model = SentenceTransformer(self.cfg.get("rag", {}).get("model_name", "all-MiniLM-L6-v2"))
+        self.rag_cfg = self.cfg.get("rag", {})
+        self.batch_size = self.rag_cfg.get("embed_batch_size", 64)
+        self._model = None
+        self._fetcher = None
+        self._embedding_cache = None
+        self._lexical = None
+        self._cross_encoder = None
         self.index = None
-        self.chunks = []
-        self.urls = []  # map chunks back to source URLs
-        self._load_index()
+        self.store = None  # ChunkStore: text and source URL of each indexed vector
+        self._lock = threading.RLock()
+        self._init_lock = threading.Lock()  # guards lazy model/fetcher creation
+        self._loaded_mtimes = None  # mtime of the .faiss file the live index was read from
+        self._dirty = False  # live index has changes not yet written to disk
+        self._changes = 0  # bumped on every change to the live index, see maintain()
+        self._maintenance = None  # background maintain() thread, see start_maintenance()
+        self._stop_maintenance = threading.Event()
+        # Nothing is read here: the index is loaded by the first _refresh_if_stale()
+
+    # -----------------------------
+    # Lazy components
+    # -----------------------------
+    @property
+    def model(self):
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.rag_cfg.get("model_name", "all-MiniLM-L6-v2"))
+        return self._model
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            with self._init_lock:
+                if self._fetcher is None:
+                    from .web_fetcher import WebFetcher
+                    from .page_cache import PageCache
+                    page_cache = None
+                    if self.rag_cfg.get("page_cache", True):
+                        page_cache = PageCache(
+                            self.rag_cfg.get("page_cache_dir", "./.aiops_workspace/page_cache"),
+                            ttl=self.rag_cfg.get("page_cache_ttl", 3600),
+                            max_idle=self.rag_cfg.get("page_cache_max_idle", 7 * 24 * 3600),
+                            max_bytes=int(self.rag_cfg.get("page_cache_max_mb", 200) * 1024 * 1024),
+                            touch_interval=self.rag_cfg.get("page_cache_touch_interval", 3600),
+                        )
+                    self._fetcher = WebFetcher(
+                        max_workers=self.rag_cfg.get("fetch_workers", 8),
+                        timeout=self.rag_cfg.get("fetch_timeout", 10),
+                        deadline=self.rag_cfg.get("fetch_deadline", 15),
+                        cache=page_cache,
+                    )
+        return self._fetcher
+
+    @fetcher.setter
+    def fetcher(self, fetcher):
+        self._fetcher = fetcher
+
+    @property
+    def embedding_cache(self):
+        if self._embedding_cache is None and self.rag_cfg.get("embedding_cache", True):
+            with self._init_lock:
+                if self._embedding_cache is None:
+                    from .embedding_cache import EmbeddingCache
+                    self._embedding_cache = EmbeddingCache.from_config(self.rag_cfg)
+        return self._embedding_cache
+
+    @property
+    def lexical(self):
+        """BM25 index over the same chunks (None when `hybrid` is off)."""
+        if self._lexical is None and self.rag_cfg.get("hybrid", True):
+            with self._init_lock:
+                if self._lexical is None:
+                    from .lexical_index import LexicalIndex
+                    self._lexical = LexicalIndex(self.index_path + ".lex.db")
+        return self._lexical
+
+    @property
+    def cross_encoder(self):
+        if self._cross_encoder is None and self.rag_cfg.get("cross_encoder", False):
+            with self._init_lock:
+                if self._cross_encoder is None:
+                    from sentence_transformers import CrossEncoder
+                    self._cross_encoder = CrossEncoder(
+                        self.rag_cfg.get("cross_encoder_model", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+                    )
+        return self._cross_encoder
+
+    def _encode(self, texts):
+        return self.model.encode(
+            list(texts), batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+        )
+
+    def embed(self, texts):
+        """
+        Encode `texts` into a float32 array, one row per text. Texts embedded
+        before (by this or another process) come from the cache, and the model
+        is not even loaded when every text is cached.
+        """
+        cache = self.embedding_cache
+        if cache is None:
+            return self._encode(texts)
+        return cache.embed(self.rag_cfg.get("model_name", "all-MiniLM-L6-v2"), texts, self._encode)
+
+    def warm_up(self):
+        """Import the heavy modules, load the embedding model and read the index."""
+        _ = self.model
+        _ = self.embedding_cache
+        _ = self.cross_encoder
+        with self._lock:
+            self._refresh_if_stale()
+        self.start_maintenance()
+
+    def warm_up_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, name="rag-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def doc_hashes(self) -> dict:
+        """url -> content hash of the text indexed for it"""
+        return self.store.doc_hashes if self.store is not None else {}
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def _disk_mtimes(self):
+        # The .faiss file is replaced last on save, so its mtime marks a complete write
+        try:
+            return os.stat(self.index_path + ".faiss").st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _migrate_pickle(self):
+        """Move chunks from the old single-pickle format into a ChunkStore."""
+        pkl_path = self.index_path + ".pkl"
+        if not os.path.exists(pkl_path) or ChunkStore.exists(self.index_path):
+            return
+        with open(pkl_path, "rb") as f:
+            data = pickle.load(f)
+        ChunkStore.from_lists(
+            self.index_path, data.get("chunks", []), data.get("urls", []), data.get("doc_hashes", {})
+        ).close()
+        os.remove(pkl_path)
 
     def _load_index(self):
-        if os.path.exists(self.index_path + ".faiss") and os.path.exists(self.index_path + ".pkl"):
-            self.index = faiss.read_index(self.index_path + ".faiss")
-            with open(self.index_path + ".pkl", "rb") as f:
-                data = pickle.load(f)
-                self.chunks = data.get("chunks", [])
-                self.urls = data.get("urls", [])
-                #self.chunks, self.urls = pickle.load(f)
-        else:
-            self.index = None
-            self.chunks, self.urls = [], []
+        with self._lock:
+            if self.store is not None:
+                self.store.close()
+            if self.index is not None:
+                self.index.close()
+            mtimes = self._disk_mtimes()
+            if mtimes is not None:
+                from .vector_index import VectorIndex, read_index, stored_ids
+                self._migrate_pickle()
+                raw = read_index(self.index_path + ".faiss")
+                ids = stored_ids(raw)
+                # Chunks appended after the last index save have no vectors; ignore them
+                saved_end = int(ids.max()) + 1 if len(ids) else 0
+                self.store = ChunkStore(
+                    self.index_path,
+                    next_id=saved_end,
+                    dim=raw.d if VectorIndex.wants_exact(self.rag_cfg) else 0,
+                    live_ids=ids,
+                )
+                self.index = VectorIndex.from_config(
+                    raw.d, self.rag_cfg, index=raw, exact=self.store if self.store.dim else None
+                )
+                if self.lexical is not None:
+                    self.lexical.sync(ids, saved_end, self.store)
+            else:
+                self.index = None
+                self.store = None
+            self._loaded_mtimes = mtimes
+            self._changes += 1
+
+    def _refresh_if_stale(self):
+        """Reload from disk only when another process has rewritten the index files."""
+        if self._dirty:
+            # Unflushed local writes win; they are persisted on the next flush()
+            return
+        mtimes = self._disk_mtimes()
+        if mtimes is not None and mtimes != self._loaded_mtimes:
+            self._load_index()
 
     def _save_index(self):
-        faiss.write_index(self.index, self.index_path + ".faiss")
-        data = {"chunks": self.chunks, "urls": self.urls}
-        with open(self.index_path + ".pkl", "wb") as f:
-            pickle.dump(data, f)
+        # Chunks are already appended to the store; make them durable, then
+        # write the index to a temp file and rename so readers never see a half-written one
+        with self._lock:
+            self.store.flush()
+            self.index.save(self.index_path + ".faiss.tmp")
+            os.replace(self.index_path + ".faiss.tmp", self.index_path + ".faiss")
+            self._loaded_mtimes = self._disk_mtimes()
+            self._dirty = False
+
+    def flush(self):
+        """Persist chunks added with persist=False."""
+        with self._lock:
+            if self._dirty and self.index is not None:
+                self._save_index()
 
     def chunk_text(self, text, chunk_size=500, overlap=50):
         words = text.split()
@@ -47,65 +228,334 @@ class WebRAG:
             start += chunk_size - overlap
         return chunks
 
-    def add_document(self, text, url="local"):
-        chunks = self.chunk_text(text)
+    def _expiry(self, namespace, ttl, now):
+        # Per-namespace default, e.g. web pages go stale while runbooks do not
+        if ttl is None:
+            ttl = self.rag_cfg.get("namespace_ttl", {}).get(namespace)
+        return now + ttl if ttl else None
 
-        for chunk in chunks:
-            embedding = self.model.encode([chunk], convert_to_numpy=True)
+    def add_documents(self, documents, persist=True, namespace="default", ttl=None):
+        """
+        Bulk-ingest an iterable of (text, url) pairs into `namespace`.
+        All chunks are embedded in batches and added to the index with a single call.
+        The index is written once at the end, or on flush() when persist=False.
 
+        A URL identifies a document: indexing a URL again with different text
+        replaces its chunks (upsert), with the same text it only renews its expiry.
+        Documents whose exact text is already indexed in the namespace under
+        another URL are skipped. Documents expire `ttl` seconds from now
+        (default: the namespace's `namespace_ttl`, none if unset).
+        Returns the number of chunks added.
+        """
+        now = time.time()
+        expires = self._expiry(namespace, ttl, now)
+        new_chunks, new_urls, new_docs, renewed, replaced = [], [], {}, [], []
+        new_hashes = set()
+        with self._lock:
+            self._refresh_if_stale()
+            store = self.store
+            for text, url in documents:
+                content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                doc = store.docs.get(url) if store is not None else None
+                if doc is not None and doc["hash"] == content_hash and doc["ns"] == namespace:
+                    renewed.append(url)
+                    continue
+                if url in new_docs or content_hash in new_hashes:
+                    continue
+                if store is not None and store.content_url(content_hash, namespace):
+                    continue
+                new_hashes.add(content_hash)
+                if doc is not None:
+                    replaced.append(url)
+                new_docs[url] = {"hash": content_hash, "ns": namespace, "added": now, "expires": expires}
+                for chunk in self.chunk_text(text):
+                    new_chunks.append(chunk)
+                    new_urls.append(url)
+
+            for url in renewed:
+                if expires or store.docs[url]["expires"]:
+                    store.touch(url, expires)
+        if not new_chunks:
+            return 0
+
+        embeddings = self.embed(new_chunks)
+
+        with self._lock:
+            from .vector_index import VectorIndex, normalize
+            self._refresh_if_stale()
+            if self.store is None:
+                dim = embeddings.shape[1] if VectorIndex.wants_exact(self.rag_cfg) else 0
+                self.store = ChunkStore(self.index_path, next_id=0, dim=dim)
             if self.index is None:
-                dim = embedding.shape[1]
-                self.index = faiss.IndexFlatL2(dim)
+                self.index = VectorIndex.from_config(
+                    embeddings.shape[1], self.rag_cfg, exact=self.store if self.store.dim else None
+                )
 
-            self.index.add(embedding)
-            self.chunks.append(chunk)
-            self.urls.append(url)
+            # The live index is updated in place; queries see it immediately
+            if replaced:
+                self._remove_chunks(self.store.ids_for_urls(replaced))
+            embeddings = normalize(embeddings)
+            ids = self.store.append(new_chunks, new_urls, new_docs, vectors=embeddings if self.store.dim else None)
+            self.index.add(embeddings, ids)
+            if self.lexical is not None:
+                self.lexical.add(ids, new_chunks, [new_docs[url]["ns"] for url in new_urls])
+            self._dirty = True
+            self._changes += 1
 
-        self._save_index()
+            if persist:
+                self._save_index()
+        return len(new_chunks)
 
-    def query(self, q, top_k=3, min_similarity=0.6):
-        self._load_index()
-        if self.index is None:
-            return []
-        embedding = self.model.encode([q], convert_to_numpy=True)
-        distances, indices = self.index.search(embedding, top_k)
-        results = []
-        for dist, i in zip(distances[0], indices[0]):
-            if i < len(self.chunks):
-                # Convert FAISS L2 distance → cosine similarity approx
-                similarity = 1 / (1 + dist)
-                if similarity >= min_similarity:
-                    results.append({"text": self.chunks[i], "url": self.urls[i]})
+    def _remove_chunks(self, ids):
+        self.index.remove(ids)
+        if self.lexical is not None:
+            self.lexical.remove(ids)
+
+    def add_document(self, text, url="local", persist=True, namespace="default", ttl=None):
+        return self.add_documents([(text, url)], persist=persist, namespace=namespace, ttl=ttl)
+
+    def delete_documents(self, urls, persist=True):
+        """
+        Remove documents and their chunks from the index. Their rows stay in
+        the chunk store until the next compaction. Returns the number deleted.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            if self.store is None:
+                return 0
+            urls = [url for url in dict.fromkeys(urls) if url in self.store.docs]
+            if not urls:
+                return 0
+            self._remove_chunks(self.store.ids_for_urls(urls))
+            self.store.forget(urls)
+            self._dirty = True
+            self._changes += 1
+            if persist:
+                self._save_index()
+        return len(urls)
+
+    def delete_document(self, url, persist=True):
+        return self.delete_documents([url], persist=persist)
+
+    def expire(self, now=None, persist=True):
+        """Delete the documents whose TTL has passed. Returns the number deleted."""
+        with self._lock:
+            self._refresh_if_stale()
+            if self.store is None:
+                return 0
+            return self.delete_documents(self.store.expired(now or time.time()), persist=persist)
+
+    # -----------------------------
+    # Maintenance
+    # -----------------------------
+    def maintain(self):
+        """
+        Delete expired documents, rebuild an hnsw graph once at least
+        `compact_dead_ratio` of it is tombstones, and compact the chunk store
+        once that share of its rows belongs to deleted chunks.
+        Returns the number of documents expired.
+        """
+        expired = self.expire()
+        ratio = self.rag_cfg.get("compact_dead_ratio", 0.25)
+        with self._lock:
+            if self.store is None:
+                return expired
+            index, changes, snapshot = self.index, self._changes, None
+            if index.dead and index.dead >= ratio * (index.ntotal + index.dead):
+                snapshot = index.live_vectors()
+        if snapshot is not None:
+            # Rebuilding a graph takes a while: do it without holding up queries,
+            # and keep the result only if the index did not change meanwhile
+            rebuilt = index.rebuilt(*snapshot)
+            with self._lock:
+                if self.index is index and self._changes == changes:
+                    index.replace(rebuilt)
+                    self._dirty = True
+                    self._save_index()
+
+        with self._lock:
+            if self.store is None:
+                return expired
+            dead = len(self.store) - self.index.ntotal
+            if len(self.store) and dead / len(self.store) >= ratio:
+                if self._dirty:
+                    self._save_index()
+                self.store.compact(self.index.ids())
+                if self.lexical is not None:
+                    self.lexical.optimize()
+                # Other processes reload on a newer .faiss, which drops their handles on the replaced files
+                os.utime(self.index_path + ".faiss")
+                self._loaded_mtimes = self._disk_mtimes()
+        return expired
+
+    def _maintenance_loop(self, interval):
+        while not self._stop_maintenance.wait(interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                # Try again on the next pass
+                Console().print(f"⚠️ RAG index maintenance failed: {e}", style="yellow")
+
+    def start_maintenance(self):
+        """Run maintain() every `maintenance_interval` seconds on a daemon thread (0 disables it)."""
+        interval = self.rag_cfg.get("maintenance_interval", 600)
+        with self._init_lock:
+            if not interval or self._maintenance is not None:
+                return self._maintenance
+            self._stop_maintenance.clear()
+            self._maintenance = threading.Thread(
+                target=self._maintenance_loop, args=(interval,), name="rag-maintenance", daemon=True
+            )
+            self._maintenance.start()
+        return self._maintenance
+
+    def stop_maintenance(self):
+        with self._init_lock:
+            thread, self._maintenance = self._maintenance, None
+        if thread is not None:
+            self._stop_maintenance.set()
+            thread.join()
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def query(self, q, top_k=3, min_similarity=0.6, namespace=None):
+        """
+        Return the `top_k` chunks most similar to `q`. `namespace` (a name or a
+        list of names) restricts the search to documents in those namespaces.
+        """
+        embedding = self.embed([q])
+        now = time.time()
+        with self._lock:
+            self._refresh_if_stale()
+            if self.index is None:
+                return []
+            subset = None
+            if namespace:
+                subset = self.store.namespace_ids([namespace] if isinstance(namespace, str) else namespace)
+            scores, indices = self.index.search(embedding, top_k, subset=subset)
+            # Scores are cosine similarities of normalized embeddings
+            hits = [(float(s), int(i)) for s, i in zip(scores[0], indices[0]) if i >= 0 and s >= min_similarity]
+            results = []
+            for (score, i), item in zip(hits, self.store.get_many([i for _, i in hits])):
+                if item is None:
+                    continue
+                text, url = item
+                doc = self.store.docs.get(url, {})
+                if doc.get("expires") and doc["expires"] <= now:
+                    # Expired, waiting for the next maintenance pass
+                    continue
+                results.append({
+                    "text": text,
+                    "url": url,
+                    "score": score,
+                    "id": i,
+                    "namespace": doc.get("ns", "default"),
+                })
         return results
 
+    def hybrid_query(self, q, top_k=3, min_similarity=0.6, namespace=None):
+        """
+        Like query(), but also BM25 keyword search, so that chunks naming the
+        exact error code, pod name or CLI flag in `q` are found even when their
+        embedding is not close. The two candidate lists are fused by reciprocal
+        rank and, with `cross_encoder` on, re-ranked by a cross-encoder.
+
+        A chunk is relevant when its similarity reaches `min_similarity` or it
+        holds at least `lexical_min_coverage` of the query terms (IDF-weighted);
+        with the cross-encoder, when that scores it at least `cross_encoder_min_score`.
+        Results also carry "similarity" and "bm25" (None where a search missed it).
+        """
+        lexical = self.lexical
+        if lexical is None:
+            return self.query(q, top_k=top_k, min_similarity=min_similarity, namespace=namespace)
+        from .lexical_index import tokenize
+        candidates = max(top_k, self.rag_cfg.get("hybrid_candidates", 32))
+        rrf_k = self.rag_cfg.get("rrf_k", 60)
+        namespaces = [namespace] if isinstance(namespace, str) else namespace
+        terms = tokenize(q)
+        embedding = self.embed([q])
+        now = time.time()
+        with self._lock:
+            self._refresh_if_stale()
+            if self.index is None:
+                return []
+            subset = self.store.namespace_ids(namespaces) if namespaces else None
+            scores, indices = self.index.search(embedding, candidates, subset=subset)
+            dense = {int(i): float(s) for s, i in zip(scores[0], indices[0]) if i >= 0}
+            keyword = lexical.search(terms, candidates, namespaces)
+            # Rows of chunks another process deleted or never saved are not in the live index
+            live = self.index.contains([i for i, _ in keyword]) if keyword else []
+            keyword = {i: score for (i, score), ok in zip(keyword, live) if ok}
+
+            # Reciprocal rank fusion: both rankings are in descending score order
+            fused = {}
+            for ranking in (dense, keyword):
+                for rank, i in enumerate(ranking, 1):
+                    fused[i] = fused.get(i, 0.0) + 1.0 / (rrf_k + rank)
+            ranked = sorted(fused, key=fused.get, reverse=True)
+            hits = []
+            for i, item in zip(ranked, self.store.get_many(ranked)):
+                if item is None:
+                    continue
+                text, url = item
+                doc = self.store.docs.get(url, {})
+                if doc.get("expires") and doc["expires"] <= now:
+                    continue
+                hits.append({
+                    "text": text,
+                    "url": url,
+                    "score": fused[i],
+                    "id": i,
+                    "namespace": doc.get("ns", "default"),
+                    "similarity": dense.get(i),
+                    "bm25": keyword.get(i),
+                })
+        # Scoring text takes a while: done without holding up other queries and writes
+        return self._relevant(q, terms, hits, top_k, min_similarity)
+
+    def _relevant(self, q, terms, hits, top_k, min_similarity):
+        encoder = self.cross_encoder
+        if encoder is not None:
+            hits = hits[:self.rag_cfg.get("cross_encoder_candidates", 16)]
+            if not hits:
+                return []
+            min_score = self.rag_cfg.get("cross_encoder_min_score", 0.0)
+            for hit, score in zip(hits, encoder.predict([(q, hit["text"]) for hit in hits])):
+                hit["score"] = float(score)
+            hits = sorted((hit for hit in hits if hit["score"] >= min_score), key=lambda h: h["score"], reverse=True)
+            return hits[:top_k]
 
-    def web_search_and_store(self, query, max_results=3):
-        """Perform web search, fetch pages, and index them."""
+        from .lexical_index import LexicalIndex
+        min_coverage = self.rag_cfg.get("lexical_min_coverage", 0.6)
+        idf = None
+        results = []
+        for hit in hits:
+            if hit["similarity"] is None or hit["similarity"] < min_similarity:
+                if hit["bm25"] is None:
+                    continue
+                if idf is None:
+                    idf = self.lexical.idf(terms)
+                if LexicalIndex.coverage(idf, hit["text"]) < min_coverage:
+                    continue
+            results.append(hit)
+            if len(results) == top_k:
+                break
+        return results
+
+    def web_search_and_store(self, query, max_results=3, deadline=None, cancel=None):
+        """
+        Perform web search, fetch pages concurrently, and index whatever arrived before
+        the deadline. Setting the `cancel` event stops waiting for pages.
+        """
+        from duckduckgo_search import DDGS
         with DDGS() as ddgs:
             search_results = list(ddgs.text(query, max_results=max_results))
-        for r in search_results:
-            url = r.get("href")
-            try:
-                text = self.fetch_page(url)
-
-                if text:
-                    self.add_document(text, url)
-            except Exception as e:
-                print(f"⚠️ Failed to fetch {url}: {e}")
+        pages = self.fetcher.fetch_all([r.get("href") for r in search_results], deadline=deadline, cancel=cancel)
+        if cancel and cancel.is_set():
+            return search_results
+        self.add_documents(pages, namespace="web")
         return search_results
 
     def fetch_page(self, url: str) -> str:
-        # Convert GitHub "blob" link → raw link
-        if "github.com" in url and "/blob/" in url:
-            url = url.replace("github.com", "raw.githubusercontent.com").replace("/blob/", "/")
-
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-
-        if "raw.githubusercontent.com" in url:
-            # return raw file content directly
-            return resp.text
-        else:
-            # fallback: parse with BeautifulSoup
-            soup = BeautifulSoup(resp.text, "html.parser")
-            return soup.get_text(separator=" ", strip=True)
+        return self.fetcher.fetch(url)
@@ -0,0 +1,257 @@
+# src/aiops/server.py
+
+import json
+import os
+import re
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from rich.console import Console
+from .orchestrator import Orchestrator
+from .state_manager import open_state_manager
+from .turn_pipeline import TurnPipeline
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionStore:
+    """
+    One Orchestrator per session, all sharing the skills, router, RAG index and
+    turn pipeline of `base`. Each session keeps its own state under
+    `<sessions_dir>/<session_id>/`, and its turns run one at a time.
+    """
+
+    def __init__(self, base: Orchestrator, sessions_dir: str, state_file: str, exec_cfg: dict):
+        self.base = base
+        self.sessions_dir = sessions_dir
+        self.state_file = state_file
+        self.exec_cfg = exec_cfg
+        self._sessions = {}  # session_id -> (Orchestrator, Lock)
+        self._lock = threading.Lock()
+
+    def create(self) -> str:
+        session_id = secrets.token_urlsafe(12)
+        os.makedirs(os.path.join(self.sessions_dir, session_id))
+        return session_id
+
+    def list(self) -> list[str]:
+        on_disk = os.listdir(self.sessions_dir) if os.path.isdir(self.sessions_dir) else []
+        with self._lock:
+            return sorted(set(on_disk) | set(self._sessions))
+
+    def get(self, session_id: str):
+        """
+        Return (orchestrator, turn_lock) for a session made by create(), opening
+        its state on first use. Raises KeyError for unknown sessions.
+        """
+        if not _SESSION_ID_RE.match(session_id):
+            raise KeyError(session_id)
+        with self._lock:
+            if session_id not in self._sessions:
+                session_dir = os.path.join(self.sessions_dir, session_id)
+                if not os.path.isdir(session_dir):
+                    raise KeyError(session_id)
+                state = open_state_manager(os.path.join(session_dir, self.state_file), self.exec_cfg)
+                orchestrator = Orchestrator(
+                    self.base.client, state, console=Console(quiet=True), shared=self.base
+                )
+                self._sessions[session_id] = (orchestrator, threading.Lock())
+            return self._sessions[session_id]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+
+        GET  /health
+        GET  /sessions                              list sessions
+        POST /sessions                              create a session
+        GET  /sessions/<id>/conversations           list conversations and the active one
+        POST /sessions/<id>/conversations           {"title"} create and activate a conversation
+        POST /sessions/<id>/messages                {"message", "stream"} run a turn
+        GET  /sessions/<id>/history?limit=&offset=  messages of the active conversation
+
+    A streamed turn is answered as newline-delimited JSON: {"delta": ...} lines,
+    then {"done": true, "response": ..., "response_id": ...}.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "aiops"
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def log_message(self, fmt, *args):
+        self.server.console.print(f"{self.address_string()} {fmt % args}", style="dim", highlight=False)
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        return secrets.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+    def _route(self, method: str):
+        if not self._authorized():
+            return self._send_json(401, {"error": "unauthorized"})
+
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if parts == ["health"] and method == "GET":
+                return self._send_json(200, {"status": "ok"})
+            if parts == ["sessions"]:
+                if method == "GET":
+                    return self._send_json(200, {"sessions": self.server.sessions.list()})
+                return self._send_json(201, {"session_id": self.server.sessions.create()})
+            if len(parts) == 3 and parts[0] == "sessions":
+                handler = getattr(self, f"_{method.lower()}_{parts[2]}", None)
+                if handler:
+                    try:
+                        orchestrator, turn_lock = self.server.sessions.get(parts[1])
+                    except KeyError:
+                        return self._send_json(404, {"error": "unknown session"})
+                    return handler(orchestrator, turn_lock, parse_qs(url.query))
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.server.console.print(f"❌ {method} {url.path} failed: {e!r}", style="red")
+            return self._send_json(500, {"error": "internal error"})
+        self._send_json(404, {"error": "not found"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    # -----------------------------
+    # Session endpoints
+    # -----------------------------
+    def _get_conversations(self, orchestrator, turn_lock, query):
+        state = orchestrator.state_manager
+        self._send_json(200, {
+            "current": state.get_current_conversation(),
+            "conversations": state.list_conversations(),
+        })
+
+    def _post_conversations(self, orchestrator, turn_lock, query):
+        title = self._read_json().get("title") or "Untitled"
+        with turn_lock:
+            orchestrator.new_conversation(title)
+            conv_id = orchestrator.state_manager.get_current_conversation()
+        self._send_json(201, {"conversation_id": conv_id, "title": title})
+
+    def _get_history(self, orchestrator, turn_lock, query):
+        state = orchestrator.state_manager
+        conv_id = state.get_current_conversation()
+        if not conv_id:
+            return self._send_json(200, {"conversation_id": None, "messages": []})
+        limit = int(query.get("limit", ["10"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        self._send_json(200, {"conversation_id": conv_id, "messages": state.get_history(conv_id, limit, offset)})
+
+    def _post_messages(self, orchestrator, turn_lock, query):
+        body = self._read_json()
+        message = (body.get("message") or "").strip()
+        if not message:
+            raise ValueError("'message' is required")
+
+        if not body.get("stream", False):
+            try:
+                with turn_lock:
+                    response, resp_id = orchestrator.run_turn(message)
+            except Exception as e:
+                return self._send_json(502, {"error": str(e)})
+            return self._send_json(200, {"response": response, "response_id": resp_id})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # A client that disconnects makes _write_chunk raise, which aborts the turn unsaved
+        cancel = threading.Event()
+        try:
+            with turn_lock:
+                response, resp_id = orchestrator.run_turn(
+                    message, on_delta=lambda delta: self._write_chunk({"delta": delta}), cancel=cancel
+                )
+            self._write_chunk({"done": True, "response": response, "response_id": resp_id})
+        except (BrokenPipeError, ConnectionResetError):
+            cancel.set()
+            self.close_connection = True
+            return
+        except Exception as e:
+            self._write_chunk({"done": True, "error": str(e)})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class AgentServer(ThreadingHTTPServer):
+    """
+    Serves many concurrent sessions from one process, so the embedding model,
+    FAISS index, skills and OpenAI connection pool are loaded once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, sessions: SessionStore, token: str = None):
+        super().__init__(address, _Handler)
+        self.sessions = sessions
+        self.token = token
+        self.console = Console()
+
+
+def serve(client, cfg: dict, host: str = None, port: int = None):
+    """Run the agent as a local HTTP service until interrupted."""
+    server_cfg = cfg.get("server", {})
+    exec_cfg = cfg.get("execution", {})
+    host = host or server_cfg.get("host", "127.0.0.1")
+    port = port or server_cfg.get("port", 8765)
+    token = os.environ.get(server_cfg.get("token_env", "AIOPS_SERVER_TOKEN")) or None
+
+    work_dir = exec_cfg.get("working_dir", "./.aiops_workspace/")
+    # The shared components; its own state is never used, so it needs no StateManager
+    # Stage deadlines run from submission: give every concurrent turn its own workers
+    # so that stages of one session never time out queued behind another's
+    base = Orchestrator(
+        client, None, pipeline_workers=server_cfg.get("max_sessions", 32) * TurnPipeline.STAGES
+    )
+    sessions = SessionStore(
+        base=base,
+        sessions_dir=server_cfg.get("sessions_dir") or os.path.join(work_dir, "sessions"),
+        state_file=exec_cfg.get("state_file", ".aiops_state.json"),
+        exec_cfg=exec_cfg,
+    )
+
+    httpd = AgentServer((host, port), sessions, token=token)
+    httpd.console.print(f"🤖 AIOps Agent serving on http://{host}:{port}", style="green")
+    if not token and host not in ("127.0.0.1", "localhost", "::1"):
+        httpd.console.print("⚠️ No server token set; anyone who can reach this port can run turns.", style="yellow")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        httpd.console.print("\n👋 Shutting down.", style="green")
+    finally:
+        httpd.server_close()
@@ -15,6 +15,8 @@ def load_skills():
             skills[doc["name"]] = {
                 "intents": doc.get("intents", []),
                 "keywords": doc.get("keywords", []),
+                "tags": doc.get("tags", []),
+                "description": doc.get("description", ""),
                 "system_prompt": doc.content.strip()
             }
     return skills
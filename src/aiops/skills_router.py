@@ -1,11 +1,59 @@
 # src/aiops/skills_router.py
 import json
+import re
+import threading
+from collections import OrderedDict
 from .llm.openai_client import OpenAIClient
 
+_WORD_RE = re.compile(r"[\w.:/-]+")
+ROUTER_MODES = ("llm", "local", "hybrid")
+
+
 class SkillRouter:
-    def __init__(self, client: OpenAIClient, skills: dict):
+    """
+    Picks the skills relevant to a user request.
+
+    mode = "llm":    always ask the model (ask_router)
+    mode = "local":  rank skills locally from their intents/keywords/tags and, when
+                     `embed_fn` is given, embedding similarity; never calls the model
+    mode = "hybrid": rank locally and only ask the model when the best local score
+                     is below `min_confidence`
+    """
+
+    def __init__(
+            self,
+            client: OpenAIClient,
+            skills: dict,
+            cache_size: int = 256,
+            near_duplicate_threshold: float = 0.85,
+            mode: str = "llm",
+            embed_fn=None,
+            min_confidence: float = 0.45,
+            max_skills: int = 2,
+    ):
+        if mode not in ROUTER_MODES:
+            raise ValueError(f"Unknown router mode '{mode}', expected one of {ROUTER_MODES}.")
         self.client = client
-        self.skills = skills
+        self.cache_size = cache_size
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.mode = mode
+        self.embed_fn = embed_fn  # callable(list[str]) -> 2-D array of embeddings
+        self.min_confidence = min_confidence
+        self.max_skills = max_skills
+        # normalized input -> (token set, chosen skill names), least recently used first
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.set_skills(skills)
+
+    def set_skills(self, skills: dict):
+        """Install a skill set: precompute the router summaries and drop cached routes."""
+        with self._lock:
+            self.skills = skills
+            self._skill_names = tuple(skills)
+            self._summaries_json = json.dumps(self._make_skill_summaries(), indent=2)
+            self._skill_terms = {name: self._terms_for(name, skill) for name, skill in skills.items()}
+            self._skill_vectors = None  # embedded on first local route
+            self._cache.clear()
 
     def _make_skill_summaries(self):
         summaries = []
@@ -17,23 +65,133 @@ class SkillRouter:
             })
         return summaries
 
+    # -----------------------------
+    # Local ranking
+    # -----------------------------
+    @classmethod
+    def _terms_for(cls, name: str, skill: dict) -> set[str]:
+        terms = [name] + list(skill.get("intents", [])) + list(skill.get("keywords", [])) + list(skill.get("tags", []))
+        return {cls._normalize(str(t)) for t in terms if str(t).strip()}
+
+    @staticmethod
+    def _skill_text(name: str, skill: dict) -> str:
+        return " ".join([
+            name,
+            skill.get("description", ""),
+            " ".join(map(str, skill.get("intents", []))),
+            " ".join(map(str, skill.get("keywords", []) + skill.get("tags", []))),
+            skill.get("system_prompt", "")[:500],
+        ])
+
+    @staticmethod
+    def _unit_rows(vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype="float32")
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+    def rank_skills(self, user_input: str) -> list[tuple[str, float]]:
+        """
+        Score every skill locally, best first.
+        Keyword/intent hits score 1 - 0.5**hits; with an embedder this is blended
+        with the cosine similarity between the request and the skill description.
+        """
+        padded = f" {self._normalize(user_input)} "
+        lexical = {}
+        for name, terms in self._skill_terms.items():
+            hits = sum(1 for term in terms if f" {term} " in padded)
+            lexical[name] = 1 - 0.5 ** hits
+
+        semantic = {}
+        if self.embed_fn is not None and self._skill_names:
+            try:
+                if self._skill_vectors is None:
+                    texts = [self._skill_text(name, self.skills[name]) for name in self._skill_names]
+                    self._skill_vectors = self._unit_rows(self.embed_fn(texts))
+                query = self._unit_rows(self.embed_fn([user_input]))[0]
+                semantic = dict(zip(self._skill_names, (self._skill_vectors @ query).tolist()))
+            except Exception:
+                # Embedding model unavailable: rank on keywords alone
+                semantic = {}
+
+        scores = {
+            name: 0.6 * semantic[name] + 0.4 * lexical[name] if semantic else lexical[name]
+            for name in lexical
+        }
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+    # -----------------------------
+    # Routing cache
+    # -----------------------------
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(_WORD_RE.findall(text.lower()))
+
+    def _cache_lookup(self, key: str, tokens: frozenset):
+        """Return cached skills for an identical or near-identical request, or None."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key][1]
+
+        best_key, best_score = None, 0.0
+        for cached_key, (cached_tokens, _) in self._cache.items():
+            union = len(tokens | cached_tokens)
+            score = len(tokens & cached_tokens) / union if union else 0.0
+            if score > best_score:
+                best_key, best_score = cached_key, score
+        if best_key is not None and best_score >= self.near_duplicate_threshold:
+            self._cache.move_to_end(best_key)
+            return self._cache[best_key][1]
+        return None
+
+    def _cache_store(self, key: str, tokens: frozenset, skill_names: list[str]):
+        self._cache[key] = (tokens, skill_names)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # -----------------------------
+    # Selection
+    # -----------------------------
     def select_skills(self, user_input: str) -> list[str]:
-        summaries = self._make_skill_summaries()
+        if tuple(self.skills) != self._skill_names:
+            # Skills were added or removed in place
+            self.set_skills(self.skills)
+
+        key = self._normalize(user_input)
+        tokens = frozenset(key.split())
+        with self._lock:
+            cached = self._cache_lookup(key, tokens)
+        if cached is not None:
+            return list(cached)
+
+        if self.mode != "llm":
+            ranked = self.rank_skills(user_input)
+            if self.mode == "local" or (ranked and ranked[0][1] >= self.min_confidence):
+                chosen = [name for name, score in ranked[:self.max_skills] if score >= self.min_confidence]
+                with self._lock:
+                    self._cache_store(key, tokens, chosen)
+                return chosen
+            # Low local confidence → let the model decide
 
         router_prompt = f"""
-You are a skill router. 
-Given the user request and the available skills, choose the most relevant skill(s) by name. 
-Return only a JSON array of skill names. 
+You are a skill router.
+Given the user request and the available skills, choose the most relevant skill(s) by name.
+Return only a JSON array of skill names.
 
 User request: "{user_input}"
 
 Available skills:
-{json.dumps(summaries, indent=2)}
+{self._summaries_json}
 """
         response = self.client.ask_router(router_prompt)
 
         try:
             skill_names = json.loads(response)
-            return [s for s in skill_names if s in self.skills]
+            chosen = [s for s in skill_names if s in self.skills]
         except Exception:
+            # Don't remember failed routing; the next identical request asks again
             return []
+
+        with self._lock:
+            self._cache_store(key, tokens, chosen)
+        return chosen
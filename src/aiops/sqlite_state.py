@@ -0,0 +1,332 @@
+# src/aiops/sqlite_state.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from rich.console import Console
+from .state_manager import append_archive, load_archive, remove_archive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id               TEXT PRIMARY KEY,
+    title            TEXT NOT NULL,
+    created          REAL NOT NULL,
+    last_response_id TEXT,
+    message_count    INTEGER NOT NULL DEFAULT 0,
+    summary          TEXT,
+    archived_count   INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    conv_id     TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role        TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    response_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conv_ts ON messages(conv_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);
+CREATE TABLE IF NOT EXISTS settings (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+class SQLiteStateManager:
+    """
+    StateManager with the same API, stored in SQLite.
+
+    Conversations and messages live in separate tables, so listing conversations
+    reads metadata only and get_history() pages through an index instead of loading
+    every message. The database runs in WAL mode, so other processes and threads
+    can read while one writes. Message content is full-text indexed (FTS5) when
+    the SQLite build supports it.
+    """
+
+    def __init__(self, storage_path: str = "./.aiops_workspace/.aiops_state.db"):
+        self.storage_path = storage_path
+        self.console = Console()
+        self._local = threading.local()  # one connection per thread
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(storage_path) or ".", exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        conn.commit()
+        self._import_json_state()
+
+    # -----------------------------
+    # Connection
+    # -----------------------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.storage_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, params=()):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                return conn.execute(sql, params)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add columns introduced after a database was created."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if "summary" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
+        if "archived_count" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN archived_count INTEGER NOT NULL DEFAULT 0")
+
+    def _import_json_state(self):
+        """One-time import of a JSON state file sitting next to an empty database."""
+        json_path = os.path.splitext(self.storage_path)[0] + ".json"
+        conn = self._conn()
+        if not os.path.exists(json_path) or conn.execute("SELECT 1 FROM conversations LIMIT 1").fetchone():
+            return
+        try:
+            with open(json_path, "r") as f:
+                state = json.load(f)
+        except Exception:
+            self.console.print(f"⚠️ Could not import {json_path}, starting with an empty database.", style="red")
+            return
+
+        with self._write_lock, conn:
+            for conv_id, conv in state.get("conversations", {}).items():
+                messages = conv.get("messages", [])
+                conn.execute(
+                    "INSERT INTO conversations (id, title, created, last_response_id, message_count, summary, archived_count)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (conv_id, conv.get("title", "Untitled"), conv.get("created", time.time()),
+                     conv.get("last_response_id"), len(messages), conv.get("summary"), conv.get("archived_count", 0)),
+                )
+                conn.executemany(
+                    "INSERT INTO messages (conv_id, role, content, ts, response_id) VALUES (?, ?, ?, ?, ?)",
+                    [(conv_id, m["role"], m["content"], m.get("ts", 0), m.get("response_id")) for m in messages],
+                )
+            if state.get("current_conversation"):
+                conn.execute(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES ('current_conversation', ?)",
+                    (state["current_conversation"],),
+                )
+
+    def _exists(self, conv_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM conversations WHERE id = ?", (conv_id,)).fetchone() is not None
+
+    # -----------------------------
+    # Conversation Management
+    # -----------------------------
+    def add_conversation(self, conv_id: str, title: str = "Untitled"):
+        cur = self._write(
+            "INSERT OR IGNORE INTO conversations (id, title, created) VALUES (?, ?, ?)",
+            (conv_id, title, time.time()),
+        )
+        if cur.rowcount:
+            self.set_current_conversation(conv_id)
+
+    def set_current_conversation(self, conv_id: str):
+        if self._exists(conv_id):
+            self._write("INSERT OR REPLACE INTO settings (key, value) VALUES ('current_conversation', ?)", (conv_id,))
+
+    def get_current_conversation(self) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM settings WHERE key = 'current_conversation'").fetchone()
+        return row["value"] if row else None
+
+    def list_conversations(self):
+        """Return {conv_id: metadata}; message bodies are not loaded, see `message_count`."""
+        rows = self._conn().execute(
+            "SELECT id, title, created, last_response_id, message_count, summary, archived_count"
+            " FROM conversations ORDER BY created"
+        )
+        return {row["id"]: dict(row) for row in rows}
+
+    def switch_conversation(self, conv_id: str) -> bool:
+        if self._exists(conv_id):
+            self.set_current_conversation(conv_id)
+            return True
+        return False
+
+    def rename_conversation(self, conv_id: str, new_title: str):
+        self._write("UPDATE conversations SET title = ? WHERE id = ?", (new_title, conv_id))
+
+    def clear_conversation(self, conv_id: str):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM messages WHERE conv_id = ?", (conv_id,))
+                conn.execute(
+                    "UPDATE conversations SET message_count = 0, last_response_id = NULL, summary = NULL,"
+                    " archived_count = 0 WHERE id = ?",
+                    (conv_id,),
+                )
+        remove_archive(self.storage_path, conv_id)
+
+    def delete_conversation(self, conv_id: str):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM messages WHERE conv_id = ?", (conv_id,))
+                conn.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
+                conn.execute(
+                    "DELETE FROM settings WHERE key = 'current_conversation' AND value = ?", (conv_id,)
+                )
+        remove_archive(self.storage_path, conv_id)
+
+    # -----------------------------
+    # Message Management
+    # -----------------------------
+    def add_message(
+            self,
+            conv_id: str,
+            role: str,
+            content: str,
+            response_id: Optional[str] = None,
+    ):
+        if not self._exists(conv_id):
+            raise ValueError(f"Conversation {conv_id} not found in state.")
+
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT INTO messages (conv_id, role, content, ts, response_id) VALUES (?, ?, ?, ?, ?)",
+                    (conv_id, role, content, time.time(), response_id),
+                )
+                conn.execute(
+                    "UPDATE conversations SET message_count = message_count + 1,"
+                    " last_response_id = COALESCE(?, last_response_id) WHERE id = ?",
+                    (response_id, conv_id),
+                )
+
+    def update_conversation(
+            self,
+            conv_id: str,
+            response_id: str,
+            user_input: str,
+            assistant_response: str,
+    ):
+        """
+        Add both user and assistant messages to the conversation.
+        """
+        self.add_message(conv_id, "user", user_input)
+        self.add_message(conv_id, "assistant", assistant_response, response_id)
+
+    @staticmethod
+    def _message(row) -> dict:
+        msg = {"role": row["role"], "content": row["content"], "ts": row["ts"]}
+        if row["response_id"]:
+            msg["response_id"] = row["response_id"]
+        return msg
+
+    def get_history(self, conv_id: str, limit: int = 10, offset: int = 0):
+        """
+        Return `limit` messages of the given conversation, oldest first,
+        skipping the `offset` most recent ones.
+        """
+        rows = self._conn().execute(
+            "SELECT role, content, ts, response_id FROM messages WHERE conv_id = ?"
+            " ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+            (conv_id, limit, offset),
+        ).fetchall()
+        return [self._message(row) for row in reversed(rows)]
+
+    def message_count(self, conv_id: str) -> int:
+        """Number of messages still in the database (archived ones are not counted)."""
+        row = self._conn().execute("SELECT message_count FROM conversations WHERE id = ?", (conv_id,)).fetchone()
+        return row["message_count"] if row else 0
+
+    # -----------------------------
+    # Summaries & Archive
+    # -----------------------------
+    def get_summary(self, conv_id: str) -> Optional[str]:
+        """Summary of the archived part of the conversation, if any."""
+        row = self._conn().execute("SELECT summary FROM conversations WHERE id = ?", (conv_id,)).fetchone()
+        return row["summary"] if row else None
+
+    def archive_messages(self, conv_id: str, upto_ts: float, summary: str):
+        """
+        Move the conversation's messages up to and including `upto_ts` into its
+        archive file and store `summary` in their place. Returns False, changing
+        nothing, if the message at `upto_ts` is gone (the conversation was cleared
+        or deleted since the summary was made).
+        """
+        with self._write_lock:
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT id, role, content, ts, response_id FROM messages WHERE conv_id = ? AND ts <= ? ORDER BY ts, id",
+                (conv_id, upto_ts),
+            ).fetchall()
+            if not rows or rows[-1]["ts"] != upto_ts:
+                return False
+            # Archive first: a crash before the commit leaves the messages in both places, never in neither
+            append_archive(self.storage_path, conv_id, [self._message(row) for row in rows])
+            with conn:
+                conn.executemany("DELETE FROM messages WHERE id = ?", [(row["id"],) for row in rows])
+                conn.execute(
+                    "UPDATE conversations SET summary = ?, message_count = message_count - ?,"
+                    " archived_count = archived_count + ? WHERE id = ?",
+                    (summary, len(rows), len(rows), conv_id),
+                )
+            return True
+
+    def load_archive(self, conv_id: str) -> list:
+        """Archived messages of a conversation, oldest first."""
+        return load_archive(self.storage_path, conv_id)
+
+    def search_messages(self, query: str, conv_id: Optional[str] = None, limit: int = 20):
+        """
+        Full-text search over message content, best matches first.
+        Each hit is a message dict with an added `conv_id`.
+        """
+        conn = self._conn()
+        if self.has_fts:
+            # Quote each term so user input can't be parsed as FTS5 syntax
+            terms = " ".join('"' + t.replace('"', '""') + '"' for t in query.split())
+            if not terms:
+                return []
+            sql = (
+                "SELECT m.conv_id, m.role, m.content, m.ts, m.response_id FROM messages_fts f"
+                " JOIN messages m ON m.id = f.rowid WHERE messages_fts MATCH ?"
+            )
+            params = [terms]
+            if conv_id:
+                sql += " AND m.conv_id = ?"
+                params.append(conv_id)
+            sql += " ORDER BY f.rank LIMIT ?"
+        else:
+            sql = "SELECT conv_id, role, content, ts, response_id FROM messages WHERE content LIKE ?"
+            params = [f"%{query}%"]
+            if conv_id:
+                sql += " AND conv_id = ?"
+                params.append(conv_id)
+            sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        return [dict(self._message(row), conv_id=row["conv_id"]) for row in conn.execute(sql, params)]
@@ -0,0 +1,85 @@
+# src/aiops/startup_profile.py
+
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+from rich.console import Console
+from rich.table import Table
+
+# Modules kept off the startup path; imported on first LLM call / RAG use.
+# Ordered so each timing mostly reflects the module itself, not its dependencies.
+DEFERRED_MODULES = [
+    "numpy",
+    "requests",
+    "bs4",
+    "openai",
+    "faiss",
+    "torch",
+    "sentence_transformers",
+    "duckduckgo_search",
+]
+
+
+class StartupProfiler:
+    """
+    Records wall time and newly imported top-level modules per startup stage.
+    Disabled profilers still run the stages but record nothing.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages = []  # (name, seconds, [new top-level modules])
+        self.deferred = []  # (module, seconds or None, status)
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        before = set(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            new = sorted(m for m in set(sys.modules) - before if "." not in m and not m.startswith("_"))
+            self.stages.append((name, elapsed, new))
+
+    def time_deferred_imports(self):
+        """Import each deferred module that startup skipped and time it."""
+        for name in DEFERRED_MODULES:
+            if name in sys.modules:
+                self.deferred.append((name, None, "loaded at startup"))
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                self.deferred.append((name, time.perf_counter() - start, "deferred"))
+            except ImportError:
+                self.deferred.append((name, None, "not installed"))
+
+    def report(self, console: Console = None):
+        console = console or Console()
+
+        table = Table(title="Startup (until first prompt)", show_header=True, header_style="bold magenta")
+        table.add_column("Stage", style="cyan")
+        table.add_column("Time (ms)", justify="right")
+        table.add_column("New modules", style="white")
+        total = 0.0
+        for name, elapsed, modules in self.stages:
+            if not name.startswith("deferred:"):
+                total += elapsed
+            shown = ", ".join(modules[:8]) + (f" (+{len(modules) - 8})" if len(modules) > 8 else "")
+            table.add_row(name, f"{elapsed * 1000:.1f}", shown)
+        table.add_row("[bold]time to prompt[/bold]", f"[bold]{total * 1000:.1f}[/bold]", "")
+        console.print(table)
+
+        if self.deferred:
+            table = Table(title="Deferred imports (first use)", show_header=True, header_style="bold magenta")
+            table.add_column("Module", style="cyan")
+            table.add_column("Import (ms)", justify="right")
+            table.add_column("Status", style="white")
+            for name, elapsed, status in self.deferred:
+                table.add_row(name, f"{elapsed * 1000:.1f}" if elapsed is not None else "-", status)
+            console.print(table)
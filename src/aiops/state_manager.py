@@ -2,20 +2,33 @@
 
 import json
 import os
+import re
+import threading
 import time
 from typing import Optional
 from rich.console import Console
 
 
 class StateManager:
+    """
+    Conversation state kept in memory and persisted to a single JSON file.
+
+    Every mutation is expressed as an operation (see _apply) and handed to
+    _persist(); subclasses override _persist() to change the storage engine.
+
+    Older messages can be moved out of the state into a per-conversation
+    archive file (see archive_messages), leaving a summary in their place.
+    """
+
     def __init__(self, storage_path: str = "./.aiops_workspace/.aiops_state.json"):
         self.storage_path = storage_path
+        self.console = Console()
+        self._lock = threading.RLock()  # turns and the background summarizer both write
         self.state = {
             "conversations": {},
             "current_conversation": None,
         }
         self._load()
-        self.console = Console()
 
     # -----------------------------
     # Persistence
@@ -30,31 +43,76 @@ class StateManager:
                 self.state = {"conversations": {}, "current_conversation": None}
         else:
             # Ensure directory exists
-            os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+            os.makedirs(os.path.dirname(self.storage_path) or ".", exist_ok=True)
 
     def _save(self):
-        with open(self.storage_path, "w") as f:
+        # Write a temp file, fsync it and rename over the old one so a crash never truncates state
+        tmp_path = self.storage_path + ".tmp"
+        with open(tmp_path, "w") as f:
             json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.storage_path)
+
+    def _persist(self, op: str, fields: dict):
+        """Make an applied operation durable. The JSON backend rewrites the whole file."""
+        self._save()
+
+    def _commit(self, op: str, **fields):
+        with self._lock:
+            self._apply(op, fields)
+            self._persist(op, fields)
+
+    def _apply(self, op: str, fields: dict):
+        """Apply one operation to the in-memory state. Also used to replay journals."""
+        conversations = self.state["conversations"]
+        conv = conversations.get(fields.get("conv_id"))
+
+        if op == "add_conversation":
+            conversations[fields["conv_id"]] = {
+                "id": fields["conv_id"],
+                "title": fields["title"],
+                "created": fields["created"],
+                "messages": [],  # list of {role, content, ts, response_id?}
+                "last_response_id": None,
+            }
+        elif op == "set_current":
+            self.state["current_conversation"] = fields["conv_id"]
+        elif op == "rename" and conv is not None:
+            conv["title"] = fields["title"]
+        elif op == "clear" and conv is not None:
+            conv["messages"] = []
+            conv["last_response_id"] = None
+            conv.pop("summary", None)
+            conv.pop("archived_count", None)
+        elif op == "delete" and conv is not None:
+            del conversations[fields["conv_id"]]
+            if self.state["current_conversation"] == fields["conv_id"]:
+                self.state["current_conversation"] = None
+        elif op == "add_message" and conv is not None:
+            msg = fields["msg"]
+            if msg.get("response_id"):
+                conv["last_response_id"] = msg["response_id"]
+            conv["messages"].append(msg)
+        elif op == "archive" and conv is not None:
+            archived = 0
+            while archived < len(conv["messages"]) and conv["messages"][archived]["ts"] <= fields["upto_ts"]:
+                archived += 1
+            conv["messages"] = conv["messages"][archived:]
+            conv["summary"] = fields["summary"]
+            conv["archived_count"] = conv.get("archived_count", 0) + archived
 
     # -----------------------------
     # Conversation Management
     # -----------------------------
     def add_conversation(self, conv_id: str, title: str = "Untitled"):
         if conv_id not in self.state["conversations"]:
-            self.state["conversations"][conv_id] = {
-                "id": conv_id,
-                "title": title,
-                "created": time.time(),
-                "messages": [],  # list of {role, content, ts, response_id?}
-                "last_response_id": None,
-            }
+            self._commit("add_conversation", conv_id=conv_id, title=title, created=time.time())
             self.set_current_conversation(conv_id)
-            self._save()
 
     def set_current_conversation(self, conv_id: str):
         if conv_id in self.state["conversations"]:
-            self.state["current_conversation"] = conv_id
-            self._save()
+            self._commit("set_current", conv_id=conv_id)
 
     def get_current_conversation(self) -> Optional[str]:
         return self.state.get("current_conversation")
@@ -64,28 +122,23 @@ class StateManager:
 
     def switch_conversation(self, conv_id: str) -> bool:
         if conv_id in self.state["conversations"]:
-            self.state["current_conversation"] = conv_id
-            self._save()
+            self._commit("set_current", conv_id=conv_id)
             return True
         return False
 
     def rename_conversation(self, conv_id: str, new_title: str):
         if conv_id in self.state["conversations"]:
-            self.state["conversations"][conv_id]["title"] = new_title
-            self._save()
+            self._commit("rename", conv_id=conv_id, title=new_title)
 
     def clear_conversation(self, conv_id: str):
         if conv_id in self.state["conversations"]:
-            self.state["conversations"][conv_id]["messages"] = []
-            self.state["conversations"][conv_id]["last_response_id"] = None
-            self._save()
+            self._commit("clear", conv_id=conv_id)
+            remove_archive(self.storage_path, conv_id)
 
     def delete_conversation(self, conv_id: str):
         if conv_id in self.state["conversations"]:
-            del self.state["conversations"][conv_id]
-            if self.state["current_conversation"] == conv_id:
-                self.state["current_conversation"] = None
-            self._save()
+            self._commit("delete", conv_id=conv_id)
+            remove_archive(self.storage_path, conv_id)
 
     # -----------------------------
     # Message Management
@@ -107,10 +160,8 @@ class StateManager:
         }
         if response_id:
             msg["response_id"] = response_id
-            self.state["conversations"][conv_id]["last_response_id"] = response_id
 
-        self.state["conversations"][conv_id]["messages"].append(msg)
-        self._save()
+        self._commit("add_message", conv_id=conv_id, msg=msg)
 
     def update_conversation(
             self,
@@ -125,12 +176,118 @@ class StateManager:
         self.add_message(conv_id, "user", user_input)
         self.add_message(conv_id, "assistant", assistant_response, response_id)
 
-    def get_history(self, conv_id: str, limit: int = 10):
+    def get_history(self, conv_id: str, limit: int = 10, offset: int = 0):
         """
-        Return the last `limit` messages of the given conversation.
+        Return `limit` messages of the given conversation, oldest first,
+        skipping the `offset` most recent ones.
         """
         conv = self.state["conversations"][conv_id]
         if not conv:
             return []
 
-        return conv["messages"][-limit:]
+        end = len(conv["messages"]) - offset
+        return conv["messages"][max(0, end - limit):max(0, end)]
+
+    def message_count(self, conv_id: str) -> int:
+        """Number of messages still in the state (archived ones are not counted)."""
+        conv = self.state["conversations"].get(conv_id)
+        return len(conv["messages"]) if conv else 0
+
+    # -----------------------------
+    # Summaries & Archive
+    # -----------------------------
+    def get_summary(self, conv_id: str) -> Optional[str]:
+        """Summary of the archived part of the conversation, if any."""
+        conv = self.state["conversations"].get(conv_id)
+        return conv.get("summary") if conv else None
+
+    def archive_messages(self, conv_id: str, upto_ts: float, summary: str):
+        """
+        Move the conversation's messages up to and including `upto_ts` into its
+        archive file and store `summary` in their place. Returns False, changing
+        nothing, if the message at `upto_ts` is gone (the conversation was cleared
+        or deleted since the summary was made).
+        """
+        with self._lock:
+            conv = self.state["conversations"].get(conv_id)
+            messages = [m for m in conv["messages"] if m["ts"] <= upto_ts] if conv else []
+            if not messages or messages[-1]["ts"] != upto_ts:
+                return False
+            # Archive first: a crash before the commit leaves the messages in both places, never in neither
+            append_archive(self.storage_path, conv_id, messages)
+            self._commit("archive", conv_id=conv_id, upto_ts=upto_ts, summary=summary)
+            return True
+
+    def load_archive(self, conv_id: str) -> list:
+        """Archived messages of a conversation, oldest first."""
+        return load_archive(self.storage_path, conv_id)
+
+    def search_messages(self, query: str, conv_id: Optional[str] = None, limit: int = 20):
+        """
+        Case-insensitive substring search over message content, newest first.
+        Each hit is a message dict with an added `conv_id`.
+        """
+        needle = query.lower()
+        hits = []
+        for cid, conv in self.state["conversations"].items():
+            if conv_id and cid != conv_id:
+                continue
+            hits.extend(dict(m, conv_id=cid) for m in conv["messages"] if needle in m["content"].lower())
+        hits.sort(key=lambda m: m["ts"], reverse=True)
+        return hits[:limit]
+
+
+# -----------------------------
+# Archive files
+# -----------------------------
+def archive_path(storage_path: str, conv_id: str) -> str:
+    """`<state dir>/archive/<conv_id>.jsonl`: cold storage for a conversation's summarized messages."""
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", conv_id)
+    return os.path.join(os.path.dirname(storage_path) or ".", "archive", safe_id + ".jsonl")
+
+
+def append_archive(storage_path: str, conv_id: str, messages: list):
+    if not messages:
+        return
+    path = archive_path(storage_path, conv_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for msg in messages:
+            f.write(json.dumps(msg) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_archive(storage_path: str, conv_id: str) -> list:
+    path = archive_path(storage_path, conv_id)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def remove_archive(storage_path: str, conv_id: str):
+    try:
+        os.remove(archive_path(storage_path, conv_id))
+    except FileNotFoundError:
+        pass
+
+
+def open_state_manager(storage_path: str, exec_cfg: Optional[dict] = None) -> StateManager:
+    """Create the StateManager selected by `[execution] state_backend` ("json", "journal" or "sqlite")."""
+    exec_cfg = exec_cfg or {}
+    backend = exec_cfg.get("state_backend", "json")
+    if backend == "json":
+        return StateManager(storage_path)
+    if backend == "journal":
+        from .journal_state import JournalStateManager
+        return JournalStateManager(
+            storage_path,
+            compact_every=exec_cfg.get("state_compact_every", 500),
+            fsync=exec_cfg.get("state_fsync", True),
+        )
+    if backend == "sqlite":
+        from .sqlite_state import SQLiteStateManager
+        # The database sits next to the JSON file and imports it on first use
+        return SQLiteStateManager(os.path.splitext(storage_path)[0] + ".db")
+    raise ValueError(f"Unknown state backend '{backend}'.")
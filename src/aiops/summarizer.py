@@ -0,0 +1,127 @@
+# src/aiops/summarizer.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from rich.console import Console
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of an operations troubleshooting conversation. "
+    "Merge the earlier summary with the new messages into one summary of at most {max_words} words. "
+    "Keep facts that later turns may need: systems and hosts involved, symptoms, commands run "
+    "and their results, decisions made and open questions. Answer with the summary only."
+)
+
+
+class ConversationSummarizer:
+    """
+    Keeps conversation state bounded over long sessions.
+
+    Once a conversation holds more than `max_messages` messages, everything but
+    the `keep_recent` newest is folded into the conversation's running summary
+    by the model, and the raw messages move to the state's archive. This runs on
+    a background thread so it never delays a turn; at most one summarization
+    per conversation is in flight.
+    """
+
+    def __init__(
+            self,
+            client,
+            state_manager,
+            max_messages: int = 40,
+            keep_recent: int = 10,
+            max_words: int = 300,
+            max_message_chars: int = 2000,
+            executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.client = client
+        self.state_manager = state_manager
+        self.max_messages = max_messages
+        self.keep_recent = keep_recent
+        self.max_words = max_words
+        self.max_message_chars = max_message_chars
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize")
+        self.console = Console()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, client, state_manager, session_cfg: dict, executor=None):
+        return cls(
+            client,
+            state_manager,
+            max_messages=session_cfg.get("summarize_after_messages", 40),
+            keep_recent=session_cfg.get("summarize_keep_recent", 10),
+            max_words=session_cfg.get("summary_max_words", 300),
+            executor=executor,
+        )
+
+    def maybe_summarize(self, conv_id: str):
+        """Schedule summarization of `conv_id` if it has grown past the threshold."""
+        if self.state_manager.message_count(conv_id) <= self.max_messages:
+            return None
+        with self._lock:
+            if conv_id in self._running:
+                return None
+            self._running.add(conv_id)
+        return self.executor.submit(self._run, conv_id)
+
+    def _run(self, conv_id: str):
+        try:
+            self.summarize(conv_id)
+        except Exception as e:
+            # The messages stay in the state; the next turn tries again
+            self.console.print(f"⚠️ Summarizing conversation {conv_id} failed: {e}", style="yellow")
+        finally:
+            with self._lock:
+                self._running.discard(conv_id)
+
+    def summarize(self, conv_id: str) -> Optional[str]:
+        """
+        Fold all but the newest messages into the summary now. Returns the new summary,
+        or None if there was nothing to fold or the conversation was reset meanwhile.
+        """
+        count = self.state_manager.message_count(conv_id)
+        old = count - self.keep_recent
+        if old <= 0:
+            return None
+        messages = self.state_manager.get_history(conv_id, limit=old, offset=self.keep_recent)
+        if not messages:
+            return None
+
+        summary = self.client.complete(
+            self._prompt(self.state_manager.get_summary(conv_id), messages),
+            instructions=SUMMARY_INSTRUCTIONS.format(max_words=self.max_words),
+        ).strip()
+        if not summary:
+            raise ValueError("empty summary")
+
+        # The messages are checked again when archiving: a summary of a conversation that
+        # was cleared meanwhile is stale and dropped
+        if not self.state_manager.archive_messages(conv_id, messages[-1]["ts"], summary):
+            return None
+        return summary
+
+    def _prompt(self, previous: Optional[str], messages: list) -> str:
+        lines = [f"Earlier summary:\n{previous}\n" if previous else "Earlier summary: (none)\n", "New messages:"]
+        for msg in messages:
+            content = msg["content"]
+            if len(content) > self.max_message_chars:
+                content = content[:self.max_message_chars] + " …"
+            lines.append(f"{msg['role']}: {content}")
+        return "\n".join(lines)
+
+
+def seeded_input(summary: Optional[str], recent: list, user_input: str) -> str:
+    """
+    The user input prefixed with what the model needs to pick the conversation up
+    again: the running summary and the most recent messages.
+    """
+    parts = []
+    if summary:
+        parts.append(f"Summary of the conversation so far:\n{summary}")
+    if recent:
+        parts.append("Most recent messages:\n" + "\n".join(f"{m['role']}: {m['content']}" for m in recent))
+    if not parts:
+        return user_input
+    return "\n\n".join(parts) + f"\n\nContinue the conversation. New message:\n{user_input}"
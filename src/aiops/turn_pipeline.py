@@ -0,0 +1,71 @@
+# src/aiops/turn_pipeline.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TurnCancelled(Exception):
+    """Raised when the user interrupts a turn while its stages are running."""
+
+
+class TurnPipeline:
+    """
+    Runs the independent stages of a turn (skill routing, RAG retrieval,
+    conversation setup) concurrently, so a turn waits for the slowest stage
+    instead of the sum of all of them.
+
+    Each stage has its own timeout, measured from the start of the run. A stage
+    that times out or raises is reported in `errors` and its result is dropped.
+    Threads cannot be interrupted: a timed-out stage keeps its worker until it
+    returns, so stages should stop early once the run's `cancel` event is set
+    (the RAG stage does; the caller sets it after a RAG timeout) and otherwise
+    rely on their own client timeouts.
+    """
+
+    STAGES = 3  # routing, conversation, rag: the stages one turn runs at most
+
+    def __init__(self, max_workers: int = 4, timeouts: dict = None, default_timeout: float = 30):
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn")
+
+    def run(self, stages: dict, cancel: threading.Event = None) -> tuple[dict, dict]:
+        """
+        Run `stages` (name -> zero-argument callable) concurrently.
+        Returns (results, errors): stage name -> return value, stage name -> exception
+        (TimeoutError for stages that missed their deadline).
+        On KeyboardInterrupt `cancel` is set, pending stages are cancelled and
+        TurnCancelled is raised.
+        """
+        cancel = cancel or threading.Event()
+        start = time.monotonic()
+        deadlines = {name: start + self.timeouts.get(name, self.default_timeout) for name in stages}
+        pending = {self._pool.submit(fn): name for name, fn in stages.items()}
+        results, errors = {}, {}
+
+        try:
+            while pending:
+                now = time.monotonic()
+                for future, name in list(pending.items()):
+                    if deadlines[name] <= now:
+                        future.cancel()
+                        del pending[future]
+                        errors[name] = TimeoutError(f"stage '{name}' timed out after {self.timeouts.get(name, self.default_timeout)}s")
+                if not pending:
+                    break
+                next_deadline = min(deadlines[name] for name in pending.values())
+                done, _ = wait(pending, timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+        except KeyboardInterrupt:
+            cancel.set()
+            for future in pending:
+                future.cancel()
+            raise TurnCancelled()
+
+        return results, errors
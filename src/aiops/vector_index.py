@@ -0,0 +1,490 @@
+# src/aiops/vector_index.py
+
+import math
+import faiss
+import numpy as np
+
+BACKENDS = ("flat", "hnsw", "ivf")
+COMPRESSIONS = ("none", "fp16", "sq8", "pq")
+
+
+def normalize(vectors):
+    """Return a contiguous float32 copy of `vectors` scaled to unit length."""
+    vectors = np.array(vectors, dtype="float32", copy=True, order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def read_index(path: str):
+    return faiss.read_index(path)
+
+
+def stored_ids(index) -> np.ndarray:
+    """Ids of the vectors in a FAISS index; indexes saved without ids used row numbers."""
+    if isinstance(index, faiss.IndexIDMap):
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+        return ids[ids >= 0]  # -1 marks a removed hnsw node, see VectorIndex.remove()
+    if isinstance(index, faiss.IndexIVF):
+        # Inverted lists store ids natively (row numbers for vectors added without)
+        lists = index.invlists
+        ids = [faiss.rev_swig_ptr(lists.get_ids(i), lists.list_size(i)) for i in range(index.nlist)]
+        return np.concatenate([np.zeros(0, dtype="int64")] + ids).astype("int64")
+    return np.arange(index.ntotal, dtype="int64")
+
+
+def reconstruct_ids(index, ids) -> np.ndarray:
+    """Stored vectors of `ids` in an id-addressed index (IndexIDMap2 or IVF)."""
+    ids = np.asarray(ids, dtype="int64")
+    if not len(ids):
+        return np.zeros((0, index.d), dtype="float32")
+    if not isinstance(index, faiss.IndexIVF):
+        return index.reconstruct_batch(ids)
+    # IVF finds ids through a direct map, which remove_ids() does not support: build it only for this
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    try:
+        return index.reconstruct_batch(ids)
+    finally:
+        index.set_direct_map_type(faiss.DirectMap.NoMap)
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over normalized embeddings, addressed by stable ids.
+
+    All backends use inner product on unit vectors, so search scores are real
+    cosine similarities in [-1, 1]:
+      - flat: exact brute-force search
+      - hnsw: graph-based approximate search
+      - ivf:  inverted lists
+
+    Vectors are stored under caller-chosen int64 ids (natively by ivf, through
+    an IndexIDMap2 otherwise) and can be removed by id. HNSW graphs cannot drop
+    nodes, so removed hnsw vectors stay as tombstones (id -1, filtered out of
+    searches) until compact() rebuilds the graph without them.
+
+    `compression` picks how vectors are stored: "none" (float32), "fp16",
+    "sq8" (int8 scalar quantization, 4x smaller) or "pq" (product quantization,
+    `pq_m` bytes per vector at 8 bits). Scores of compressed vectors are
+    approximate; with exact vectors available (`exact`, any object with
+    vectors(ids) such as a ChunkStore) the best `rerank_factor * k`
+    candidates are re-scored against them.
+
+    Layouts that need training (ivf, sq8, pq) stay on a flat staging index
+    until the corpus reaches `train_threshold`, then are trained once and rebuilt.
+    """
+
+    def __init__(
+            self,
+            dim: int,
+            backend: str = "flat",
+            hnsw_m: int = 32,
+            hnsw_ef_construction: int = 80,
+            hnsw_ef_search: int = 64,
+            ivf_nlist: int = 0,
+            ivf_nprobe: int = 8,
+            train_threshold: int = 20000,
+            compression: str = "none",
+            pq_m: int = 0,
+            pq_nbits: int = 8,
+            rerank_factor: int = 4,
+            exhaustive_max: int = 20000,
+            exact=None,
+            index=None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown RAG index backend '{backend}', expected one of {BACKENDS}.")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown RAG index compression '{compression}', expected one of {COMPRESSIONS}.")
+        if compression == "pq" and backend == "hnsw":
+            # faiss' HNSW over PQ codes only ranks by L2, which breaks cosine scores
+            raise ValueError("RAG index compression 'pq' needs the 'flat' or 'ivf' backend.")
+        self.dim = dim
+        self.backend = backend
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.compression = compression
+        self.pq_m = pq_m or self._default_pq_m(dim)
+        self.pq_nbits = pq_nbits
+        self.rerank_factor = rerank_factor
+        self.exhaustive_max = exhaustive_max
+        self.train_threshold = train_threshold
+        if compression == "pq":
+            # k-means needs at least one training point per centroid
+            self.train_threshold = max(train_threshold, 2 ** pq_nbits)
+        self._ids = None  # sorted ids, cached until the index changes
+
+        if index is None:
+            self._set_index(self._build(0))
+        elif index.metric_type != faiss.METRIC_INNER_PRODUCT or \
+                self._layout(self._unwrap(index)) not in self._accepted_layouts():
+            # Legacy L2 index, or backend/compression changed in config → migrate the stored vectors
+            vectors, ids = self._reconstruct_all(index)
+            self._set_index(self._build(len(vectors), vectors))
+            if len(vectors):
+                self.index.add_with_ids(normalize(vectors), ids)
+        elif not isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)):
+            # Saved before vectors had ids: the row numbers become the ids
+            self._set_index(self._wrap(index, stored_ids(index)))
+        else:
+            self._set_index(index)
+
+        self.exact = exact
+        if exact is not None and hasattr(exact, "missing_ids"):
+            missing = exact.missing_ids()
+            missing = missing[self.contains(missing)]
+            if len(missing):
+                # Chunks indexed before exact vectors were kept: backfill with the best available
+                exact.set_vectors(missing, self.reconstruct(missing))
+        # A staged index may already be big enough (threshold lowered, compression just turned on)
+        self._maybe_train()
+
+    @classmethod
+    def from_config(cls, dim: int, rag_cfg: dict, index=None, exact=None):
+        return cls(
+            dim,
+            backend=rag_cfg.get("index_backend", "flat"),
+            hnsw_m=rag_cfg.get("hnsw_m", 32),
+            hnsw_ef_construction=rag_cfg.get("hnsw_ef_construction", 80),
+            hnsw_ef_search=rag_cfg.get("hnsw_ef_search", 64),
+            ivf_nlist=rag_cfg.get("ivf_nlist", 0),
+            ivf_nprobe=rag_cfg.get("ivf_nprobe", 8),
+            train_threshold=rag_cfg.get("train_threshold", rag_cfg.get("ivf_train_threshold", 20000)),
+            compression=rag_cfg.get("compression", "none"),
+            pq_m=rag_cfg.get("pq_m", 0),
+            pq_nbits=rag_cfg.get("pq_nbits", 8),
+            rerank_factor=rag_cfg.get("rerank_factor", 4) if rag_cfg.get("rerank", True) else 1,
+            exhaustive_max=rag_cfg.get("namespace_exhaustive_max", 20000),
+            exact=exact,
+            index=index,
+        )
+
+    @classmethod
+    def load(cls, path: str, rag_cfg: dict, exact=None):
+        index = read_index(path)
+        return cls.from_config(index.d, rag_cfg, index=index, exact=exact)
+
+    @staticmethod
+    def wants_exact(rag_cfg: dict) -> bool:
+        """Whether this config re-ranks against exact vectors, which the caller then has to keep."""
+        return rag_cfg.get("compression", "none") != "none" and rag_cfg.get("rerank", True) \
+            and rag_cfg.get("rerank_factor", 4) > 1
+
+    def save(self, path: str):
+        faiss.write_index(self.index, path)
+
+    def close(self):
+        # The exact vectors belong to the caller (the chunk store), which closes them
+        pass
+
+    @property
+    def ntotal(self) -> int:
+        """Number of stored vectors, tombstones excluded."""
+        return self.index.ntotal - self.dead
+
+    @property
+    def dead(self) -> int:
+        """Number of tombstoned hnsw vectors still taking space in the graph."""
+        return self._dead
+
+    def ids(self) -> np.ndarray:
+        """Sorted ids of the stored vectors."""
+        if self._ids is None:
+            self._ids = np.sort(stored_ids(self.index))
+        return self._ids
+
+    def contains(self, ids) -> np.ndarray:
+        """Mask of which `ids` are stored."""
+        ids = np.asarray(ids, dtype="int64")
+        stored = self.ids()
+        if not len(stored):
+            return np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(stored, ids), len(stored) - 1)
+        return stored[pos] == ids
+
+    @property
+    def layout(self) -> tuple:
+        return self._layout(self._inner)
+
+    # -----------------------------
+    # Build / train
+    # -----------------------------
+    @staticmethod
+    def _unwrap(index):
+        return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+    def _set_index(self, index):
+        self.index = index
+        self._inner = self._unwrap(index)
+        self._dead = index.ntotal - len(stored_ids(index)) if isinstance(index, faiss.IndexIDMap) else 0
+        if isinstance(index, faiss.IndexIVF):
+            # remove_ids() does not work with a direct map (see reconstruct_ids())
+            index.set_direct_map_type(faiss.DirectMap.NoMap)
+        self._apply_search_params()
+        self._ids = None
+
+    @staticmethod
+    def _wrap(inner, ids):
+        """IndexIDMap2 around an index already holding vectors, `ids` in row order."""
+        # faiss only wraps empty indexes, so wrap an empty one and swap the filled one in;
+        # referenced_objects keeps the Python owner of `inner` alive as long as the wrapper
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(inner.d))
+        index.index = inner
+        index.own_fields = False
+        faiss.copy_array_to_vector(np.ascontiguousarray(ids, dtype="int64"), index.id_map)
+        index.ntotal = inner.ntotal
+        index.is_trained = inner.is_trained
+        index.construct_rev_map()
+        index.referenced_objects = [inner]
+        return index
+
+    @staticmethod
+    def _kind(index) -> str:
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(index, faiss.IndexIVF):
+            return "ivf"
+        return "flat"
+
+    @staticmethod
+    def _storage(index) -> str:
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return "pq"
+        if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return {faiss.ScalarQuantizer.QT_fp16: "fp16", faiss.ScalarQuantizer.QT_8bit: "sq8"}.get(
+                index.sq.qtype, "other"
+            )
+        return "none"
+
+    def _layout(self, index) -> tuple:
+        return self._kind(index), self._storage(index)
+
+    @property
+    def needs_training(self) -> bool:
+        return self.backend == "ivf" or self.compression in ("sq8", "pq")
+
+    def _accepted_layouts(self):
+        # Trained layouts stay on a flat staging index until there are enough vectors to train on
+        layouts = [(self.backend, self.compression)]
+        if self.needs_training:
+            layouts.append(("flat", "none"))
+        return layouts
+
+    @staticmethod
+    def _default_pq_m(dim: int) -> int:
+        # ~dim/8 sub-quantizers (48 bytes per MiniLM vector); faiss needs one that divides dim
+        m = max(1, dim // 8)
+        while dim % m:
+            m -= 1
+        return m
+
+    def _nlist_for(self, n: int) -> int:
+        nlist = self.ivf_nlist or int(4 * math.sqrt(n))
+        # k-means wants ~39 training points per centroid
+        return max(1, min(nlist, n // 39))
+
+    def _storage_spec(self) -> str:
+        return {
+            "none": "Flat",
+            "fp16": "SQfp16",
+            "sq8": "SQ8",
+            "pq": f"PQ{self.pq_m}x{self.pq_nbits}",
+        }[self.compression]
+
+    def _factory_spec(self, n: int) -> str:
+        if self.needs_training and n < self.train_threshold:
+            return "Flat"
+        if self.backend == "hnsw":
+            return f"HNSW{self.hnsw_m},{self._storage_spec()}"
+        if self.backend == "ivf":
+            return f"IVF{self._nlist_for(n)},{self._storage_spec()}"
+        return self._storage_spec()
+
+    def _build(self, n: int, training_vectors=None):
+        index = faiss.index_factory(self.dim, self._factory_spec(n), faiss.METRIC_INNER_PRODUCT)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+        if not index.is_trained:
+            index.train(normalize(training_vectors))
+        # IVF keeps ids in its inverted lists; IndexIDMap2 would see them go stale on removal
+        return index if isinstance(index, faiss.IndexIVF) else faiss.IndexIDMap2(index)
+
+    def _apply_search_params(self):
+        if isinstance(self._inner, faiss.IndexHNSW):
+            self._inner.hnsw.efSearch = self.hnsw_ef_search
+        if isinstance(self._inner, faiss.IndexIVF):
+            self._inner.nprobe = self.ivf_nprobe
+
+    @staticmethod
+    def _reconstruct_all(index) -> tuple:
+        """(vectors, ids) of everything in `index` but tombstones, vectors in the stored precision."""
+        if isinstance(index, faiss.IndexIVF):
+            ids = stored_ids(index)
+            return reconstruct_ids(index, ids), ids
+        if not index.ntotal:
+            return np.zeros((0, index.d), dtype="float32"), np.zeros(0, dtype="int64")
+        if isinstance(index, faiss.IndexIDMap):
+            ids = faiss.vector_to_array(index.id_map).astype("int64")
+            live = ids >= 0
+            return faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)[live], ids[live]
+        # Legacy index without ids
+        return index.reconstruct_n(0, index.ntotal), stored_ids(index)
+
+    def reconstruct(self, ids) -> np.ndarray:
+        """Stored (possibly compressed) vectors of `ids`, which must be in the index."""
+        return reconstruct_ids(self.index, ids)
+
+    def _best_vectors(self, ids, vectors) -> np.ndarray:
+        """`vectors` of `ids`, replaced by the exact ones where those are known."""
+        if self.exact is None or not len(ids):
+            return vectors
+        exact = self.exact.vectors(ids)
+        known = ~np.isnan(exact).any(axis=1)
+        vectors[known] = exact[known]
+        return vectors
+
+    def live_vectors(self) -> tuple:
+        """(vectors, ids) of everything stored, exact vectors where known."""
+        vectors, ids = self._reconstruct_all(self.index)
+        return self._best_vectors(ids, vectors), ids
+
+    def rebuilt(self, vectors, ids):
+        """
+        A new FAISS index holding `vectors` under `ids`, for replace(). Touches
+        nothing of this index, so it can run without holding up searches.
+        """
+        index = self._build(len(vectors), vectors)
+        if len(vectors):
+            index.add_with_ids(normalize(vectors), ids)
+        return index
+
+    def replace(self, index):
+        self._set_index(index)
+
+    def compact(self):
+        """Rebuild the hnsw graph without its tombstones."""
+        if self.dead:
+            self.replace(self.rebuilt(*self.live_vectors()))
+
+    def _maybe_train(self):
+        """Swap the flat staging index for the trained layout once the corpus is big enough."""
+        staged = self.layout != (self.backend, self.compression)
+        if not self.needs_training or not staged or self.ntotal < self.train_threshold:
+            return
+        self.replace(self.rebuilt(*self._reconstruct_all(self.index)))
+
+    # -----------------------------
+    # Add / remove / search
+    # -----------------------------
+    def add(self, vectors, ids=None) -> np.ndarray:
+        """Add vectors under `ids` (default: after the largest id). Returns the ids."""
+        vectors = normalize(vectors)
+        if ids is None:
+            start = int(self.ids()[-1]) + 1 if self.ntotal else 0
+            ids = np.arange(start, start + len(vectors), dtype="int64")
+        ids = np.asarray(ids, dtype="int64")
+        self.index.add_with_ids(vectors, ids)
+        self._ids = None
+        self._maybe_train()
+        return ids
+
+    def remove(self, ids) -> int:
+        """Remove the vectors of `ids`; ids not in the index are ignored. Returns how many were removed."""
+        ids = np.asarray(ids, dtype="int64")
+        ids = np.unique(ids[self.contains(ids)])
+        if not len(ids):
+            return 0
+        if isinstance(self._inner, faiss.IndexHNSW):
+            # HNSW graphs cannot drop nodes: tombstone them until compact()
+            id_map = faiss.vector_to_array(self.index.id_map)
+            id_map[np.isin(id_map, ids)] = -1
+            faiss.copy_array_to_vector(id_map, self.index.id_map)
+            self.index.construct_rev_map()
+            self._dead += len(ids)
+            self._ids = None
+            return len(ids)
+        removed = self.index.remove_ids(ids)
+        self._ids = None
+        return removed
+
+    @staticmethod
+    def _empty_result(n: int, k: int):
+        return np.full((n, k), -np.inf, dtype="float32"), np.full((n, k), -1, dtype="int64")
+
+    def search(self, vectors, k: int, subset=None):
+        """
+        Return (scores, ids); scores are cosine similarities, ids are -1 for
+        empty slots. `subset` restricts the search to those ids.
+        """
+        vectors = normalize(vectors)
+        params = self._search_params(faiss.IDSelectorRange(0, 2 ** 62)) if self.dead else None
+        if subset is not None:
+            subset = np.asarray(subset, dtype="int64")
+            subset = subset[self.contains(subset)]
+            if not len(subset):
+                return self._empty_result(len(vectors), k)
+            if len(subset) <= self.exhaustive_max:
+                found = self._search_subset(vectors, k, subset)
+                if found is not None:
+                    return found
+            # Graph walks and probed lists hold proportionally fewer allowed ids, so widen them
+            params = self._search_params(faiss.IDSelectorBatch(subset), widen=max(1.0, self.ntotal / len(subset)))
+        if self.exact is None:
+            return self.index.search(vectors, k, params=params)
+        return self._rerank(vectors, *self.index.search(vectors, k * self.rerank_factor, params=params), k)
+
+    def _search_subset(self, vectors, k: int, subset):
+        """Brute-force scan of a small subset, or None if its vectors are not at hand."""
+        candidates = np.full((len(subset), self.dim), np.nan, dtype="float32")
+        if self.exact is not None:
+            candidates = self.exact.vectors(subset)
+        missing = np.isnan(candidates).any(axis=1)
+        if missing.any():
+            if isinstance(self._inner, faiss.IndexIVF):
+                # Reconstructing from inverted lists needs a direct map over the whole index
+                return None
+            candidates[missing] = self.reconstruct(subset[missing])
+        scores = vectors @ candidates.T
+        out_scores, out_ids = self._empty_result(len(vectors), k)
+        top = min(k, len(subset))
+        for row, row_scores in enumerate(scores):
+            order = np.argpartition(-row_scores, top - 1)[:top]
+            order = order[np.argsort(-row_scores[order])]
+            out_scores[row, :top] = row_scores[order]
+            out_ids[row, :top] = subset[order]
+        return out_scores, out_ids
+
+    def _search_params(self, selector, widen: float = 1.0):
+        # Tombstones have id -1, so any selector of real ids leaves them out
+        if isinstance(self._inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=int(min(self.hnsw_ef_search * widen, 4096)))
+        if isinstance(self._inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(
+                sel=selector, nprobe=int(min(self.ivf_nprobe * widen, self._inner.nlist))
+            )
+        return faiss.SearchParameters(sel=selector)
+
+    def _rerank(self, vectors, scores, ids, k: int):
+        """
+        Re-score the candidates against the exact vectors and keep the best k.
+        Candidates without an exact vector keep their approximate score.
+        """
+        out_scores, out_ids = self._empty_result(len(vectors), k)
+        for row, query in enumerate(vectors):
+            found = ids[row] >= 0
+            # Sorted ids read the exact vectors front to back
+            order = np.argsort(ids[row][found])
+            candidates, approximate = ids[row][found][order], scores[row][found][order]
+            if not len(candidates):
+                continue
+            exact_scores = self.exact.vectors(candidates) @ query
+            unknown = np.isnan(exact_scores)
+            exact_scores[unknown] = approximate[unknown]
+            order = np.argsort(-exact_scores)[:k]
+            out_scores[row, :len(order)] = exact_scores[order]
+            out_ids[row, :len(order)] = candidates[order]
+        return out_scores, out_ids
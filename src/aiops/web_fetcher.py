@@ -0,0 +1,113 @@
+# src/aiops/web_fetcher.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+
+class WebFetcher:
+    """
+    Concurrent page fetcher for RAG ingestion.
+
+    Pages are downloaded in parallel over one pooled HTTP session, and HTML is
+    turned into text on a separate worker pool so slow parsing never holds up
+    downloads. fetch_all() stops at an overall deadline and returns whatever
+    finished in time. With a PageCache, fresh pages are served from disk and stale
+    ones are revalidated with a conditional request.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: float = 10, deadline: float = 15, cache=None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-fetch")
+        self._extract_pool = ThreadPoolExecutor(max_workers=max(1, max_workers // 2), thread_name_prefix="rag-extract")
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        # Convert GitHub "blob" link → raw link
+        if "github.com" in url and "/blob/" in url:
+            url = url.replace("github.com", "raw.githubusercontent.com").replace("/blob/", "/")
+        return url
+
+    def download(self, url: str) -> str:
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached["fresh"]:
+            return cached["body"]
+
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self.session.get(url, timeout=self.timeout, headers=headers)
+        if resp.status_code == 304 and cached:
+            self.cache.revalidated(url)
+            return cached["body"]
+        resp.raise_for_status()
+
+        if self.cache:
+            self.cache.store(url, resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return resp.text
+
+    @staticmethod
+    def extract_text(url: str, body: str) -> str:
+        if "raw.githubusercontent.com" in url:
+            # return raw file content directly
+            return body
+        # fallback: parse with BeautifulSoup
+        soup = BeautifulSoup(body, "html.parser")
+        return soup.get_text(separator=" ", strip=True)
+
+    def fetch(self, url: str) -> str:
+        """Fetch and extract a single page synchronously."""
+        url = self.normalize_url(url)
+        return self.extract_text(url, self.download(url))
+
+    def fetch_all(self, urls, deadline: float = None, cancel=None) -> list[tuple[str, str]]:
+        """
+        Fetch and extract `urls` concurrently.
+        Returns (text, url) pairs, keyed by the original URL, for pages that completed
+        before the deadline; failed and late pages are reported and skipped.
+        If the `cancel` event is set, returns the pages collected so far.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        stop_at = time.monotonic() + deadline
+
+        pending = {}
+        for url in dict.fromkeys(u for u in urls if u):
+            target = self.normalize_url(url)
+            pending[self._fetch_pool.submit(self.download, target)] = ("fetch", url, target)
+
+        pages = []
+        while pending:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0 or (cancel and cancel.is_set()):
+                break
+            # Wake up periodically to notice cancellation
+            done, _ = wait(pending, timeout=min(remaining, 0.2), return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, url, target = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️ Failed to fetch {url}: {e}")
+                    continue
+                if stage == "fetch":
+                    pending[self._extract_pool.submit(self.extract_text, target, result)] = ("extract", url, target)
+                elif result:
+                    pages.append((result, url))
+
+        for future, (_, url, _) in pending.items():
+            future.cancel()
+            if not (cancel and cancel.is_set()):
+                print(f"⚠️ Skipped {url}: not fetched within {deadline}s")
+        return pages
@@ -1,42 +1,107 @@
 # mcp_server.py
-from fastmcp import FastMCP
-import subprocess
-import tempfile
+from fastmcp import FastMCP, Context
+import json
 import os
 
+from runner import run_script, run_fanout, OutputStreamer
+
 mcp = FastMCP()
 
+# Limits for scripts, set by the process that starts the server (see [mcp] in aiops.toml)
+DEFAULT_TIMEOUT = float(os.environ.get("MCP_BASH_TIMEOUT", 120))
+MAX_OUTPUT_BYTES = int(os.environ.get("MCP_BASH_MAX_OUTPUT_BYTES", 1024 * 1024))
+CPU_SECONDS = int(os.environ.get("MCP_BASH_CPU_SECONDS", 0))
+MEMORY_MB = int(os.environ.get("MCP_BASH_MEMORY_MB", 0))
+CGROUP = os.environ.get("MCP_BASH_CGROUP", "").lower() in ("1", "true", "yes")
+CPU_QUOTA = int(os.environ.get("MCP_BASH_CPU_QUOTA", 0))
+FANOUT_CONCURRENCY = int(os.environ.get("MCP_BASH_FANOUT_CONCURRENCY", 8))
+FANOUT_MAX_OUTPUT_BYTES = int(os.environ.get("MCP_BASH_FANOUT_MAX_OUTPUT_BYTES", 64 * 1024))
+
+
 @mcp.tool()
-def run_bash(script: str) -> dict:
+async def run_bash(script: str, ctx: Context, timeout: float = None, stream: bool = True) -> dict:
     """
     Run a bash script locally and return output.
     Args:
         script (str): The bash script contents.
+        timeout (float): Seconds before the script is killed (default: server setting).
+        stream (bool): Send output as progress notifications while the script runs.
     Returns:
-        dict: { "exit_code": int, "stdout": str, "stderr": str }
+        dict: { "exit_code": int, "stdout": str, "stderr": str, "timed_out": bool,
+                "truncated": bool, "duration": float }
+        stdout/stderr hold the last MCP_BASH_MAX_OUTPUT_BYTES of each stream.
     """
-    with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".sh") as f:
-        f.write(script)
-        f.flush()
-        script_path = f.name
-
-    # Make executable
-    os.chmod(script_path, 0o755)
-
-    try:
-        result = subprocess.run(
-            ["bash", script_path],
-            capture_output=True,
-            text=True,
-            timeout=120  # prevent runaway
-        )
-        return {
-            "exit_code": result.returncode,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-        }
-    finally:
-        os.remove(script_path)
+    streamed = 0
+
+    async def send(text: str):
+        nonlocal streamed
+        streamed += len(text)
+        await ctx.report_progress(progress=streamed, message=text)
+
+    streamer = OutputStreamer(send) if stream else None
+
+    async def on_output(name: str, text: str):
+        await streamer.write(text)
+
+    result = await run_script(
+        script,
+        timeout=timeout or DEFAULT_TIMEOUT,
+        on_output=on_output if streamer else None,
+        max_output_bytes=MAX_OUTPUT_BYTES,
+        cpu_seconds=CPU_SECONDS,
+        memory_mb=MEMORY_MB,
+        cgroup=CGROUP,
+        cpu_quota=CPU_QUOTA,
+    )
+    if streamer:
+        await streamer.flush()
+    return result
+
+
+@mcp.tool()
+async def run_bash_fanout(
+        script: str,
+        targets: list[str],
+        ctx: Context,
+        max_concurrency: int = None,
+        timeout: float = None,
+) -> dict:
+    """
+    Run the same bash script against many targets (hosts, kube contexts, ...) in parallel.
+    Args:
+        script (str): Script template. The target is available as $TARGET, and
+            {{target}} is replaced by the shell-quoted target.
+        targets (list[str]): One run per distinct target.
+        max_concurrency (int): Runs in flight at once (default: server setting).
+        timeout (float): Seconds before one target's run is killed (default: server setting).
+    Returns:
+        dict: { "results": {target: run_bash result}, "summary": {"targets", "ok",
+                "failed", "timed_out"}, "duration": float }
+        Each finished target is also sent as a JSON progress message
+        {"target", "exit_code", "timed_out", "duration"}.
+    """
+    done = 0
+    total = len(set(targets))
+
+    async def on_result(target: str, result: dict):
+        nonlocal done
+        done += 1
+        message = {k: result[k] for k in ("exit_code", "timed_out", "duration")}
+        await ctx.report_progress(progress=done, total=total, message=json.dumps({"target": target, **message}))
+
+    return await run_fanout(
+        script,
+        targets,
+        max_concurrency=max_concurrency or FANOUT_CONCURRENCY,
+        timeout=timeout or DEFAULT_TIMEOUT,
+        on_result=on_result,
+        max_output_bytes=FANOUT_MAX_OUTPUT_BYTES,
+        cpu_seconds=CPU_SECONDS,
+        memory_mb=MEMORY_MB,
+        cgroup=CGROUP,
+        cpu_quota=CPU_QUOTA,
+    )
+
 
 if __name__ == "__main__":
     # Starts the MCP server (listening on stdio or socket depending on runtime)
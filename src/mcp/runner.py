@@ -0,0 +1,268 @@
+# runner.py
+import asyncio
+import codecs
+import os
+import resource
+import shlex
+import shutil
+import signal
+import tempfile
+import time
+from collections import deque
+
+READ_SIZE = 64 * 1024
+
+
+class RingBuffer:
+    """
+    Keeps the last `max_bytes` of a stream. Older output is dropped and
+    reported by a truncation marker at the start of `text()`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def write(self, data: bytes):
+        self.chunks.append(data)
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            excess = self.size - self.max_bytes
+            head = self.chunks[0]
+            if len(head) <= excess:
+                self.chunks.popleft()
+                self.size -= len(head)
+                self.dropped += len(head)
+            else:
+                self.chunks[0] = head[excess:]
+                self.size -= excess
+                self.dropped += excess
+
+    def text(self) -> str:
+        body = b"".join(self.chunks).decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"[... {self.dropped} bytes truncated ...]\n{body}"
+        return body
+
+
+class OutputStreamer:
+    """
+    Batches output for `send(text)` so a chatty script produces a few messages
+    per second, each at most `max_chunk` characters. Output beyond that is
+    skipped in the stream (it is still in the captured result, space permitting).
+    """
+
+    def __init__(self, send, interval: float = 0.25, max_chunk: int = 8192):
+        self.send = send
+        self.interval = interval
+        self.max_chunk = max_chunk
+        self.pending = []
+        self.pending_size = 0
+        self.skipped = 0
+        self.last_flush = time.monotonic()
+        self._timer = None
+
+    async def write(self, text: str):
+        room = self.max_chunk - self.pending_size
+        self.pending.append(text[:room])
+        self.pending_size += min(len(text), room)
+        self.skipped += max(0, len(text) - room)
+        wait = self.interval - (time.monotonic() - self.last_flush)
+        if wait <= 0:
+            await self.flush()
+        elif self._timer is None:
+            # Quiet scripts: send what we have once the interval is up, without waiting for more output
+            self._timer = asyncio.ensure_future(self._flush_later(wait))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        self.last_flush = time.monotonic()
+        if not self.pending and not self.skipped:
+            return
+        text = "".join(self.pending)
+        if self.skipped:
+            text += f"\n[... {self.skipped} characters not streamed ...]\n"
+        self.pending, self.pending_size, self.skipped = [], 0, 0
+        await self.send(text)
+
+
+def _limit_resources(cpu_seconds: int, memory_mb: int):
+    """preexec_fn for the script: rlimits are inherited by everything it starts."""
+    def apply():
+        if cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return apply
+
+
+def _cgroup_prefix(memory_mb: int, cpu_quota: int) -> list:
+    """Run the script in a transient systemd scope with cgroup memory/CPU caps, if systemd-run exists."""
+    systemd_run = shutil.which("systemd-run")
+    if not systemd_run:
+        return []
+    cmd = [systemd_run, "--user", "--scope", "--quiet", "--collect"]
+    if memory_mb:
+        cmd += ["-p", f"MemoryMax={memory_mb}M", "-p", "MemorySwapMax=0"]
+    if cpu_quota:
+        cmd += ["-p", f"CPUQuota={cpu_quota}%"]
+    return cmd
+
+
+async def _pump(stream, buffer: RingBuffer, name: str, on_output):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = await stream.read(READ_SIZE)
+        if not data:
+            break
+        buffer.write(data)
+        if on_output:
+            text = decoder.decode(data)
+            if text:
+                await on_output(name, text)
+
+
+async def _kill_group(proc, pumps):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+    try:
+        await asyncio.wait_for(pumps, 5)
+    except asyncio.TimeoutError:
+        pass  # a process that escaped the group still holds the pipe
+    except Exception:
+        pass  # e.g. on_output failing because the caller went away; the output no longer matters
+
+
+async def run_script(
+        script: str,
+        timeout: float = 120,
+        on_output=None,
+        max_output_bytes: int = 1024 * 1024,
+        cpu_seconds: int = 0,
+        memory_mb: int = 0,
+        cgroup: bool = False,
+        cpu_quota: int = 0,
+        env: dict = None,
+) -> dict:
+    """
+    Run a bash script, reading its output as it is produced.
+
+    `on_output(stream_name, text)` (a coroutine) receives each piece of stdout /
+    stderr. Only the last `max_output_bytes` of each stream are kept for the
+    result. After `timeout` seconds the script's whole process group is killed.
+    `cpu_seconds` / `memory_mb` are applied as rlimits; with `cgroup` the script
+    also runs in a systemd scope capped at `memory_mb` and `cpu_quota` percent.
+    `env` adds variables to the script's environment.
+    """
+    with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".sh") as f:
+        f.write(script)
+        script_path = f.name
+    os.chmod(script_path, 0o755)
+
+    cmd = ["bash", script_path]
+    if cgroup:
+        cmd = _cgroup_prefix(memory_mb, cpu_quota) + cmd
+
+    stdout, stderr = RingBuffer(max_output_bytes), RingBuffer(max_output_bytes)
+    start = time.monotonic()
+    timed_out = False
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,  # own process group, so a timeout kills its children too
+            preexec_fn=_limit_resources(cpu_seconds, memory_mb),
+            env={**os.environ, **env} if env else None,
+        )
+        pumps = asyncio.gather(
+            _pump(proc.stdout, stdout, "stdout", on_output),
+            _pump(proc.stderr, stderr, "stderr", on_output),
+        )
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.gather(pumps, proc.wait())), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            # Timed out, or this call was cancelled (client timeout, disconnect, shutdown):
+            # the script must not outlive it, whatever the reason
+            if proc.returncode is None:
+                await _kill_group(proc, pumps)
+    finally:
+        os.remove(script_path)
+
+    result = {
+        "exit_code": proc.returncode,
+        "stdout": stdout.text(),
+        "stderr": stderr.text(),
+        "timed_out": timed_out,
+        "truncated": bool(stdout.dropped or stderr.dropped),
+        "duration": round(time.monotonic() - start, 3),
+    }
+    if timed_out:
+        result["stderr"] += f"\n[killed after {timeout}s timeout]"
+    return result
+
+
+def render_for_target(template: str, target: str) -> str:
+    """The script for one fan-out target: {{target}} is replaced by the shell-quoted target."""
+    return template.replace("{{target}}", shlex.quote(target))
+
+
+async def run_fanout(
+        template: str,
+        targets: list,
+        max_concurrency: int = 8,
+        timeout: float = 120,
+        on_result=None,
+        **limits,
+) -> dict:
+    """
+    Run `template` once per target, at most `max_concurrency` at a time.
+
+    Each run gets the target as $TARGET (and in place of {{target}}) and its own
+    `timeout`. `on_result(target, result)` (a coroutine) is called as each target
+    finishes. `limits` are passed to run_script for every run.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = {}
+
+    async def run_one(target: str):
+        async with semaphore:
+            try:
+                result = await run_script(
+                    render_for_target(template, target), timeout=timeout, env={"TARGET": target}, **limits
+                )
+            except Exception as e:
+                result = {"exit_code": None, "stdout": "", "stderr": f"failed to start: {e}",
+                          "timed_out": False, "truncated": False, "duration": 0.0}
+        results[target] = result
+        if on_result:
+            await on_result(target, result)
+
+    start = time.monotonic()
+    await asyncio.gather(*(run_one(target) for target in dict.fromkeys(targets)))
+    return {
+        "results": {target: results[target] for target in dict.fromkeys(targets)},
+        "summary": {
+            "targets": len(results),
+            "ok": sum(1 for r in results.values() if r["exit_code"] == 0),
+            "failed": sum(1 for r in results.values() if r["exit_code"] != 0 and not r["timed_out"]),
+            "timed_out": sum(1 for r in results.values() if r["timed_out"]),
+        },
+        "duration": round(time.monotonic() - start, 3),
+    }
@@ -0,0 +1,137 @@
+# tests/test_async_openai_client.py
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from aiops.llm.async_openai_client import AsyncOpenAIClient
+
+
+def response_body(text: str) -> dict:
+    return {
+        "id": "resp_1",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-4o-mini",
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_1",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+    }
+
+
+class StubResponses(ThreadingHTTPServer):
+    """A local Responses endpoint: answers after `delay`, or with 429 while `rate_limited` > 0."""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0, rate_limited: int = 0, retry_after: str = None):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay = delay
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = []  # arrival times
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.requests.append(time.monotonic())
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            limited = server.rate_limited > 0
+            server.rate_limited -= 1
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        if limited:
+            status, body = 429, {"error": {"message": "rate limited", "type": "rate_limit_error"}}
+        else:
+            status, body = 200, response_body("ok")
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if limited and server.retry_after:
+            self.send_header("Retry-After", server.retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server = StubResponses(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(server, **llm_cfg):
+    return AsyncOpenAIClient.from_config({"base_url": server.base_url, **llm_cfg}, api_key="test")
+
+
+def test_concurrent_requests_are_capped(stub):
+    server = stub(delay=0.2)
+
+    async def run():
+        async with make_client(server, max_concurrency=2) as client:
+            return await asyncio.gather(*(client.complete(f"q{i}") for i in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert len(server.requests) == 6
+    assert server.max_in_flight == 2
+
+
+def test_rate_limited_request_waits_for_retry_after(stub):
+    server = stub(rate_limited=2, retry_after="0.3")
+
+    async def run():
+        async with make_client(server, max_retries=3, retry_base_delay=10, retry_max_delay=5) as client:
+            return await client.complete("q")
+
+    assert asyncio.run(run()) == "ok"
+    assert len(server.requests) == 3
+    # The server's delay is used instead of the (much longer) backoff
+    gaps = [b - a for a, b in zip(server.requests, server.requests[1:])]
+    assert all(0.3 <= gap < 2 for gap in gaps)
+
+
+def test_gives_up_after_max_retries(stub):
+    import openai
+    server = stub(rate_limited=10, retry_after="0")
+
+    async def run():
+        async with make_client(server, max_retries=2) as client:
+            return await client.complete("q")
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+    assert len(server.requests) == 3
@@ -0,0 +1,111 @@
+# tests/test_chunk_store.py
+
+import os
+import numpy as np
+import pytest
+from aiops import chunk_store
+from aiops.chunk_store import ChunkStore
+
+
+class Crash(Exception):
+    pass
+
+
+def make_store(tmp_path, dim=4):
+    prefix = str(tmp_path / "idx")
+    store = ChunkStore(prefix, next_id=0, dim=dim)
+    texts = ["alpha" * 3, "bravo" * 3, "charlie" * 3]
+    urls = ["a", "b", "c"]
+    vectors = np.arange(len(texts) * dim, dtype="float32").reshape(len(texts), dim)
+    docs = {url: {"hash": url, "ns": "default"} for url in urls}
+    ids = store.append(texts, urls, docs, vectors=vectors)
+    store.forget(["a"])
+    store.flush()
+    return prefix, store, ids, list(zip(texts, urls)), vectors
+
+
+def test_crash_while_writing_compaction_keeps_old_files(tmp_path, monkeypatch):
+    prefix, store, ids, items, vectors = make_store(tmp_path)
+    write = chunk_store._write_durably
+
+    def crash_on_records(path, data):
+        if path.endswith(".chunks.rec.new"):
+            raise Crash()
+        write(path, data)
+
+    monkeypatch.setattr(chunk_store, "_write_durably", crash_on_records)
+    with pytest.raises(Crash):
+        store.compact(ids[1:])
+    monkeypatch.undo()
+    # The blob, vectors and docs were rewritten, the records were not
+    assert os.path.exists(prefix + ".chunks.bin.new")
+    assert not os.path.exists(prefix + ".chunks.rec.new")
+
+    reopened = ChunkStore(prefix, dim=4)
+    assert reopened.get_many(ids) == items
+    np.testing.assert_array_equal(reopened.vectors(ids), vectors)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".new")]
+
+
+def test_crash_while_renaming_compaction_finishes_it(tmp_path, monkeypatch):
+    prefix, store, ids, items, vectors = make_store(tmp_path)
+    replace = os.replace
+    renames = []
+
+    def crash_after_first_rename(src, dst):
+        if renames:
+            raise Crash()
+        renames.append(dst)
+        replace(src, dst)
+
+    monkeypatch.setattr(chunk_store.os, "replace", crash_after_first_rename)
+    with pytest.raises(Crash):
+        store.compact(ids[1:])
+    monkeypatch.undo()
+    assert os.path.exists(prefix + ".chunks.compacted")
+
+    reopened = ChunkStore(prefix, dim=4)
+    assert len(reopened) == 2
+    assert reopened.get_many(ids) == [None] + items[1:]
+    np.testing.assert_array_equal(reopened.vectors(ids[1:]), vectors[1:])
+    assert sorted(reopened.docs) == ["b", "c"]
+    assert not os.path.exists(prefix + ".chunks.compacted")
+
+
+def test_records_past_the_durable_urls_are_dropped(tmp_path):
+    prefix, store, ids, items, vectors = make_store(tmp_path)
+    store.close()
+    # Power loss after the records reached disk but before the last URL line did
+    with open(prefix + ".urls", "rb") as f:
+        lines = f.readlines()
+    with open(prefix + ".urls", "wb") as f:
+        f.writelines(lines[:-1])
+
+    reopened = ChunkStore(prefix, dim=4, live_ids=ids[1:])
+    assert len(reopened) == 2
+    assert reopened.get_many(ids) == items[:2] + [None]
+    assert sorted(reopened.docs) == ["b"]
+    # The dropped chunk's id is not handed out again
+    assert reopened.append(["delta"], ["d"]).tolist() == [3]
+    assert reopened.get(3) == ("delta", "d")
+    assert reopened.get(2) is None
+
+
+def test_ids_of_dropped_chunks_are_never_reused(tmp_path):
+    prefix, store, ids, items, vectors = make_store(tmp_path)
+    # The newest document is deleted and compacted away
+    store.forget(["c"])
+    store.compact(ids[1:2])
+    assert store.next_id == 3
+    store.close()
+
+    reopened = ChunkStore(prefix, dim=4)
+    assert len(reopened) == 1
+    assert reopened.append(["delta"], ["d"]).tolist() == [3]
+    reopened.flush()
+    reopened.close()
+
+    # Reloaded against an index saved before the append: the unsaved chunk is dropped, its id stays used
+    reloaded = ChunkStore(prefix, next_id=3, dim=4, live_ids=ids[1:2])
+    assert reloaded.get(3) is None
+    assert reloaded.append(["echo"], ["e"]).tolist() == [4]
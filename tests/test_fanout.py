@@ -0,0 +1,65 @@
+# tests/test_fanout.py
+
+import asyncio
+import sys
+from pathlib import Path
+
+# The MCP server runs runner.py from its own directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "mcp"))
+import runner  # noqa: E402
+
+# Prints the target and when it started and finished, in nanoseconds
+TIMED = 'echo "$TARGET $(date +%s%N)"; sleep {sleep}; echo "$(date +%s%N)"'
+
+
+def fanout(template, targets, **kwargs):
+    return asyncio.run(runner.run_fanout(template, targets, **kwargs))
+
+
+def spans(result):
+    first, last = result["stdout"].split("\n")[:2]
+    return int(first.split()[1]), int(last)
+
+
+def test_runs_at_most_max_concurrency_targets_at_once():
+    targets = [f"host{i}" for i in range(6)]
+    out = fanout(TIMED.format(sleep=0.3), targets, max_concurrency=2, timeout=10)
+
+    assert out["summary"] == {"targets": 6, "ok": 6, "failed": 0, "timed_out": 0}
+    times = [spans(r) for r in out["results"].values()]
+    overlap = max(sum(1 for start, end in times if start <= t < end) for t, _ in times)
+    assert overlap == 2
+    # Three waves of two, not one after another
+    assert out["duration"] < 6 * 0.3
+
+
+def test_timed_out_target_is_reported_while_others_complete():
+    template = 'if [ "$TARGET" = slow ]; then sleep 30; fi; echo "done {{target}}"'
+    out = fanout(template, ["a", "slow", "b"], timeout=1)
+
+    assert out["summary"] == {"targets": 3, "ok": 2, "failed": 0, "timed_out": 1}
+    assert out["results"]["slow"]["timed_out"]
+    assert out["results"]["slow"]["exit_code"] != 0
+    for target in ("a", "b"):
+        assert out["results"][target]["exit_code"] == 0
+        assert out["results"][target]["stdout"] == f"done {target}\n"
+    assert out["duration"] < 10
+
+
+def test_results_are_aggregated_per_target():
+    template = 'echo "out {{target}}"; echo "err $TARGET" >&2; [ "$TARGET" != bad ]'
+    seen = []
+
+    async def on_result(target, result):
+        seen.append(target)
+
+    out = fanout(template, ["x", "bad", "y", "x"], on_result=on_result, timeout=10)
+
+    # In the order given, duplicates run once
+    assert list(out["results"]) == ["x", "bad", "y"]
+    assert sorted(seen) == ["bad", "x", "y"]
+    assert out["summary"] == {"targets": 3, "ok": 2, "failed": 1, "timed_out": 0}
+    for target, result in out["results"].items():
+        assert result["stdout"] == f"out {target}\n"
+        assert result["stderr"] == f"err {target}\n"
+    assert out["results"]["bad"]["exit_code"] == 1
@@ -0,0 +1,22 @@
+# tests/test_page_cache.py
+
+import os
+from aiops.page_cache import PageCache
+
+
+def test_hits_do_not_rewrite_metadata_within_touch_interval(tmp_path):
+    cache = PageCache(str(tmp_path), touch_interval=60)
+    cache.store("http://example.com/a", "body a")
+    cache.store("http://example.com/b", "body b")
+    meta_path = cache._meta_path(cache._key("http://example.com/a"))
+    written = os.stat(meta_path).st_mtime_ns
+
+    for _ in range(20):
+        assert cache.lookup("http://example.com/a")["body"] == "body a"
+    assert os.stat(meta_path).st_mtime_ns == written
+
+    # Recency is still tracked in memory: "a" was used last, so "b" is evicted first
+    cache.max_bytes = len("body a")
+    cache._evict()
+    assert cache.lookup("http://example.com/b") is None
+    assert cache.lookup("http://example.com/a")["body"] == "body a"
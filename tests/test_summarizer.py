@@ -0,0 +1,54 @@
+# tests/test_summarizer.py
+
+import pytest
+from aiops.state_manager import open_state_manager
+from aiops.summarizer import ConversationSummarizer
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+
+class Client:
+    """Answers with a fixed summary; `during` runs while the model is 'thinking'."""
+
+    def __init__(self, during=None):
+        self.during = during
+
+    def complete(self, prompt, instructions=None):
+        if self.during:
+            self.during()
+        return "summary of old messages"
+
+
+def make_state(tmp_path, backend, messages=8):
+    state = open_state_manager(str(tmp_path / "state.json"), {"state_backend": backend, "state_fsync": False})
+    state.add_conversation("c1", "test")
+    for i in range(messages):
+        state.add_message("c1", "user", f"message {i}")
+    return state
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_summary_replaces_old_messages(tmp_path, backend):
+    state = make_state(tmp_path, backend)
+    summarizer = ConversationSummarizer(Client(), state, max_messages=4, keep_recent=2)
+
+    assert summarizer.summarize("c1") == "summary of old messages"
+    assert state.get_summary("c1") == "summary of old messages"
+    assert [m["content"] for m in state.get_history("c1", limit=10)] == ["message 6", "message 7"]
+    assert len(state.load_archive("c1")) == 6
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_summary_of_a_cleared_conversation_is_dropped(tmp_path, backend):
+    state = make_state(tmp_path, backend)
+
+    def clear_and_continue():
+        state.clear_conversation("c1")
+        state.add_message("c1", "user", "after clear")
+
+    summarizer = ConversationSummarizer(Client(during=clear_and_continue), state, max_messages=4, keep_recent=2)
+
+    assert summarizer.summarize("c1") is None
+    assert state.get_summary("c1") is None
+    assert [m["content"] for m in state.get_history("c1", limit=10)] == ["after clear"]
+    assert state.load_archive("c1") == []
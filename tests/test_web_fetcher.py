@@ -0,0 +1,71 @@
+# tests/test_web_fetcher.py
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from aiops.web_fetcher import WebFetcher
+
+SLOW_SECONDS = 3
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """/fast/<name> answers at once, /slow/<name> after SLOW_SECONDS."""
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits.append(self.path)
+        if self.path.startswith("/slow/"):
+            time.sleep(SLOW_SECONDS)
+        body = f"<html><body><p>page {self.path}</p></body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    server.daemon_threads = True
+    server.hits = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_deadline_returns_the_pages_that_finished(site):
+    server, base = site
+    urls = [f"{base}/fast/a", f"{base}/slow/b", f"{base}/fast/c"]
+    fetcher = WebFetcher(max_workers=4, timeout=10)
+
+    start = time.monotonic()
+    pages = fetcher.fetch_all(urls, deadline=0.5)
+
+    assert time.monotonic() - start < SLOW_SECONDS
+    assert sorted(url for _, url in pages) == [urls[0], urls[2]]
+    assert dict((url, text) for text, url in pages)[urls[0]] == "page /fast/a"
+
+
+def test_cancel_stops_pending_fetches(site):
+    server, base = site
+    urls = [f"{base}/slow/{i}" for i in range(4)]
+    # One worker: the first page is being fetched, the rest are queued behind it
+    fetcher = WebFetcher(max_workers=1, timeout=10)
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+
+    start = time.monotonic()
+    pages = fetcher.fetch_all(urls, deadline=30, cancel=cancel)
+
+    assert pages == []
+    assert time.monotonic() - start < SLOW_SECONDS
+    # Once the in-flight fetch ends, the queued ones are not started
+    time.sleep(SLOW_SECONDS + 0.5)
+    assert server.hits == ["/slow/0"]